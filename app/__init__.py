@@ -2,13 +2,30 @@ from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_pymongo import PyMongo
+from pymongo import MongoClient
+import logging
 import os
+import threading
 from dotenv import load_dotenv
 from flask_bcrypt import Bcrypt
+from .cache import ResultCache, UserCache
+from .changes import ChangeWatcher
+from .hashing import PasswordHasher
+from .jobs import PayrollJobRunner
+from .logs import init_logging
+from .metrics import MongoCommandListener, init_metrics
+from .parallel import PartitionedPayroll
 
 mongo = PyMongo()
 jwt = JWTManager()
 bcrypt = Bcrypt()
+payroll_cache = ResultCache()
+user_cache = UserCache()
+password_hasher = PasswordHasher()
+payroll_jobs = PayrollJobRunner()
+payroll_workers = PartitionedPayroll()
+payroll_watcher = ChangeWatcher()
+logger = logging.getLogger(__name__)
 
 
 def create_app():
@@ -23,26 +40,80 @@ def create_app():
     app.config['MONGO_DB'] = os.getenv('MONGO_DB', 'payroll_db')
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET', 'ia41sId6LOTehoP0XR8VZ_e96_G4n4-IqZ2FI9XsJRw')
     app.config['CORS_ORIGIN'] = os.getenv('CORS_ORIGIN', 'http://localhost:5173')
+    app.config['MONGO_ENSURE_INDEXES'] = os.getenv('MONGO_ENSURE_INDEXES', '1').lower() not in ('0', 'false', 'no')
+    app.config['PERSONNEL_BULK_CHUNK_SIZE'] = int(os.getenv('PERSONNEL_BULK_CHUNK_SIZE', 1000))
+    # Payroll result cache: lru (in-process), redis (shared, needs REDIS_URL) or none
+    app.config['PAYROLL_CACHE_BACKEND'] = os.getenv('PAYROLL_CACHE_BACKEND', 'lru')
+    app.config['PAYROLL_CACHE_SIZE'] = int(os.getenv('PAYROLL_CACHE_SIZE', 8))
+    app.config['PAYROLL_CACHE_TTL'] = int(os.getenv('PAYROLL_CACHE_TTL', 3600))
+    app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    # /profile and /logout user lookups: short TTL, the only bound on staleness (see load_user)
+    app.config['USER_CACHE_BACKEND'] = os.getenv('USER_CACHE_BACKEND', 'lru')
+    app.config['USER_CACHE_SIZE'] = int(os.getenv('USER_CACHE_SIZE', 10000))
+    app.config['USER_CACHE_TTL'] = int(os.getenv('USER_CACHE_TTL', 60))
+    # Response serializer: auto (orjson when installed), orjson, or bson (bson.json_util)
+    app.config['JSON_PROVIDER'] = os.getenv('JSON_PROVIDER', 'auto')
+    app.config['MONGO_CLIENT_OPTIONS'] = mongo_client_options()
+    app.config['MONGO_CLIENT_OPTIONS']['event_listeners'] = [MongoCommandListener()]
+    # background (default): ping + index setup off the startup path; block: wait for it; off: skip
+    app.config['MONGO_STARTUP_CHECK'] = os.getenv('MONGO_STARTUP_CHECK', 'background').lower()
+    # Structured logging (see app/logs.py); request logs are sampled, off by default
+    app.config['LOG_LEVEL'] = os.getenv('LOG_LEVEL', 'INFO').upper()
+    app.config['LOG_ROUTE_LEVELS'] = os.getenv('LOG_ROUTE_LEVELS', '')
+    app.config['LOG_SAMPLE_RATE'] = float(os.getenv('LOG_SAMPLE_RATE', 0))
+    app.config['LOG_SAMPLE_RATES'] = os.getenv('LOG_SAMPLE_RATES', '')
+    app.config['LOG_QUEUE_SIZE'] = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    # Password hashing pool (app/hashing.py); BCRYPT_LOG_ROUNDS is the bcrypt work factor
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    app.config['PASSWORD_HASH_MAX_PENDING'] = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 0))
+    app.config['PASSWORD_HASH_RETRY_AFTER'] = int(os.getenv('PASSWORD_HASH_RETRY_AFTER', 1))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+    # Background payroll approval jobs (app/jobs.py); 0 workers runs them inline
+    app.config['PAYROLL_JOB_WORKERS'] = int(os.getenv('PAYROLL_JOB_WORKERS', 2))
+    app.config['PAYROLL_JOB_CHUNK_SIZE'] = int(os.getenv('PAYROLL_JOB_CHUNK_SIZE', 1000))
+    app.config['PAYROLL_JOB_STALE_SECONDS'] = int(os.getenv('PAYROLL_JOB_STALE_SECONDS', 300))
+    app.config['PAYROLL_JOB_MAX_ATTEMPTS'] = int(os.getenv('PAYROLL_JOB_MAX_ATTEMPTS', 3))
+    # Partitioned full-roster computation in a process pool (app/parallel.py); 0 workers is serial
+    app.config['PAYROLL_WORKERS'] = int(os.getenv('PAYROLL_WORKERS', 0))
+    app.config['PAYROLL_PARALLEL_MIN'] = int(os.getenv('PAYROLL_PARALLEL_MIN', 50000))
+    app.config['PAYROLL_PARTITIONS_PER_WORKER'] = int(os.getenv('PAYROLL_PARTITIONS_PER_WORKER', 2))
+    # Change-stream watcher (app/changes.py) behind /api/payroll/events; needs a replica set
+    app.config['PAYROLL_WATCH'] = os.getenv('PAYROLL_WATCH', '0').lower() in ('1', 'true', 'yes')
+    app.config['PAYROLL_WATCH_COALESCE_MS'] = int(os.getenv('PAYROLL_WATCH_COALESCE_MS', 500))
+    app.config['PAYROLL_EVENTS_QUEUE_SIZE'] = int(os.getenv('PAYROLL_EVENTS_QUEUE_SIZE', 100))
+    app.config['PAYROLL_EVENTS_HEARTBEAT'] = int(os.getenv('PAYROLL_EVENTS_HEARTBEAT', 15))
+    # Each open stream holds a server thread; keep this below GUNICORN_THREADS (see gunicorn.conf.py)
+    app.config['PAYROLL_EVENTS_MAX_SUBSCRIBERS'] = int(os.getenv('PAYROLL_EVENTS_MAX_SUBSCRIBERS', 2))
+    app.config['PAYROLL_EVENTS_RETRY_AFTER'] = int(os.getenv('PAYROLL_EVENTS_RETRY_AFTER', 30))
+    init_logging(app)
 
     # Initialize MongoDB and JWT
-    mongo.init_app(app)
+    # connect=False: a preloading server imports this in the master, which must not open
+    # sockets or monitor threads that the forked workers would inherit (see connect_mongo)
+    mongo.init_app(app, connect=False, **app.config['MONGO_CLIENT_OPTIONS'])
+    if mongo.db is None:
+        # URI without a database name
+        mongo.db = mongo.cx[app.config['MONGO_DB']]
+    from .jsonprovider import json_provider_class
+    app.json = json_provider_class(app.config['JSON_PROVIDER'])(app)
     jwt.init_app(app)
     bcrypt.init_app(app)
-
-    # Test Mongo Connection
-    try:
-        with app.app_context():
-            mongo.db.command('ping')
-            print("\n✅ MongoDB connected successfully!\n")
-    except Exception as e:
-        print(f"\n❌ MongoDB connection failed: {e}\n")
+    password_hasher.init_app(app)
+    payroll_cache.init_app(app)
+    payroll_jobs.init_app(app, mongo.db)
+    payroll_workers.init_app(app)
+    payroll_watcher.init_app(app, mongo.db)
+    user_cache.init_app(app)
+    init_metrics(app)
 
     # Enable CORS
     # CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGIN']}}, supports_credentials=True)
     # CORS(app, resources={r"/api/*": {"origins": "*"}})
+    app.config['CORS_ALLOWED_ORIGINS'] = ["http://localhost:5173", "http://127.0.0.1:5173"]
     CORS(
     app,
-    resources={r"/api/*": {"origins": ["http://localhost:5173", "http://127.0.0.1:5173"]}},
+    resources={r"/api/*": {"origins": app.config['CORS_ALLOWED_ORIGINS']}},
     supports_credentials=True,
 )
 
@@ -56,13 +127,23 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(personnel_bp, url_prefix="/api/personnel")
     app.register_blueprint(payroll_bp)
+
+    from .cli import db_cli, payroll_cli
+    app.cli.add_command(db_cli)
+    app.cli.add_command(payroll_cli)
+
+    # Models hold collection handles; connect_mongo() re-points them after a fork
+    from routes.personnel import personnel_model
+    from routes.payroll import payroll_model, personnel_model as payroll_personnel_model
+    app.extensions['mongo_models'] = [
+        personnel_model, payroll_model, payroll_personnel_model, *payroll_jobs.models, *payroll_watcher.models,
+    ]
     # app.register_blueprint(personnel_bp, )
 
 
     
     
-    print("✅ Auth blueprint imported successfully")
-    print("✅ Auth blueprint registered at /api/auth")
+    logger.debug("Blueprints registered", extra={"blueprints": sorted(app.blueprints)})
     
     
     # This to show all registered routes
@@ -72,13 +153,75 @@ def create_app():
     #  print()
 
 
-    @app.after_request
-    def after_request(response):
-        print("CORS headers:", response.headers)
-        return response
-    
     @app.route('/')
     def home():
         return "MongoDB connected successfully", 200
 
-    return app
\ No newline at end of file
+    start_mongo_check(app)
+
+    return app
+
+
+def mongo_client_options():
+    """MongoClient pool/timeout settings from the environment (unset ones keep PyMongo defaults)."""
+    env_options = {
+        'maxPoolSize': 'MONGO_MAX_POOL_SIZE',
+        'minPoolSize': 'MONGO_MIN_POOL_SIZE',
+        'waitQueueTimeoutMS': 'MONGO_WAIT_QUEUE_TIMEOUT_MS',
+        'socketTimeoutMS': 'MONGO_SOCKET_TIMEOUT_MS',
+        'connectTimeoutMS': 'MONGO_CONNECT_TIMEOUT_MS',
+        'serverSelectionTimeoutMS': 'MONGO_SERVER_SELECTION_TIMEOUT_MS',
+    }
+    options = {'serverSelectionTimeoutMS': 5000}
+    for option, var in env_options.items():
+        if os.getenv(var):
+            options[option] = int(os.getenv(var))
+    return options
+
+
+def connect_mongo(app):
+    """Create a fresh MongoClient and point mongo.db and every model at it.
+
+    PyMongo clients are not fork-safe, so a preloading server (gunicorn) calls this in each
+    worker after fork instead of reusing the client created in the master.
+    """
+    mongo.cx = MongoClient(app.config['MONGO_URI'], connect=False, **app.config['MONGO_CLIENT_OPTIONS'])
+    mongo.db = mongo.cx.get_default_database(app.config['MONGO_DB'])
+    for model in app.extensions.get('mongo_models', []):
+        model.bind(mongo.db)
+
+
+def check_mongo(app):
+    """Ping Mongo and create indexes; failures are reported, never raised."""
+    try:
+        with app.app_context():
+            mongo.db.command('ping')
+            logger.info("MongoDB connected")
+            if app.config['MONGO_ENSURE_INDEXES']:
+                from models.personnel import PersonnelModel
+                from .indexes import ensure_indexes
+                # Duplicate checks look personnel up by armyNumberKey only; stamp documents written
+                # before the key existed (or imported around the API) first
+                backfilled = PersonnelModel(mongo.db).backfill_keys()
+                if backfilled:
+                    logger.info("Backfilled personnel lookup keys", extra={"documents": backfilled})
+                for label, error in ensure_indexes(mongo.db):
+                    logger.error("Index setup failed", extra={"index": label, "error": error})
+    except Exception as e:
+        logger.error("MongoDB connection failed", extra={"error": str(e)})
+    # Pick up approval jobs left queued or abandoned by a dead worker, now and periodically (the
+    # reaper also covers a Mongo that is down at startup)
+    try:
+        payroll_jobs.start()
+    except Exception as e:
+        logger.error("Resuming payroll jobs failed", extra={"error": str(e)})
+    # Retries on its own until Mongo (and change streams) are there
+    payroll_watcher.start()
+
+
+def start_mongo_check(app, mode=None):
+    mode = mode or app.config['MONGO_STARTUP_CHECK']
+    if mode == 'block':
+        check_mongo(app)
+    elif mode == 'background':
+        threading.Thread(target=check_mongo, args=(app,), name='mongo-startup-check', daemon=True).start()
\ No newline at end of file
@@ -0,0 +1,238 @@
+import asyncio
+import io
+import re
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from bson import ObjectId
+from flask import request
+from flask_jwt_extended import decode_token
+from pymongo import AsyncMongoClient, uri_parser
+
+from . import payroll_cache, payroll_workers
+
+
+def wsgi_environ(scope):
+    """WSGI environ for a body-less ASGI request, enough to push a Flask request context."""
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "SERVER_NAME": (scope.get("server") or ("localhost", 80))[0],
+        "SERVER_PORT": str((scope.get("server") or ("localhost", 80))[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers") or []:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        value = value.decode("latin-1")
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+class AsyncPayrollApp:
+    """ASGI application for the payroll API.
+
+    The read-heavy routes (payroll preview/run/history, personnel list/get) are served natively on
+    asyncio with AsyncMongoClient, so a slow Mongo round trip no longer pins a worker thread. They
+    reuse the Flask app's models, cache and JSON provider and return the same bodies and status
+    codes, and run inside a Flask request context so the app's request hooks (request logging,
+    /metrics, CORS) apply to them as to any Flask route. Everything else (writes, ndjson streams,
+    CORS preflight, auth errors) is handed to the Flask WSGI app through asgiref.
+    """
+
+    def __init__(self, flask_app):
+        from routes.payroll import payroll_model
+        from routes.personnel import personnel_model
+
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.payroll_model = payroll_model
+        self.personnel_model = personnel_model
+        self._client = None
+        self._db = None
+        self.routes = [
+            ("GET", re.compile(r"^/api/payroll/preview/?$"), self.preview, True),
+            ("GET", re.compile(r"^/api/payroll/run/?$"), self.payroll_run, True),
+            ("GET", re.compile(r"^/api/payroll/history/?$"), self.history, True),
+            ("GET", re.compile(r"^/api/personnel/?$"), self.list_personnel, False),
+            ("GET", re.compile(r"^/api/personnel/(?P<pid>[^/]+)/?$"), self.get_personnel, False),
+        ]
+
+    @property
+    def db(self):
+        if self._db is None:
+            config = self.flask_app.config
+            uri = config["MONGO_URI"]
+            self._client = AsyncMongoClient(uri, **config.get("MONGO_CLIENT_OPTIONS", {}))
+            name = uri_parser.parse_uri(uri)["database"] or config["MONGO_DB"]
+            self._db = self._client[name]
+        return self._db
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+        if scope["type"] == "http":
+            for method, pattern, handler, auth in self.routes:
+                match = pattern.match(scope["path"])
+                if match and scope["method"] == method:
+                    response = await self._dispatch(scope, handler, auth, match.groupdict())
+                    if response is not None:
+                        return await self._send(send, response)
+                    break
+        return await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._client is not None:
+                    await self._client.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _dispatch(self, scope, handler, auth, params):
+        """Run a native handler; None means 'let the Flask app answer this request'.
+
+        The handler runs between the app's before_request and after_request/teardown hooks, and
+        its (body, status) goes through Flask's make_response, so the response is finished exactly
+        like a Flask view's. Unhandled errors become the app's usual 500.
+        """
+        if auth and self._identity(scope) is None:
+            return None
+        app = self.flask_app
+        with app.request_context(wsgi_environ(scope)):
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await handler(request.args, **params)
+                    if rv is None:
+                        return None
+                return app.finalize_request(rv)
+            except Exception as e:
+                return app.handle_exception(e)
+
+    def _identity(self, scope):
+        """JWT identity of the request, or None (Flask then produces the usual 401/422)."""
+        headers = dict(scope.get("headers") or [])
+        value = headers.get(b"authorization", b"").decode("latin-1")
+        if not value.startswith("Bearer "):
+            return None
+        try:
+            with self.flask_app.app_context():
+                claims = decode_token(value[len("Bearer "):])
+        except Exception:
+            return None
+        if claims.get("type") != "access":
+            return None
+        return claims.get(self.flask_app.config.get("JWT_IDENTITY_CLAIM", "sub"))
+
+    async def _send(self, send, response):
+        headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in response.headers.items()]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": response.get_data()})
+
+    # ---------------------------------------------------------
+    # Native handlers: return (body, status) or None to fall back
+    # ---------------------------------------------------------
+    async def preview(self, args):
+        from models.payroll import ACTIVE_ROSTER, ROSTER_PROJECTION
+        from models.personnel import PersonnelModel
+        from routes.payroll import preview_cache_key
+
+        if not args.get("period"):
+            return {"error": "Missing period parameter"}, 400
+        if args.get("stream"):
+            return None
+        counter = await self.db.counters.find_one({"_id": PersonnelModel.VERSION_ID})
+        key = preview_cache_key(counter.get("version", 0) if counter else 0)
+        # The cache may be Redis-backed: keep its round trips off the event loop
+        result = await asyncio.to_thread(payroll_cache.get, key)
+        if result is None:
+            if payroll_workers.workers:
+                # Same partitioned computation as the WSGI route (serial below PAYROLL_PARALLEL_MIN)
+                result = await asyncio.to_thread(payroll_workers.preview_records, self.payroll_model)
+            else:
+                personnel = await self.db.personnel.find(ACTIVE_ROSTER, ROSTER_PROJECTION).sort("_id", 1).to_list(None)
+                if personnel:
+                    result = await asyncio.to_thread(self.payroll_model.preview_records, personnel)
+                else:
+                    result = ([], {})
+            await asyncio.to_thread(payroll_cache.set, key, result)
+        entries, totals = result
+        return {"entries": entries, "totals": totals}, 200
+
+    async def payroll_run(self, args):
+        from models.payroll import ENTRY_PROJECTION, RUN_HEADER_PROJECTION
+        from routes.payroll import run_payload
+
+        period = args.get("period")
+        if not period:
+            return {"error": "Missing period parameter"}, 400
+        if args.get("stream"):
+            return None
+        run = await self.db.payroll_runs.find_one({"period": period}, RUN_HEADER_PROJECTION)
+        if run and "rev" not in run:
+            return None  # old layout: the sync path migrates it
+        entries = []
+        if run:
+            entries = await self.db.payroll_entries.find(
+                {"period": period, "rev": run["rev"]}, ENTRY_PROJECTION).sort("_id", 1).to_list(None)
+        return run_payload(period, run, entries), 200
+
+    async def history(self, args):
+        from routes.payroll import history_args
+
+        model = self.payroll_model
+        try:
+            spec = model.history_query(**history_args(args))
+        except ValueError as ve:
+            return {"error": str(ve)}, 400
+        docs = await (
+            self.db.payroll_runs.find(spec["query"], spec["projection"])
+            .sort(spec["sort"])
+            .limit(spec["limit"] + 1)
+            .to_list(None)
+        )
+        runs, next_cursor = model.history_result(docs, spec["limit"])
+        return {"runs": runs, "nextCursor": next_cursor}, 200
+
+    async def list_personnel(self, args):
+        from routes.personnel import page_args
+
+        model = self.personnel_model
+        try:
+            spec = model.page_query(**page_args(args))
+        except ValueError as ve:
+            return {"error": str(ve)}, 400
+        docs = await (
+            self.db.personnel.find(spec["query"], spec["projection"])
+            .sort(spec["sort"])
+            .limit(spec["limit"] + 1)
+            .to_list(None)
+        )
+        people, next_cursor = model.page_result(docs, spec["limit"])
+        return {"personnel": people, "nextCursor": next_cursor}, 200
+
+    async def get_personnel(self, args, pid):
+        try:
+            oid = ObjectId(pid)
+        except Exception:
+            return {"error": "Personnel not found"}, 404
+        doc = await self.db.personnel.find_one({"_id": oid})
+        if not doc:
+            return {"error": "Personnel not found"}, 404
+        return self.personnel_model.to_dict(doc), 200
@@ -1,12 +1,16 @@
 
 
+import logging
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
 from bson import ObjectId
 from datetime import datetime, timezone
-from . import mongo, bcrypt
+from . import mongo, password_hasher, user_cache
+from .hashing import HashingBusy
+from .metrics import bcrypt_seconds
 
 auth_bp = Blueprint("auth", __name__)
+logger = logging.getLogger(__name__)
 
 def to_iso_now():
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
@@ -20,6 +24,40 @@ def to_id(doc):
     return doc
 
 
+def public_user(user):
+    """Safe public user info (no password)."""
+    return {
+        "_id": str(user["_id"]),
+        "fullName": user["fullName"],
+        "email": user["email"],
+        "username": user["username"],
+        "role": user.get("role", "Finance Officer"),
+        "createdAt": user.get("createdAt"),
+    }
+
+
+def load_user(user_id):
+    """Public user for a JWT identity, from the user cache when possible (None if not found).
+
+    The API never modifies an existing user (signup only inserts), so cached entries are not
+    invalidated: a role or profile edited directly in the database shows up once the entry
+    expires, after at most USER_CACHE_TTL seconds.
+    """
+    user_public = user_cache.get(user_id)
+    if user_public is None:
+        user = mongo.db.users.find_one({"_id": ObjectId(user_id)}, {"password": 0})
+        if not user:
+            return None
+        user_public = public_user(user)
+        user_cache.set(user_id, user_public)
+    return user_public
+
+
+def _busy(busy):
+    """503 with Retry-After when the password hashing pool is saturated."""
+    return jsonify({"error": str(busy)}), 503, {"Retry-After": str(busy.retry_after)}
+
+
 # ---------- SIGNUP ----------
 @auth_bp.route("/signup", methods=["POST"])
 def signup():
@@ -38,11 +76,17 @@ def signup():
     if db.users.find_one({"$or": [{"email": email}, {"username": username}]}):
         return jsonify({"error": "Email or username already exists."}), 409
 
+    try:
+        with bcrypt_seconds.time(op="hash"):
+            password_hash = password_hasher.hash(password)
+    except HashingBusy as busy:
+        return _busy(busy)
+
     user_doc = {
         "fullName": fullName,
         "email": email,
         "username": username,
-        "password": bcrypt.generate_password_hash(password).decode("utf-8"),
+        "password": password_hash,
         "role": role,
         "createdAt": to_iso_now(),
     }
@@ -99,22 +143,23 @@ def login():
     password = (data.get("password") or "").strip()
 
     user = db.users.find_one({"email": email})
-    if not user or not bcrypt.check_password_hash(user["password"], password):
+    if not user:
+        return jsonify({"error": "Invalid email or password"}), 401
+    try:
+        with bcrypt_seconds.time(op="check"):
+            valid = password_hasher.check(user["password"], password)
+    except HashingBusy as busy:
+        return _busy(busy)
+    if not valid:
         return jsonify({"error": "Invalid email or password"}), 401
 
     access_token = create_access_token(identity=str(user["_id"]))
 
-    # Prepare safe public user info (no password)
-    user_public = {
-        "_id": str(user["_id"]),
-        "fullName": user["fullName"],
-        "email": user["email"],
-        "username": user["username"],
-        "role": user.get("role", "Finance Officer"),
-        "createdAt": user.get("createdAt"),
-    }
+    # Prepare safe public user info (no password); warms the cache for /profile
+    user_public = public_user(user)
+    user_cache.set(user_public["_id"], user_public)
 
-    print("🟢 Login successful!")
+    logger.debug("Login successful", extra={"user_id": user_public["_id"]})
     return jsonify({
         "message": "Login successful",
         "token": access_token,
@@ -143,21 +188,11 @@ def login():
 @auth_bp.route("/profile", methods=["GET"])
 @jwt_required()
 def profile():
-    user_id = get_jwt_identity()
-    user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+    user_public = load_user(get_jwt_identity())
 
-    if not user:
+    if not user_public:
         return jsonify({"error": "User not found"}), 404
 
-    user_public = {
-        "_id": str(user["_id"]),
-        "fullName": user["fullName"],
-        "email": user["email"],
-        "username": user["username"],
-        "role": user.get("role", "Finance Officer"),
-        "createdAt": user.get("createdAt"),
-    }
-
     return jsonify({
         "user": user_public
     }), 200
@@ -171,8 +206,7 @@ def logout():
     But this route lets the frontend trigger a logout confirmation
     and optionally log the event for auditing.
     """
-    user_id = get_jwt_identity()
-    user = mongo.db.users.find_one({"_id": ObjectId(user_id)})
+    user = load_user(get_jwt_identity())
 
     if not user:
         return jsonify({"error": "User not found"}), 404
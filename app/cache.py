@@ -0,0 +1,194 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheBackend:
+    """Storage interface used by ResultCache. Values are opaque Python objects."""
+
+    name = "base"
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        return 0
+
+
+class LRUBackend(CacheBackend):
+    """In-process, thread-safe LRU holding at most `maxsize` results.
+
+    With a `ttl` (seconds) entries also expire, for data that can change without a version bump.
+    """
+
+    name = "lru"
+
+    def __init__(self, maxsize=8, on_evict=None, ttl=None):
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            expires, value = self._data[key]
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                if self.on_evict:
+                    self.on_evict()
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend(CacheBackend):
+    """Shared backend for any redis-py compatible client (get/set/delete/scan_iter).
+
+    Values are pickled; keys expire after `ttl` seconds so stale versions age out on their own.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix="payroll:", ttl=3600):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(match=self.prefix + "*"):
+            self.client.delete(key)
+
+
+class ResultCache:
+    """Cache for computed payroll results with hit/miss/eviction counters.
+
+    Callers put the personnel change version in the key, so a bump of that version invalidates
+    every cached result without an explicit delete.
+    """
+
+    name = "payroll_cache"
+    config_prefix = "PAYROLL_CACHE"
+    redis_prefix = "payroll:"
+    default_size = 8
+    default_ttl = 3600
+    expire_lru = False
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def init_app(self, app):
+        prefix = self.config_prefix
+        ttl = app.config.get(f"{prefix}_TTL", self.default_ttl)
+        kind = (app.config.get(f"{prefix}_BACKEND") or "lru").lower()
+        if kind == "none":
+            self.backend = None
+        elif kind == "redis":
+            import redis  # optional dependency, only needed for the shared backend
+            client = redis.Redis.from_url(app.config["REDIS_URL"])
+            self.backend = RedisBackend(client, prefix=self.redis_prefix, ttl=ttl)
+        else:
+            self.backend = LRUBackend(app.config.get(f"{prefix}_SIZE", self.default_size),
+                                      on_evict=self._evicted, ttl=ttl if self.expire_lru else None)
+        app.extensions[self.name] = self
+
+    def _evicted(self):
+        with self._lock:
+            self.evictions += 1
+
+    def get(self, key):
+        value = self.backend.get(key) if self.backend is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def delete(self, key):
+        if self.backend is not None:
+            self.backend.delete(key)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def stats(self):
+        backend = self.backend
+        return {
+            "backend": backend.name if backend is not None else "none",
+            "size": len(backend) if backend is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class UserCache(ResultCache):
+    """Public user records keyed by JWT identity.
+
+    There is no version to key on here, and users are only edited outside the API, so entries
+    are never invalidated: they expire after USER_CACHE_TTL seconds, which bounds how long a
+    changed role or profile can be served stale.
+    """
+
+    name = "user_cache"
+    config_prefix = "USER_CACHE"
+    redis_prefix = "user:"
+    default_size = 10000
+    default_ttl = 60
+    expire_lru = True
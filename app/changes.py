@@ -0,0 +1,305 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .metrics import Counter, Gauge, registry
+
+logger = logging.getLogger(__name__)
+
+change_events_total = registry.register(Counter(
+    "payroll_change_events_total", "Change-stream events seen by the watcher, by collection.", ("collection",)))
+event_subscribers = registry.register(Gauge(
+    "payroll_event_subscribers", "Open /api/payroll/events streams."))
+
+WATCHED = ("personnel", "payroll_runs")
+# Header fields pushed with run events (entries stay in payroll_entries)
+RUN_EVENT_FIELDS = ("period", "totals", "entry_count", "approved_by", "approved_at", "updated_at")
+# Server errors that mean change streams are unavailable here (standalone mongod, no permission)
+NO_CHANGE_STREAMS = {40573, 13, 136}
+HISTORY_LOST = 286
+# Seconds between attempts to reopen the streams (doubling up to MAX_BACKOFF)
+BACKOFF = 1
+MAX_BACKOFF = 30
+
+
+class TooManySubscribers(Exception):
+    """This process already serves PAYROLL_EVENTS_MAX_SUBSCRIBERS event streams."""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many open live-update streams, please retry later.")
+        self.retry_after = retry_after
+
+
+class Subscription:
+    """One SSE client's queue of events, optionally limited to a period."""
+
+    def __init__(self, broker, period=None, maxsize=100):
+        self.broker = broker
+        self.period = period
+        self.lagged = False
+        self._queue = queue.Queue(maxsize)
+
+    def wants(self, event):
+        period = event.get("period")
+        return self.period is None or period is None or period == self.period
+
+    def put(self, event):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Slow client: drop events and tell it to refetch once it catches up
+            self.lagged = True
+
+    def get(self, timeout):
+        """Next event, {"type": "resync"} after dropped events; raises queue.Empty on timeout."""
+        if self.lagged:
+            self.lagged = False
+            return {"type": "resync", "period": self.period}
+        return self._queue.get(timeout=timeout)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    """In-process fan-out of change events to the open SSE streams.
+
+    Each open stream holds a server thread for as long as the client stays connected, so at most
+    `max_subscribers` (0 = no limit) may be open in one process; beyond that subscribe() raises
+    TooManySubscribers and the other requests keep their threads.
+    """
+
+    def __init__(self, maxsize=100, max_subscribers=0, retry_after=30):
+        self.maxsize = maxsize
+        self.max_subscribers = max_subscribers
+        self.retry_after = retry_after
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, period=None):
+        sub = Subscription(self, period, self.maxsize)
+        with self._lock:
+            if self.max_subscribers and len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(self.retry_after)
+            self._subscribers.add(sub)
+        event_subscribers.inc()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            if sub not in self._subscribers:
+                return
+            self._subscribers.discard(sub)
+        event_subscribers.dec()
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for sub in subscribers:
+            if sub.wants(event):
+                sub.put(event)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+class ChangeWatcher:
+    """Follows the personnel and payroll_runs change streams in a background thread.
+
+    Personnel changes from anywhere (this API, direct imports, other services) bump the
+    personnel version, which every cached preview and summary is keyed on; events arriving
+    within PAYROLL_WATCH_COALESCE_MS of each other share one bump. Run header changes are
+    pushed as they happen, an update carrying only the fields it changed. Both go to the
+    EventBroker behind GET /api/payroll/events.
+
+    Personnel events arrive without their documents (only the fact that something changed is
+    used); run headers changed in a burst are read back with one find.
+
+    The thread never gives up: whatever ends the streams (network errors, an invalidate, lost
+    oplog history, a bug while handling a burst) it waits with backoff and reopens them, starting
+    over from "now" with a version bump and a resync event whenever changes may have been missed.
+
+    Needs a replica set or sharded cluster (a single-node replica set is enough). PAYROLL_WATCH
+    is off by default; on a standalone server the watcher logs an error once, reports itself
+    unavailable and keeps checking every MAX_BACKOFF seconds.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.coalesce = 0.5
+        self.broker = EventBroker()
+        self.personnel = None
+        self.resume_token = None
+        self.unavailable = False
+        self._backoff = BACKOFF
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        from models.personnel import PersonnelModel
+        self.enabled = app.config["PAYROLL_WATCH"]
+        self.coalesce = app.config["PAYROLL_WATCH_COALESCE_MS"] / 1000
+        self.broker = EventBroker(app.config["PAYROLL_EVENTS_QUEUE_SIZE"],
+                                  app.config["PAYROLL_EVENTS_MAX_SUBSCRIBERS"],
+                                  app.config["PAYROLL_EVENTS_RETRY_AFTER"])
+        self.personnel = PersonnelModel(db)
+        app.extensions["payroll_watcher"] = self
+
+    @property
+    def models(self):
+        return [self.personnel]
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    @property
+    def available(self):
+        """Whether events can be served: the thread runs and the server supports change streams."""
+        return self.running and not self.unavailable
+
+    def start(self):
+        """Start following the streams in this process (again after a fork); no-op when disabled."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="payroll-watcher", daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self.running:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._follow()
+                if self._stop.is_set():
+                    return
+                # Invalidated (collection or database dropped/renamed): the token cannot be resumed
+                logger.warning("Change stream closed, restarting")
+                self._resync()
+            except OperationFailure as e:
+                if e.code in NO_CHANGE_STREAMS:
+                    if not self.unavailable:
+                        logger.error("Change streams unavailable, live payroll updates are off", extra={"error": str(e)})
+                    self.unavailable = True
+                    self._backoff = MAX_BACKOFF
+                elif e.code == HISTORY_LOST:
+                    # Fell off the oplog: start over from now and assume everything changed
+                    logger.warning("Change stream history lost, resynchronizing")
+                    self._resync()
+                    continue
+                else:
+                    logger.error("Change stream failed", extra={"error": str(e)})
+            except PyMongoError as e:
+                # Resumable from the last token once the server is back
+                logger.error("Change stream failed", extra={"error": str(e)})
+            except Exception as e:
+                # Handling a burst failed: skip past it rather than replaying it forever
+                logger.exception("Change stream handler failed", extra={"error": str(e)})
+                self._resync()
+            self._stop.wait(self._backoff)
+            self._backoff = min(self._backoff * 2, MAX_BACKOFF)
+
+    def _resync(self):
+        """Restart from the current time; caches and clients must assume they missed changes."""
+        self.resume_token = None
+        try:
+            self.personnel.bump_version()
+        except PyMongoError as e:
+            logger.error("Personnel version bump failed", extra={"error": str(e)})
+        self.broker.publish({"type": "resync"})
+
+    def _follow(self):
+        db = self.personnel.collection.database
+        pipeline = [
+            {"$match": {
+                "ns.coll": {"$in": list(WATCHED)},
+                "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+            }},
+            # Personnel documents are never used, only the fact that one changed
+            {"$set": {"fullDocument": {"$cond": [{"$eq": ["$ns.coll", "personnel"]}, "$$REMOVE", "$fullDocument"]}}},
+        ]
+        with db.watch(pipeline, resume_after=self.resume_token,
+                      max_await_time_ms=int(self.coalesce * 1000) or 100) as stream:
+            logger.info("Watching personnel and payroll_runs for changes")
+            self.unavailable = False
+            self._backoff = BACKOFF
+            pending, first_at = [], None
+            while not self._stop.is_set() and stream.alive:
+                change = stream.try_next()
+                if change is not None:
+                    pending.append(change)
+                    first_at = first_at or time.monotonic()
+                if pending and (change is None or time.monotonic() - first_at >= self.coalesce):
+                    self._flush(pending)
+                    self.resume_token = stream.resume_token
+                    pending, first_at = [], None
+                elif change is None:
+                    self.resume_token = stream.resume_token
+
+    def _flush(self, changes):
+        """Apply and publish a burst of change events."""
+        ops, last_time = {}, None
+        runs, run_fields = {}, {}
+        for change in changes:
+            coll = change["ns"]["coll"]
+            change_events_total.inc(collection=coll)
+            if coll == "personnel":
+                op = change["operationType"]
+                ops[op] = ops.get(op, 0) + 1
+                last_time = change.get("clusterTime") or last_time
+            else:
+                # One event per run header and burst: the latest, with every field the burst changed
+                run_id = change["documentKey"]["_id"]
+                runs[run_id] = change
+                changed = (change.get("updateDescription") or {}).get("updatedFields") or {}
+                run_fields.setdefault(run_id, set()).update(k.split(".", 1)[0] for k in changed)
+
+        if ops:
+            if last_time is not None:
+                self.personnel.bump_version_at(last_time)
+            else:
+                self.personnel.bump_version()
+            self.broker.publish({
+                "type": "personnel",
+                "changes": sum(ops.values()),
+                "ops": ops,
+                "version": self.personnel.version(),
+            })
+        updated = [run_id for run_id, change in runs.items() if change["operationType"] == "update"]
+        current = {}
+        if updated:
+            runs_collection = self.personnel.collection.database.payroll_runs
+            projection = dict.fromkeys(RUN_EVENT_FIELDS, 1)
+            current = {d["_id"]: d for d in runs_collection.find({"_id": {"$in": updated}}, projection)}
+        for run_id, change in runs.items():
+            self.broker.publish(run_event(run_id, change, run_fields[run_id], current.get(run_id)))
+
+
+def run_event(run_id, change, fields, current=None):
+    """SSE payload for a run header change; `fields` are the top-level fields updates touched
+    (a $inc of totals.gross reports as totals, sent whole) and `current` the header as read after
+    the burst (updates carry no full document)."""
+    op = change["operationType"]
+    doc = change.get("fullDocument") or current or {}
+    event = {"type": "run", "op": op, "id": str(run_id), "period": doc.get("period")}
+    if op == "delete":
+        return event
+    if op == "update":
+        event["updated"] = {k: doc.get(k) for k in RUN_EVENT_FIELDS if k in fields}
+    else:
+        event["run"] = {k: doc.get(k) for k in RUN_EVENT_FIELDS}
+    return event
@@ -0,0 +1,124 @@
+import click
+from flask.cli import AppGroup
+from . import mongo
+
+payroll_cli = AppGroup("payroll", help="Payroll maintenance commands.")
+db_cli = AppGroup("db", help="Database setup commands.")
+
+
+@db_cli.command("init-indexes")
+def init_indexes():
+    """Backfill armyNumberKey and create all indexes."""
+    from models.personnel import PersonnelModel
+    from .indexes import ensure_indexes
+    updated = PersonnelModel(mongo.db).backfill_keys()
+    click.echo(f"Backfilled armyNumberKey on {updated} personnel document(s).")
+    failures = ensure_indexes(mongo.db)
+    for label, error in failures:
+        click.echo(f"Index setup failed for {label}: {error}", err=True)
+    if failures:
+        raise SystemExit(1)
+    click.echo("Indexes are up to date.")
+
+
+@db_cli.command("migrate-personnel")
+@click.option("--batch-size", default=1000, show_default=True)
+@click.option("--dry-run", is_flag=True, help="Count the documents that would be rewritten.")
+def migrate_personnel(batch_size, dry_run):
+    """Rewrite legacy personnel documents into the canonical schema (schemaVersion)."""
+    from models.personnel import PersonnelModel
+    scanned, migrated = PersonnelModel(mongo.db).migrate_schema(batch_size=batch_size, dry_run=dry_run)
+    verb = "Would migrate" if dry_run else "Migrated"
+    click.echo(f"{verb} {migrated} of {scanned} non-canonical personnel document(s).")
+    if not dry_run and migrated < scanned:
+        click.echo("Some documents changed while migrating; run the command again to pick them up.", err=True)
+
+
+@db_cli.command("explain")
+def explain():
+    """Show the query plan of every hot query and fail if one is a collection scan."""
+    from .indexes import explain_hot_queries
+    report = explain_hot_queries(mongo.db)
+    for label, stages, uses_index in report:
+        click.echo(f"{'ok  ' if uses_index else 'SCAN'} {label}: {' <- '.join(stages)}")
+    if not all(uses_index for _, _, uses_index in report):
+        raise SystemExit(1)
+
+
+@payroll_cli.command("migrate-runs")
+def migrate_runs():
+    """Move embedded run entries into the payroll_entries collection."""
+    from models.payroll import PayrollModel
+    model = PayrollModel(mongo.db)
+    model.ensure_indexes()
+    migrated = model.migrate_runs()
+    click.echo(f"Migrated {migrated} payroll run(s) to the per-entry layout.")
+
+
+@payroll_cli.command("resume-jobs")
+def resume_jobs():
+    """Run queued payroll approval jobs and resume abandoned ones in this process."""
+    from . import payroll_jobs
+    payroll_jobs.workers = 0
+    resumed = payroll_jobs.resume()
+    click.echo(f"Ran {resumed} payroll job(s).")
+
+
+@payroll_cli.command("verify-totals")
+@click.option("--period", "periods", multiple=True, help="Period to check (default: every run).")
+@click.option("--repair", is_flag=True, help="Overwrite stored totals that drifted from the entries.")
+def verify_totals(periods, repair):
+    """Recompute run totals from their entries and report (or repair) drift."""
+    from models.payroll import PayrollModel
+    model = PayrollModel(mongo.db)
+    periods = periods or [r["period"] for r in model.collection.find({}, {"period": 1})]
+    for period in periods:
+        report = model.verify_totals(period, repair=repair)
+        if report is None:
+            click.echo(f"{period}: no payroll run")
+            continue
+        status = "ok" if report["ok"] else ("repaired" if report["repaired"] else "MISMATCH")
+        click.echo(f"{period}: {status} entries={report['entry_count']} drift={report['drift']}")
+
+
+@payroll_cli.command("check-summary")
+@click.option("--period", help="Check a stored run instead of the active roster.")
+@click.option("--group-by", default="region,corps,rank,fmn_unit", show_default=True)
+@click.option("--tolerance", default=0.005, show_default=True)
+def check_summary(period, group_by, tolerance):
+    """Compare the aggregation summary with the Python payroll engine."""
+    from models.payroll import PayrollModel
+    from models.payroll_aggregate import summarize_entries
+    model = PayrollModel(mongo.db)
+    group_by = [g for g in group_by.split(",") if g]
+    if period:
+        got = model.summarize_run(period, group_by)
+        expected = summarize_entries(model.get_entries(period), group_by)
+    else:
+        got = model.summarize_personnel(group_by)
+        entries, _ = model.compute_preview(list(model.people.find({"active": True})))
+        expected = summarize_entries(entries, group_by)
+
+    problems = []
+    if got["count"] != expected["count"]:
+        problems.append(f"count: {got['count']} != {expected['count']}")
+    for k, v in expected["totals"].items():
+        if abs(got["totals"].get(k, 0) - v) > tolerance:
+            problems.append(f"totals.{k}: {got['totals'].get(k)} != {v}")
+    for group in group_by:
+        rows = {r["key"]: r for r in got["groups"][group]}
+        for want in expected["groups"][group]:
+            row = rows.pop(want["key"], None)
+            if row is None:
+                problems.append(f"{group}={want['key']!r}: missing")
+                continue
+            for k in ("count", "gross", "allowances", "deductions", "net"):
+                if abs(row[k] - want[k]) > tolerance:
+                    problems.append(f"{group}={want['key']!r} {k}: {row[k]} != {want[k]}")
+        problems += [f"{group}={k!r}: unexpected group" for k in rows]
+
+    for problem in problems:
+        click.echo(problem, err=True)
+    if problems:
+        raise SystemExit(1)
+    click.echo(f"Summary matches the Python engine ({expected['count']} entries, groups: {', '.join(group_by) or 'none'}).")
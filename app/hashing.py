@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+from .metrics import Gauge, registry
+
+password_hash_pending = registry.register(Gauge(
+    "password_hash_pending", "Password hash/check jobs queued or running in the worker pool."))
+
+
+class HashingBusy(Exception):
+    """The password hashing pool is at its queue-depth limit, too slow, or lost a worker."""
+
+    def __init__(self, retry_after):
+        super().__init__("Too many concurrent sign-ins, please retry shortly.")
+        self.retry_after = retry_after
+
+
+def _hash_password(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check_password(pw_hash, password):
+    try:
+        return bcrypt.checkpw(password.encode("utf-8"), pw_hash.encode("utf-8"))
+    except ValueError:
+        # Malformed stored hash
+        return False
+
+
+class PasswordHasher:
+    """bcrypt in a bounded process pool, off the request threads and outside the GIL.
+
+    Hashes are compatible with Flask-Bcrypt's. At most PASSWORD_HASH_MAX_PENDING jobs may be queued
+    or running; beyond that callers get HashingBusy right away instead of waiting behind the
+    queue. A caller that waits longer than PASSWORD_HASH_TIMEOUT also gets HashingBusy, but the
+    job keeps its slot until it actually finishes. A pool whose worker died is replaced on the next
+    call. PASSWORD_HASH_WORKERS=0 hashes inline (useful for the dev server and scripts).
+    """
+
+    def __init__(self):
+        self.workers = 0
+        self.rounds = 12
+        self.max_pending = 0
+        self.retry_after = 1
+        self.timeout = None
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config["PASSWORD_HASH_WORKERS"]
+        self.rounds = app.config["BCRYPT_LOG_ROUNDS"]
+        self.max_pending = app.config["PASSWORD_HASH_MAX_PENDING"] or max(1, self.workers) * 8
+        self.retry_after = app.config["PASSWORD_HASH_RETRY_AFTER"]
+        self.timeout = app.config["PASSWORD_HASH_TIMEOUT"]
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions["password_hasher"] = self
+
+    def _pool(self):
+        # Created lazily, and again in forked workers (a pool does not survive fork)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver"))
+                self._pid = os.getpid()
+            return self._executor
+
+    def _discard(self, executor):
+        # A worker died (OOM kill, segfault): the pool is unusable, the next call starts a new one
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future=None):
+        password_hash_pending.dec()
+        self._slots.release()
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy(self.retry_after)
+        password_hash_pending.inc()
+        try:
+            executor = self._pool()
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release()
+            self._discard(executor)
+            raise HashingBusy(self.retry_after)
+        except BaseException:
+            self._release()
+            raise
+        # Released when the job ends, not when this caller stops waiting for it
+        future.add_done_callback(self._release)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashingBusy(self.retry_after)
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise HashingBusy(self.retry_after)
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.rounds)
+
+    def check(self, pw_hash, password):
+        return self._run(_check_password, pw_hash, password)
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
@@ -0,0 +1,68 @@
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+# Queries on the request hot paths: (label, collection, filter, sort)
+HOT_QUERIES = [
+    ("personnel active roster", "personnel", {"active": True}, None),
+    ("personnel newest first", "personnel", {}, [("created_at", -1)]),
+    ("personnel by armyNumberKey", "personnel", {"armyNumberKey": "na/0000001"}, None),
+    ("personnel search (q=)", "personnel",
+     {"$or": [{"armyNumberKey": {"$regex": "^sold"}}, {"fullNameKey": {"$regex": "^sold"}}]},
+     [("created_at", -1), ("_id", -1)]),
+    ("payroll run by period", "payroll_runs", {"period": "2025-01"}, None),
+    ("payroll history", "payroll_runs", {}, [("approved_at", -1), ("_id", -1)]),
+    ("payroll history in a date range", "payroll_runs",
+     {"approved_at": {"$gte": "2025-01-01T00:00:00.000000Z", "$lt": "2025-02-01T00:00:00.000000Z"}},
+     [("approved_at", -1), ("_id", -1)]),
+    ("payroll entries of a run", "payroll_entries", {"period": "2025-01", "rev": None}, [("_id", 1)]),
+    ("payroll job by active period", "payroll_jobs", {"active_period": "2025-01"}, None),
+    ("payroll entry by person", "payroll_entries", {"period": "2025-01", "rev": None, "person_id": ObjectId()}, None),
+    ("user by email", "users", {"email": "officer@example.com"}, None),
+    ("user by username", "users", {"username": "officer"}, None),
+]
+
+
+def ensure_indexes(db):
+    """Create the indexes every hot query relies on. Returns a list of failures (label, error)."""
+    from models.personnel import PersonnelModel
+    from models.payroll import PayrollModel
+    from models.payroll_job import PayrollJobModel
+
+    steps = [
+        ("personnel", PersonnelModel(db).ensure_indexes),
+        ("payroll", PayrollModel(db).ensure_indexes),
+        ("payroll_jobs", PayrollJobModel(db).ensure_indexes),
+        ("users.email", lambda: db.users.create_index("email", unique=True)),
+        ("users.username", lambda: db.users.create_index("username", unique=True)),
+    ]
+    failures = []
+    for label, step in steps:
+        try:
+            step()
+        except PyMongoError as e:
+            failures.append((label, str(e)))
+    return failures
+
+
+def _stages(plan):
+    """All stage names in an explain() plan tree."""
+    stages = [plan.get("stage")] if plan.get("stage") else []
+    for key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(key), dict):
+            stages += _stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return stages
+
+
+def explain_hot_queries(db):
+    """Explain each hot query; returns [(label, stages, uses_index)]."""
+    report = []
+    for label, collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query).limit(50)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages = _stages(plan)
+        report.append((label, stages, "COLLSCAN" not in stages))
+    return report
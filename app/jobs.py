@@ -0,0 +1,192 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+
+from bson import ObjectId
+
+from .metrics import Counter, registry
+
+logger = logging.getLogger(__name__)
+
+payroll_jobs_total = registry.register(Counter(
+    "payroll_jobs_total", "Payroll approval jobs finished, by status.", ("status",)))
+
+
+class PayrollJobRunner:
+    """Runs full-payroll approvals from the payroll_jobs collection in a small thread pool.
+
+    The queue itself is the Mongo collection, so a job survives the process that accepted it:
+    every worker claims queued jobs and jobs whose heartbeat went stale (PAYROLL_JOB_STALE_SECONDS)
+    on startup and every half of that period afterwards, and carries on from the job's last
+    checkpoint. A job that fails twice in a row in one worker, or has been claimed more than
+    PAYROLL_JOB_MAX_ATTEMPTS times, is marked failed and releases its period.
+    """
+
+    def __init__(self):
+        self.workers = 2
+        self.chunk_size = 1000
+        self.stale_after = 300
+        self.max_attempts = 3
+        self.jobs = None
+        self.payroll = None
+        self._executor = None
+        self._pid = None
+        self._reaper = None
+        self._reaper_pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app, db):
+        from models.payroll import PayrollModel
+        from models.payroll_job import PayrollJobModel
+        self.workers = app.config["PAYROLL_JOB_WORKERS"]
+        self.chunk_size = app.config["PAYROLL_JOB_CHUNK_SIZE"]
+        self.stale_after = app.config["PAYROLL_JOB_STALE_SECONDS"]
+        self.max_attempts = app.config["PAYROLL_JOB_MAX_ATTEMPTS"]
+        self.jobs = PayrollJobModel(db)
+        self.payroll = PayrollModel(db)
+        app.extensions["payroll_jobs"] = self
+
+    @property
+    def models(self):
+        return [self.jobs, self.payroll]
+
+    def _pool(self):
+        # Created lazily, and again in forked workers (threads do not survive fork)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix="payroll-job")
+                self._pid = os.getpid()
+            return self._executor
+
+    def submit(self, job_id):
+        """Run a job in the pool; PAYROLL_JOB_WORKERS=0 runs it inline (scripts, tests)."""
+        if not self.workers:
+            return self.run(job_id)
+        self._pool().submit(self.run, job_id)
+
+    def start(self):
+        """Resume abandoned jobs now and then periodically in a background thread (again after a
+        fork). PAYROLL_JOB_WORKERS=0 resumes once, inline."""
+        if not self.workers:
+            self.resume()
+            return
+        with self._lock:
+            if self._reaper is not None and self._reaper.is_alive() and self._reaper_pid == os.getpid():
+                return
+            self._stop.clear()
+            self._reaper = threading.Thread(target=self._reap, name="payroll-job-reaper", daemon=True)
+            self._reaper_pid = os.getpid()
+            self._reaper.start()
+
+    def _reap(self):
+        interval = max(1, self.stale_after / 2)
+        while True:
+            try:
+                self.resume()
+            except Exception as e:
+                logger.error("Resuming payroll jobs failed", extra={"error": str(e)})
+            if self._stop.wait(interval):
+                return
+
+    def resume(self):
+        """Claim and run every queued or abandoned job; returns how many were picked up."""
+        resumed = 0
+        while True:
+            job = self.jobs.claim(stale_after=self.stale_after)
+            if job is None:
+                return resumed
+            logger.info("Resuming payroll job", extra={"job_id": str(job["_id"]), "period": job["period"]})
+            if self.workers:
+                self._pool().submit(self._execute, job)
+            else:
+                self._execute(job)
+            resumed += 1
+
+    def run(self, job_id):
+        job = self.jobs.claim(job_id, stale_after=self.stale_after)
+        if job is None:
+            # Already taken by another worker (or finished)
+            return
+        self._execute(job)
+
+    def _execute(self, job):
+        job_id, period = job["_id"], job["period"]
+        if job.get("attempts", 0) > self.max_attempts:
+            # Claimed again and again: whatever runs it keeps dying before it can record a failure
+            self._abandon(job, f"Gave up after {self.max_attempts} attempts")
+            return
+        for retry in (False, True):
+            try:
+                self._attempt(job)
+                return
+            except Exception as e:
+                payroll_jobs_total.inc(status="error")
+                logger.exception("Payroll job crashed", extra={"job_id": str(job_id), "period": period, "error": str(e)})
+                if retry:
+                    self._abandon(job, f"Payroll job failed: {e}")
+                    return
+            # Once more from the last checkpoint
+            job = self.jobs.get(job_id) or job
+
+    def _abandon(self, job, error):
+        """Fail the job, release its period and drop the entries it wrote (unless already published)."""
+        job_id, period, rev = job["_id"], job["period"], job.get("rev")
+        try:
+            if rev is not None:
+                run = self.payroll.get_by_period(period)
+                if not run or run.get("rev") != rev:
+                    self.payroll.discard_revision(period, rev)
+            self.jobs.fail(job_id, error)
+            payroll_jobs_total.inc(status="failed")
+        except Exception as e:
+            # Still `running`: the heartbeat goes stale and the next resume() tries again
+            logger.exception("Could not fail payroll job", extra={"job_id": str(job_id), "period": period, "error": str(e)})
+
+    def _attempt(self, job):
+        from models.payroll import ACTIVE_ROSTER, ROSTER_PROJECTION
+        job_id, period = job["_id"], job["period"]
+        rev = job.get("rev")
+        if not job.get("prepared"):
+            if self.payroll.get_by_period(period) and not job.get("overwrite"):
+                self.jobs.fail(job_id, "Payroll already exists")
+                payroll_jobs_total.inc(status="failed")
+                return
+            # The current run (if any) stays readable until finalize_run swaps in this revision
+            rev = ObjectId()
+            snapshot_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            self.jobs.prepared(job_id, rev, snapshot_at, self.payroll.people.count_documents(ACTIVE_ROSTER))
+            job.update(rev=rev, snapshot_at=snapshot_at)
+
+        # Same order as PayrollModel.active_roster, resumed after the last checkpoint
+        query = dict(ACTIVE_ROSTER)
+        if job.get("last_id") is not None:
+            query["_id"] = {"$gt": job["last_id"]}
+        cursor = self.payroll.people.find(query, ROSTER_PROJECTION, batch_size=self.chunk_size).sort("_id", 1)
+        while True:
+            batch = list(islice(cursor, self.chunk_size))
+            if not batch:
+                break
+            entries, _ = self.payroll.compute_run(batch)
+            self.payroll.write_entries(period, rev, entries)
+            self.jobs.checkpoint(job_id, batch[-1]["_id"], len(batch))
+
+        run = self.payroll.finalize_run(period, rev, job.get("requested_by"), job.get("snapshot_at"))
+        if not run["entry_count"]:
+            self.payroll.discard_revision(period, rev)
+            self.jobs.fail(job_id, "No active personnel found")
+            payroll_jobs_total.inc(status="failed")
+            return
+        self.jobs.finish(job_id, run)
+        payroll_jobs_total.inc(status="done")
+        logger.info("Payroll job finished", extra={"job_id": str(job_id), "period": period,
+                                                   "entry_count": run["entry_count"]})
+
+    def shutdown(self):
+        self._stop.set()
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self._executor = None
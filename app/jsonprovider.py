@@ -0,0 +1,52 @@
+from bson import json_util
+from flask_pymongo.helpers import BSONProvider
+
+from .metrics import json_dumps_seconds
+
+try:
+    import orjson  # optional: fast path for large responses
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+class TimedBSONProvider(BSONProvider):
+    """Flask-PyMongo's BSON-aware provider, with serialization time recorded for /metrics."""
+
+    def dumps(self, obj, **kwargs):
+        with json_dumps_seconds.time():
+            return super().dumps(obj, **kwargs)
+
+
+def _bson_default(obj):
+    # BSON types (ObjectId, datetime, Decimal128, ...) as bson.json_util renders them
+    return json_util.default(obj, json_util.RELAXED_JSON_OPTIONS)
+
+
+class OrjsonBSONProvider(TimedBSONProvider):
+    """orjson-backed provider for large payroll responses.
+
+    Dicts, lists, floats and PayrollEntry records (dataclasses) are serialized natively in C;
+    BSON types go through bson.json_util's conversion, so the JSON matches TimedBSONProvider's
+    apart from whitespace, exponent spelling (1e16 for 1e+16, same value) and NaN/Infinity, which
+    orjson writes as null. Anything orjson rejects, such as integers beyond 64 bits, falls back
+    to the bson.json_util path.
+    """
+
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        with json_dumps_seconds.time():
+            try:
+                return orjson.dumps(obj, default=_bson_default, option=self.options).decode()
+            except (orjson.JSONEncodeError, TypeError):
+                return BSONProvider.dumps(self, obj, **kwargs)
+
+
+def json_provider_class(name):
+    """JSON_PROVIDER setting -> provider class: bson, orjson, or auto (orjson when installed)."""
+    name = (name or "auto").lower()
+    if name == "orjson" or (name == "auto" and orjson is not None):
+        if orjson is None:
+            raise RuntimeError("JSON_PROVIDER=orjson needs the orjson package")
+        return OrjsonBSONProvider
+    return TimedBSONProvider
@@ -0,0 +1,141 @@
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, request
+
+# LogRecord attributes that are not user-supplied `extra` fields
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg plus any `extra` fields."""
+
+    def format(self, record):
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat().replace("+00:00", "Z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        if record.stack_info:
+            out["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(out, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks the caller and restarts its listener after a fork.
+
+    Records are formatted and written by a background QueueListener thread. When the queue is
+    full the record is dropped (and counted) instead of making the request wait on log I/O.
+    """
+
+    def __init__(self, target, maxsize=10000):
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._pid = None
+        self.listener = None
+        super().__init__(queue.Queue(maxsize))
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+
+    def prepare(self, record):
+        # QueueHandler.prepare formats the record with the default formatter, folding the traceback
+        # into msg. Only merge the args here (they may be mutated after the call) and leave
+        # exc_info for the target's JsonFormatter, which writes it as its own "exc" field.
+        record = copy.copy(record)
+        record.msg, record.args = record.getMessage(), None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            # Listener threads do not survive fork (gunicorn preload)
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self.listener and self._pid == os.getpid():
+            self.listener.stop()
+        super().close()
+
+
+def _parse_map(raw, convert):
+    """'a=1,b=2' -> {'a': convert('1'), 'b': convert('2')}"""
+    out = {}
+    for part in (raw or "").split(","):
+        name, sep, value = part.partition("=")
+        if sep and name.strip():
+            out[name.strip()] = convert(value.strip())
+    return out
+
+
+def init_logging(app):
+    """Route all logging through a JSON queue handler and install sampled request logging.
+
+    Config:
+      LOG_LEVEL            root level (default INFO)
+      LOG_ROUTE_LEVELS     per-endpoint logger levels, e.g. "payroll.preview_payroll=WARNING"
+      LOG_SAMPLE_RATE      fraction of requests logged (default 0: only 5xx are logged)
+      LOG_SAMPLE_RATES     per-endpoint overrides, e.g. "payroll.approve_payroll=1,auth.login=0.1"
+    """
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, NonBlockingQueueHandler):
+            root.removeHandler(handler)
+            handler.close()
+    target = logging.StreamHandler(sys.stdout)
+    target.setFormatter(JsonFormatter())
+    root.addHandler(NonBlockingQueueHandler(target, app.config["LOG_QUEUE_SIZE"]))
+    root.setLevel(app.config["LOG_LEVEL"])
+
+    for endpoint, level in _parse_map(app.config["LOG_ROUTE_LEVELS"], str.upper).items():
+        logging.getLogger(f"routes.{endpoint}").setLevel(level)
+    default_rate = app.config["LOG_SAMPLE_RATE"]
+    rates = _parse_map(app.config["LOG_SAMPLE_RATES"], float)
+
+    @app.before_request
+    def _start_timer():
+        g._log_started = time.perf_counter()
+
+    @app.after_request
+    def _log_request(response):
+        endpoint = request.endpoint or "unmatched"
+        failed = response.status_code >= 500
+        if not failed and random.random() >= rates.get(endpoint, default_rate):
+            return response
+        started = g.get("_log_started")
+        logging.getLogger(f"routes.{endpoint}").log(
+            logging.ERROR if failed else logging.INFO,
+            "request",
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "endpoint": endpoint,
+                "status": response.status_code,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2) if started else None,
+            },
+        )
+        return response
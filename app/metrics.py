@@ -0,0 +1,205 @@
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join('{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"')) for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {value}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            counts = state[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_value(self, key, state):
+        counts, total, sum_ = state
+        names = self.labelnames + ("le",)
+        lines = [
+            f"{self.name}_bucket{_labels(names, key + (bound,))} {count}"
+            for bound, count in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_bucket{_labels(names, key + ('+Inf',))} {total}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {total}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {sum_}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency by endpoint.", ("endpoint", "method", "status")))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests currently being handled.", ("endpoint",)))
+model_method_seconds = registry.register(Histogram(
+    "model_method_duration_seconds", "Latency of PersonnelModel/PayrollModel methods.", ("method",)))
+mongo_command_seconds = registry.register(Histogram(
+    "mongo_command_duration_seconds", "Mongo command latency (PyMongo command monitoring).", ("command",)))
+mongo_command_failures = registry.register(Counter(
+    "mongo_command_failures_total", "Failed Mongo commands.", ("command",)))
+bcrypt_seconds = registry.register(Histogram(
+    "bcrypt_duration_seconds", "Password hashing/checking time.", ("op",)))
+json_dumps_seconds = registry.register(Histogram(
+    "json_serialize_duration_seconds", "Time spent serializing JSON responses."))
+
+
+def untimed(fn):
+    """Mark a per-item helper (called once per document) so instrument() leaves it alone."""
+    fn._untimed = True
+    return fn
+
+
+def instrument(cls):
+    """Class decorator: time every public method into model_method_seconds as Class.method."""
+    for name, fn in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.isfunction(fn) or getattr(fn, "_untimed", False):
+            continue
+        setattr(cls, name, _timed(fn, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def _timed(fn, label):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            model_method_seconds.observe(time.perf_counter() - started, method=label)
+    return wrapper
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_command_seconds.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        mongo_command_seconds.observe(event.duration_micros / 1e6, command=event.command_name)
+        mongo_command_failures.inc(command=event.command_name)
+
+
+def init_metrics(app):
+    """Per-route timing, in-flight gauge and the Prometheus text endpoint at /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _metrics_start():
+        g._metrics_started = time.perf_counter()
+        g._metrics_endpoint = request.endpoint or "unmatched"
+        http_in_flight.inc(endpoint=g._metrics_endpoint)
+
+    @app.after_request
+    def _metrics_observe(response):
+        started = g.get("_metrics_started")
+        if started is not None:
+            http_request_seconds.observe(
+                time.perf_counter() - started,
+                endpoint=g._metrics_endpoint, method=request.method, status=response.status_code,
+            )
+        return response
+
+    @app.teardown_request
+    def _metrics_done(exc):
+        endpoint = g.pop("_metrics_endpoint", None)
+        if endpoint is not None:
+            http_in_flight.dec(endpoint=endpoint)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,98 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from models.payroll_parallel import MongoRoster, compute_partitioned, partition_bounds
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionedPayroll:
+    """Full-roster payroll computation split over a process pool (models/payroll_parallel.py).
+
+    PAYROLL_WORKERS=0 (the default) keeps everything serial. Otherwise rosters of at least
+    PAYROLL_PARALLEL_MIN personnel are split into PAYROLL_PARTITIONS_PER_WORKER ranges per
+    worker; smaller ones are cheaper to compute in-process than to ship between processes.
+    Either way the entries and totals are identical to PayrollModel.compute_run/preview_records.
+    If a worker dies mid-computation the pool is discarded (the next call starts a new one) and
+    that call falls back to the serial path.
+    """
+
+    def __init__(self):
+        self.workers = 0
+        self.min_roster = 50000
+        self.partitions_per_worker = 2
+        self.source = None
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config["PAYROLL_WORKERS"]
+        self.min_roster = app.config["PAYROLL_PARALLEL_MIN"]
+        self.partitions_per_worker = max(1, app.config["PAYROLL_PARTITIONS_PER_WORKER"])
+        # Command listeners are per process and not picklable; workers run without them
+        options = {k: v for k, v in app.config["MONGO_CLIENT_OPTIONS"].items() if k != "event_listeners"}
+        self.source = MongoRoster(app.config["MONGO_URI"], app.config["MONGO_DB"], options)
+        app.extensions["payroll_workers"] = self
+
+    def _pool(self):
+        # Created lazily, and again in forked workers (a pool does not survive fork)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("forkserver"))
+                self._pid = os.getpid()
+            return self._executor
+
+    def _partitioned(self, model):
+        """(columns, person ids, totals) from the pool, or None when the serial path should run."""
+        if not self.workers or model.people.estimated_document_count() < self.min_roster:
+            return None
+        bounds = partition_bounds(model.people, self.workers * self.partitions_per_worker)
+        logger.debug("Partitioned payroll computation", extra={"partitions": len(bounds), "workers": self.workers})
+        executor = self._pool()
+        try:
+            return compute_partitioned(executor, self.source, bounds)
+        except BrokenProcessPool as e:
+            logger.error("Payroll worker pool broke, computing serially", extra={"error": str(e)})
+            self._discard(executor)
+            return None
+
+    def _discard(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def compute_run(self, model):
+        """PayrollModel.compute_run over the active roster (entries carry person_id)."""
+        result = self._partitioned(model)
+        if result is None:
+            return model.compute_run(list(model.active_roster()))
+        cols, ids, totals = result
+        entries = cols.entries()
+        for e, pid in zip(entries, ids):
+            e["person_id"] = pid
+        return entries, totals
+
+    def preview_records(self, model):
+        """PayrollModel.preview_records over the active roster; ([], {}) when nobody is active."""
+        result = self._partitioned(model)
+        if result is None:
+            personnel = list(model.active_roster())
+            if not personnel:
+                return [], {}
+            return model.preview_records(personnel)
+        cols, _, totals = result
+        if not len(cols):
+            return [], {}
+        return cols.records(), totals
+
+    def shutdown(self):
+        if self._executor is not None and self._pid == os.getpid():
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
@@ -0,0 +1,5 @@
+from app import create_app
+from app.asgi import AsyncPayrollApp
+
+# uvicorn asgi:app --workers 4
+app = AsyncPayrollApp(create_app())
@@ -0,0 +1,47 @@
+"""Mixed login + payroll load: does a burst of sign-ins starve the payroll endpoints?
+
+Runs a login load and a payroll-preview load against the same server at the same time and
+reports both. Compare PASSWORD_HASH_WORKERS=0 (bcrypt inline on request threads) with the
+default process pool, e.g.:
+
+    PASSWORD_HASH_WORKERS=0 gunicorn -c gunicorn.conf.py wsgi:app   # then run this script
+    gunicorn -c gunicorn.conf.py wsgi:app                           # and again
+
+    python -m benchmarks.bench_auth_mixed http://127.0.0.1:5000 --email officer@example.com \\
+        --password secret --token $JWT --logins 32 --readers 16 -d 20
+
+Watch the preview p99 and the number of 503s (hashing pool at its queue-depth limit).
+"""
+import argparse
+import asyncio
+import json
+
+from benchmarks.loadtest import run
+
+
+async def mixed(opts):
+    login_body = json.dumps({"email": opts.email, "password": opts.password})
+    return await asyncio.gather(
+        run(opts.target, "/api/auth/login", None, opts.logins, opts.duration, method="POST", body=login_body),
+        run(opts.target, opts.preview_path, opts.token, opts.readers, opts.duration),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--token", required=True, help="JWT for the payroll requests")
+    parser.add_argument("--preview-path", default="/api/payroll/preview?period=2025-01")
+    parser.add_argument("--logins", type=int, default=32, help="concurrent login connections")
+    parser.add_argument("--readers", type=int, default=16, help="concurrent payroll connections")
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    opts = parser.parse_args()
+    print(f"{'path':<40} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'non-2xx':>8}")
+    for r in asyncio.run(mixed(opts)):
+        print(f"{r['path']:<40} {r['requests']:>9} {r['rps']:>9.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""Memory and serialization cost of payroll entries: dicts vs PayrollEntry records,
+bson.json_util (TimedBSONProvider) vs orjson (OrjsonBSONProvider).
+
+Run from the repo root:  python -m benchmarks.bench_entries [sizes...]
+"""
+import sys
+import tracemalloc
+
+from flask import Flask
+
+from app.jsonprovider import OrjsonBSONProvider, TimedBSONProvider, orjson
+from benchmarks.bench_preview import best_of
+from benchmarks.roster import make_roster
+from models import payroll_engine
+
+
+def allocated(build):
+    """Bytes still allocated by the object build() returns."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        obj = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del obj
+    return after - before
+
+
+def main(sizes):
+    app = Flask(__name__)
+    providers = [("bson", TimedBSONProvider(app))]
+    if orjson is not None:
+        providers.append(("orjson", OrjsonBSONProvider(app)))
+    else:
+        print("orjson is not installed; only the bson.json_util provider is measured")
+
+    print(f"{'entries':>8} {'kind':>7} {'MiB':>8} " + " ".join(f"{name + ' dumps s':>15}" for name, _ in providers))
+    for n in sizes:
+        cols = payroll_engine.normalize(make_roster(n))
+        totals = payroll_engine.compute(cols)
+        for kind, build in (("dict", cols.entries), ("record", cols.records)):
+            mib = allocated(build) / 2 ** 20
+            body = {"entries": build(), "totals": totals}
+            timings = [best_of(lambda: provider.dumps(body))[0] for _, provider in providers]
+            print(f"{n:>8} {kind:>7} {mib:>8.1f} " + " ".join(f"{t:>15.3f}" for t in timings))
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,38 @@
+"""Export throughput in rows per second for each format (writer cost only, no Mongo round trips).
+
+Run from the repo root:  python -m benchmarks.bench_export [rows...]
+Formats whose optional package (openpyxl, pyarrow) is missing are skipped.
+"""
+import sys
+import time
+
+from benchmarks.roster import make_roster
+from models import payroll_engine
+from models.payroll import ENTRY_CHUNK_SIZE, EXPORT_FIELDS
+from routes.export import WRITERS, ExportUnavailable
+
+
+def export_chunks(n):
+    entries = payroll_engine.normalize(make_roster(n))
+    payroll_engine.compute(entries)
+    rows = [dict(e, bankName="First Bank", accountNumber=f"{i:010d}") for i, e in enumerate(entries.entries())]
+    return [rows[i:i + ENTRY_CHUNK_SIZE] for i in range(0, n, ENTRY_CHUNK_SIZE)]
+
+
+def main(sizes):
+    print(f"{'rows':>9} {'format':>8} {'seconds':>8} {'rows/s':>10} {'MiB out':>8}")
+    for n in sizes:
+        chunks = export_chunks(n)
+        for fmt, writer in WRITERS.items():
+            t0 = time.perf_counter()
+            try:
+                size = sum(len(part) for part in writer(iter(chunks), EXPORT_FIELDS))
+            except ExportUnavailable as e:
+                print(f"{n:>9} {fmt:>8} skipped ({e})")
+                continue
+            elapsed = time.perf_counter() - t0
+            print(f"{n:>9} {fmt:>8} {elapsed:>8.2f} {n / elapsed:>10.0f} {size / 2 ** 20:>8.1f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000])
@@ -0,0 +1,132 @@
+"""Scaling of the partitioned payroll computation (models/payroll_parallel.py) over 1/2/4/8 workers.
+
+Run from the repo root:
+
+    python -m benchmarks.bench_parallel [-n 500000] [--workers 1,2,4,8]
+    python -m benchmarks.bench_parallel --mongod                       # throwaway mongod, end to end
+    python -m benchmarks.bench_parallel --mongo-uri mongodb://localhost:27017
+
+Without a server each worker generates the seeded roster once at start-up and computes its
+index range of it, which measures compute scaling only. With --mongod/--mongo-uri the roster is
+seeded into a scratch database and every worker reads its _id range with its own cursor, as
+PAYROLL_WORKERS does in the app. Every run is checked against the serial engine (entries and
+totals exactly equal); the script exits non-zero on any difference.
+"""
+import argparse
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.roster import make_roster
+from models import payroll_engine
+from models.payroll_parallel import MongoRoster, compute_partitioned, partition_bounds
+
+_rosters = {}
+
+
+class GeneratedRoster:
+    """Roster source that needs no database: the seeded roster, all active, sliced by index."""
+
+    def __init__(self, n, seed):
+        self.n = n
+        self.seed = seed
+
+    def load(self):
+        if (self.n, self.seed) not in _rosters:
+            _rosters[self.n, self.seed] = make_roster(self.n, seed=self.seed)
+        return _rosters[self.n, self.seed]
+
+    def fetch(self, lo, hi):
+        return self.load()[lo:hi]
+
+    def bounds(self, parts):
+        edges = [self.n * i // parts for i in range(1, parts)]
+        return list(zip([None] + edges, edges + [None]))
+
+
+def serial(roster_docs):
+    cols = payroll_engine.normalize(roster_docs)
+    totals = payroll_engine.compute(cols)
+    return cols.entries(), [d.get("_id") for d in roster_docs], totals
+
+
+def timed(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def seed_database(uri, db_name, n, seed):
+    from pymongo import MongoClient
+    db = MongoClient(uri).get_default_database(db_name)
+    db.personnel.drop()
+    roster = make_roster(n, seed=seed, db_fields=True)
+    for i in range(0, n, 10_000):
+        db.personnel.insert_many(roster[i:i + 10_000])
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=500_000, help="roster size")
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--partitions-per-worker", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mongo-uri", help="scratch server to seed and read from")
+    parser.add_argument("--mongod", action="store_true", help="start a throwaway mongod for the run")
+    parser.add_argument("--db", default="payroll_bench", help="scratch database name (personnel is dropped)")
+    opts = parser.parse_args()
+    worker_counts = [int(w) for w in opts.workers.split(",") if w.strip()]
+
+    server = None
+    try:
+        if opts.mongod:
+            from benchmarks.suite import MongodProcess
+            server = MongodProcess()
+            server.start()
+            opts.mongo_uri = server.uri
+        if opts.mongo_uri:
+            db = seed_database(opts.mongo_uri, opts.db, opts.n, opts.seed)
+            source = MongoRoster(opts.mongo_uri, opts.db)
+            reference = lambda: serial(list(source.fetch(None, None)))
+            bounds = lambda parts: partition_bounds(db.personnel, parts)
+            mode = "mongo"
+        else:
+            source = GeneratedRoster(opts.n, opts.seed)
+            reference = lambda: serial(source.load())
+            bounds = source.bounds
+            mode = "generated"
+
+        t_serial, (entries, ids, totals) = timed(reference, opts.repeat)
+        print(f"{opts.n} personnel, {mode} roster")
+        print(f"{'workers':>8} {'partitions':>11} {'seconds':>9} {'speed-up':>9} {'exact':>6}")
+        print(f"{'serial':>8} {1:>11} {t_serial:>9.3f} {1:>8.2f}x {'-':>6}")
+        mismatches = 0
+        for workers in worker_counts:
+            parts = workers * opts.partitions_per_worker
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("forkserver"),
+                                     initializer=getattr(source, "load", None)) as pool:
+                # First call starts the workers (and their clients); it is not timed
+                compute_partitioned(pool, source, bounds(parts))
+                t, (cols, part_ids, part_totals) = timed(
+                    lambda: compute_partitioned(pool, source, bounds(parts)), opts.repeat)
+            exact = cols.entries() == entries and part_ids == ids and part_totals == totals
+            mismatches += not exact
+            print(f"{workers:>8} {parts:>11} {t:>9.3f} {t_serial / t:>8.2f}x {'yes' if exact else 'NO':>6}")
+    finally:
+        if server is not None:
+            server.stop()
+
+    if mismatches:
+        print(f"{mismatches} worker count(s) differ from the serial engine")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
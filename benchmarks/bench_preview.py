@@ -0,0 +1,57 @@
+"""Compare the per-entry build_entry path with the columnar engine behind compute_preview.
+
+Run from the repo root:  python -m benchmarks.bench_preview [sizes...]
+"""
+import gc
+import sys
+import time
+
+from benchmarks.roster import make_roster
+from models import payroll_engine
+from models.payroll import PayrollModel
+
+
+class _NoDb:
+    def __getattr__(self, name):
+        return None
+
+
+def legacy_compute_preview(model, personnel_list):
+    """The previous compute_preview implementation, kept as the reference."""
+    entries = [model.build_entry(p) for p in personnel_list]
+    totals = {
+        "gross": sum(e["basic"] + e["allowance"] for e in entries),
+        "allowances": sum(e["allowance"] for e in entries),
+        "deductions": sum(e["deductions"] for e in entries)
+    }
+    return entries, totals
+
+
+def best_of(fn, repeat=3):
+    best = None
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+    finally:
+        gc.enable()
+    return best, result
+
+
+def main(sizes):
+    model = PayrollModel(_NoDb())
+    print(f"{'personnel':>10} {'build_entry s':>14} {'engine s':>10} {'speed-up':>9} {'totals-only s':>14}")
+    for n in sizes:
+        roster = make_roster(n)
+        t_old, old = best_of(lambda: legacy_compute_preview(model, roster))
+        t_new, new = best_of(lambda: model.compute_preview(roster))
+        assert old == new, "engine output differs from build_entry"
+        t_cols, _ = best_of(lambda: payroll_engine.compute(payroll_engine.normalize(roster)))
+        print(f"{n:>10} {t_old:>14.3f} {t_new:>10.3f} {t_old / t_new:>8.2f}x {t_cols:>14.3f}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [10_000, 100_000, 500_000])
@@ -0,0 +1,58 @@
+"""Compare two benchmarks.suite result files, e.g. the same suite run on two commits.
+
+    python -m benchmarks.compare before.json after.json [--threshold 1.15] [--stat median]
+
+Prints one line per (scenario, size) present in both files with the after/before ratio of the
+chosen statistic. Exits 1 if any ratio is above --threshold, so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], {(r["scenario"], r["size"]): r for r in report["results"]}
+
+
+def describe(meta):
+    commit = (meta.get("commit") or "unknown")[:10] + ("+dirty" if meta.get("dirty") else "")
+    return f"{commit} ({meta.get('backend')}, python {meta.get('python')})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--stat", choices=("min", "median", "mean"), default="median")
+    parser.add_argument("--threshold", type=float, default=1.15, help="fail when after/before exceeds this")
+    opts = parser.parse_args()
+
+    before_meta, before = load(opts.before)
+    after_meta, after = load(opts.after)
+    print(f"before: {describe(before_meta)}")
+    print(f"after:  {describe(after_meta)}")
+    for key in ("backend", "seed", "legacy_share", "bcrypt_rounds"):
+        if before_meta.get(key) != after_meta.get(key):
+            print(f"warning: {key} differs ({before_meta.get(key)} vs {after_meta.get(key)})")
+
+    print(f"{'scenario':>16} {'size':>8} {'before ms':>11} {'after ms':>11} {'ratio':>7}")
+    regressions = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key][opts.stat], after[key][opts.stat]
+        ratio = new / old if old else float("inf")
+        flag = "  REGRESSION" if ratio > opts.threshold else ""
+        print(f"{key[0]:>16} {key[1]:>8} {old * 1000:>11.2f} {new * 1000:>11.2f} {ratio:>6.2f}x{flag}")
+        if flag:
+            regressions.append(key)
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f"{key[0]:>16} {key[1]:>8}  only in {'before' if key in before else 'after'}")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) above {opts.threshold:.2f}x")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Check the change-stream watcher and /api/payroll/events end to end on a single-node replica set.
+
+    python -m benchmarks.live_updates                                   # throwaway mongod --replSet
+    python -m benchmarks.live_updates --mongo-uri "mongodb://localhost:27017/?replicaSet=rs0"
+
+Runs the app in-process with PAYROLL_WATCH on and an open SSE stream, then:
+  1. inserts a person straight into the personnel collection (bypassing the API) and expects a
+     `personnel` event and a preview that includes the new person (cached preview invalidated);
+  2. approves a run through the API and expects a `run` insert event for that period;
+  3. approves one more person into the run and expects a `run` update with the new totals;
+  4. approves a run for another period and expects the period-filtered stream not to see it.
+Prints the time from each write to its event. Exits non-zero on any failure.
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+
+from benchmarks.roster import make_roster
+from benchmarks.suite import BenchmarkError, MongodProcess, make_app
+
+PERIOD = "2099-01"
+OTHER_PERIOD = "2099-02"
+
+
+def read_events(response, events):
+    """Parse the SSE stream into (type, data) tuples on `events`."""
+    buf = ""
+    for chunk in response.response:
+        buf += chunk.decode() if isinstance(chunk, bytes) else chunk
+        while "\n\n" in buf:
+            block, buf = buf.split("\n\n", 1)
+            fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line and not line.startswith(":"))
+            if "event" in fields:
+                events.put((fields["event"], json.loads(fields["data"]), time.perf_counter()))
+
+
+def expect(events, kind, timeout, match=lambda data: True):
+    deadline = time.perf_counter() + timeout
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return None
+        try:
+            event, data, at = events.get(timeout=remaining)
+        except queue.Empty:
+            return None
+        if event == kind and match(data):
+            return data, at
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mongo-uri", help="replica set to use (else a throwaway single-node one is started)")
+    parser.add_argument("--mongod", default="mongod")
+    parser.add_argument("--db", default="payroll_live_check", help="scratch database name (dropped)")
+    parser.add_argument("-n", type=int, default=200, help="roster size")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for each event")
+    opts = parser.parse_args()
+
+    server, problems = None, []
+    try:
+        uri = opts.mongo_uri
+        if not uri:
+            server = MongodProcess(opts.mongod, replica_set="rs0")
+            server.start()
+            uri = server.uri
+        app, db, headers = make_app(uri, opts.db, 4, PAYROLL_WATCH="1", PAYROLL_WATCH_COALESCE_MS="100",
+                                    PAYROLL_CACHE_BACKEND="lru", MONGO_STARTUP_CHECK="off")
+        db.client.drop_database(opts.db)
+        db.personnel.insert_many(make_roster(opts.n, db_fields=True))
+
+        from app import payroll_watcher, start_mongo_check
+        start_mongo_check(app, mode="block")
+        if not payroll_watcher.available:
+            raise BenchmarkError("watcher is not running (is this a replica set?)")
+
+        client = app.test_client()
+        preview = client.get(f"/api/payroll/preview?period={PERIOD}", headers=headers).get_json()
+        events = queue.Queue()
+        stream = client.get(f"/api/payroll/events?period={PERIOD}", headers=headers, buffered=False)
+        if stream.status_code != 200:
+            raise BenchmarkError(f"/api/payroll/events returned {stream.status_code}")
+        threading.Thread(target=read_events, args=(stream, events), daemon=True).start()
+        time.sleep(0.5)
+
+        # 1. Direct insert, outside the API
+        person = make_roster(opts.n + 1, seed=7, legacy_share=0, db_fields=True)[-1]
+        person.update(active=True, armyNumber="NA/LIVE-1", armyNumberKey="na/live-1")
+        t0 = time.perf_counter()
+        db.personnel.insert_one(person)
+        got = expect(events, "personnel", opts.timeout)
+        if got is None:
+            problems.append("no personnel event after a direct insert")
+        else:
+            print(f"personnel event after {(got[1] - t0) * 1000:.0f} ms: {got[0]}")
+            fresh = client.get(f"/api/payroll/preview?period={PERIOD}", headers=headers).get_json()
+            if len(fresh["entries"]) != len(preview["entries"]) + 1:
+                problems.append("preview still served from the stale cache after the personnel event")
+
+        # 2. Full approval
+        t0 = time.perf_counter()
+        resp = client.post("/api/payroll", json={"period": PERIOD}, headers=headers)
+        got = expect(events, "run", opts.timeout, lambda d: d.get("period") == PERIOD and d["op"] in ("insert", "replace"))
+        if resp.status_code != 200 or got is None:
+            problems.append(f"no run event after approving {PERIOD} (status {resp.status_code})")
+        else:
+            print(f"run event after {(got[1] - t0) * 1000:.0f} ms: totals {got[0]['run']['totals']}")
+
+        # 3. Single-person approval updates the run totals
+        pid = str(db.personnel.find_one({"armyNumber": "NA/LIVE-1"})["_id"])
+        db.personnel.update_one({"armyNumber": "NA/LIVE-1"}, {"$set": {"basicSalary": 1.0e6}})
+        t0 = time.perf_counter()
+        client.post(f"/api/payroll/approve/{pid}", json={"period": PERIOD}, headers=headers)
+        got = expect(events, "run", opts.timeout, lambda d: d["op"] == "update" and "totals" in d.get("updated", {}))
+        if got is None:
+            problems.append("no run update event with totals after a single-person approval")
+        else:
+            print(f"run update after {(got[1] - t0) * 1000:.0f} ms: {got[0]['updated']}")
+
+        # 4. Other periods are filtered out
+        client.post("/api/payroll", json={"period": OTHER_PERIOD}, headers=headers)
+        if expect(events, "run", 2.0, lambda d: d.get("period") == OTHER_PERIOD) is not None:
+            problems.append(f"stream for {PERIOD} received a {OTHER_PERIOD} run event")
+
+        payroll_watcher.stop()
+        db.client.drop_database(opts.db)
+    except BenchmarkError as e:
+        problems.append(str(e))
+    finally:
+        if server is not None:
+            server.stop()
+
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("ok: direct writes invalidate previews and run changes reach the event stream")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Closed-loop HTTP load generator to compare the WSGI and ASGI serving paths.
+
+Start the server under test, then e.g.:
+
+    gunicorn -w 4 --threads 8 run:app -b :8000           # WSGI
+    uvicorn asgi:app --workers 4 --port 8001              # ASGI
+    python -m benchmarks.loadtest http://127.0.0.1:8000 http://127.0.0.1:8001 \\
+        --path "/api/payroll/preview?period=2025-01" --token $JWT -c 64 -d 20
+
+Each connection sends requests back to back over HTTP/1.1 keep-alive for the given duration.
+Reports requests/sec, p50/p99 latency and non-2xx responses per target.
+"""
+import argparse
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+
+async def _request(reader, writer, raw):
+    writer.write(raw)
+    await writer.drain()
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        name = name.strip().lower()
+        if name == "content-length":
+            length = int(value)
+        elif name == "transfer-encoding" and "chunked" in value.lower():
+            chunked = True
+    if chunked:
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(length)
+    return status
+
+
+async def _worker(host, port, raw, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            status = await _request(reader, writer, raw)
+            latencies.append(time.perf_counter() - t0)
+            if status >= 300:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run(base_url, path, token, concurrency, duration, method="GET", body=None):
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    headers = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: keep-alive"]
+    if token:
+        headers.append(f"Authorization: Bearer {token}")
+    payload = body.encode() if body else b""
+    if body:
+        headers += ["Content-Type: application/json", f"Content-Length: {len(payload)}"]
+    raw = ("\r\n".join(headers) + "\r\n\r\n").encode() + payload
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        _worker(host, port, raw, deadline, latencies, errors) for _ in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else float("nan")
+
+    return {
+        "target": base_url,
+        "path": path,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("targets", nargs="+", help="base URLs, e.g. http://127.0.0.1:8000")
+    parser.add_argument("--path", default="/api/personnel/?limit=50")
+    parser.add_argument("--token", help="JWT access token for protected routes")
+    parser.add_argument("-c", "--concurrency", type=int, default=32)
+    parser.add_argument("-d", "--duration", type=float, default=10.0)
+    opts = parser.parse_args()
+    print(f"{'target':<28} {'requests':>9} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for target in opts.targets:
+        r = asyncio.run(run(target, opts.path, opts.token, opts.concurrency, opts.duration))
+        print(f"{r['target']:<28} {r['requests']:>9} {r['rps']:>9.1f} {r['p50_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Seeded synthetic personnel rosters for the benchmarks.
+
+Documents mix the layouts found in real data: canonical keys (armyNumber, basicSalary,
+fmn_unit, ...) as written by PersonnelModel, and legacy spreadsheet imports (Army_Number,
+Basic_Pay, Fmn/Unit, Name) with comma-formatted amount strings. The same seed always produces
+the same roster.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+from models.payroll_engine import CANONICAL_SCHEMA
+
+RANKS = ("Pte", "LCpl", "Cpl", "Sgt", "SSgt", "WO", "2Lt", "Lt", "Capt", "Maj")
+CORPS = ("NAC", "NAOC", "NAE", "NAS", "NAMC", "NAFC", "NAEME")
+UNITS = ("1 Div", "2 Div", "3 Div", "6 Div", "7 Div", "81 Div", "82 Div")
+REGIONS = ("North", "South", "East", "West", "Central")
+BANKS = ("First Bank", "GTBank", "Zenith", "UBA", "Access")
+
+
+def _amount(rnd, value):
+    """A float, a plain numeric string, or a comma-formatted string."""
+    style = rnd.random()
+    if style < 0.5:
+        return value
+    if style < 0.75:
+        return str(value)
+    return f"{value:,.2f}"
+
+
+def make_person(i, rnd, legacy_share=1 / 3, now=None):
+    basic = round(rnd.uniform(50000, 900000), 2)
+    allowance = round(rnd.uniform(0, 150000), 2)
+    deductions = round(rnd.uniform(0, 80000), 2)
+    rank, corps = rnd.choice(RANKS), rnd.choice(CORPS)
+    unit, region = rnd.choice(UNITS), rnd.choice(REGIONS)
+    army_number = f"NA/{i:07d}"
+    if rnd.random() < legacy_share:
+        doc = {
+            "Army_Number": army_number, "Name": f"Soldier {i}", "Rank": rank, "Corps": corps,
+            "Fmn/Unit": unit, "Region": region,
+            "Basic_Pay": _amount(rnd, basic), "Allowance": _amount(rnd, allowance),
+            "Deductions": _amount(rnd, deductions),
+        }
+    else:
+        doc = {
+            "armyNumber": army_number, "armyNumberKey": army_number.casefold(), "fullName": f"Soldier {i}",
+            "fullNameKey": f"soldier {i}",
+            "rank": rank, "corps": corps, "fmn_unit": unit, "region": region,
+            "basicSalary": basic, "allowance": allowance, "deductions": deductions,
+        }
+    if now is not None:
+        if "armyNumber" in doc:
+            # Written by the app (or migrated): canonical schema marker
+            doc["schemaVersion"] = CANONICAL_SCHEMA
+        stamp = (now - timedelta(seconds=i)).isoformat().replace("+00:00", "Z")
+        doc.update(
+            active=rnd.random() < 0.95,
+            bankName=rnd.choice(BANKS),
+            accountNumber=f"{rnd.randrange(10 ** 10):010d}",
+            created_at=stamp,
+            updated_at=stamp,
+        )
+    return doc
+
+
+def make_roster(n, seed=42, legacy_share=1 / 3, db_fields=False):
+    """n personnel documents. db_fields adds active/bank/timestamp fields (and the schemaVersion
+    of canonical documents) for seeding a database."""
+    rnd = random.Random(seed)
+    now = datetime.now(timezone.utc) if db_fields else None
+    return [make_person(i, rnd, legacy_share, now) for i in range(n)]
@@ -0,0 +1,336 @@
+"""End-to-end payroll benchmark suite, through the Flask app, against a local Mongo stand-in.
+
+Run from the repo root:
+
+    python -m benchmarks.suite -o before.json                      # mongomock (in-process)
+    python -m benchmarks.suite --backend mongod -o before.json     # throwaway mongod in a temp dir
+    python -m benchmarks.suite --backend mongod --mongo-uri mongodb://localhost:27017 -o before.json
+    python -m benchmarks.compare before.json after.json
+
+For every roster size the database is reseeded from the same seeded generator
+(benchmarks/roster.py) and each scenario is timed `--repeat` times:
+
+    preview          GET  /api/payroll/preview (result cache off, so every call computes)
+    approve_full     POST /api/payroll, a fresh period each time
+    approve_person   POST /api/payroll/approve/<pid> into a run that already holds the roster
+    roster_page      GET  /api/personnel/?limit=50
+    roster_list_all  PersonnelModel.list_all()
+    login            POST /api/auth/login (bcrypt at --bcrypt-rounds, hashed inline)
+
+mongomock runs without the app's indexes (it enforces unique ones with a full scan per insert
+and never reads through them); use mongod for numbers that reflect index behaviour.
+Results are written as JSON (meta + one record per scenario and size) for benchmarks.compare.
+mongomock is an optional dependency of the suite only; a --mongo-uri database is dropped and
+reseeded, so point it at a scratch database (default name payroll_bench).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks.roster import make_roster
+
+SCENARIOS = ("preview", "approve_full", "approve_person", "roster_page", "roster_list_all", "login")
+COLLECTIONS = ("personnel", "payroll_runs", "payroll_entries", "payroll_jobs", "users", "counters")
+BENCH_USER = {"fullName": "Bench Officer", "email": "bench@example.com", "username": "bench",
+              "password": "bench-password"}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+# -------------------------------------------------------------
+# Backends
+# -------------------------------------------------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class MongodProcess:
+    """A mongod on a free port with its data in a temp dir; removed again on stop().
+
+    With replica_set it runs as an initiated single-node replica set (change streams need one).
+    """
+
+    def __init__(self, binary="mongod", replica_set=None):
+        self.binary = shutil.which(binary)
+        if self.binary is None:
+            raise BenchmarkError(f"{binary} not found on PATH; pass --mongo-uri")
+        self.port = _free_port()
+        self.dbpath = tempfile.mkdtemp(prefix="payroll-bench-")
+        self.replica_set = replica_set
+        self.proc = None
+
+    @property
+    def uri(self):
+        uri = f"mongodb://127.0.0.1:{self.port}"
+        return f"{uri}/?replicaSet={self.replica_set}&directConnection=true" if self.replica_set else uri
+
+    def start(self, timeout=30):
+        from pymongo import MongoClient
+        args = [self.binary, "--dbpath", self.dbpath, "--port", str(self.port), "--bind_ip", "127.0.0.1", "--quiet"]
+        if self.replica_set:
+            args += ["--replSet", self.replica_set]
+        self.proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        client = MongoClient(f"mongodb://127.0.0.1:{self.port}", directConnection=True, serverSelectionTimeoutMS=500)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                try:
+                    client.admin.command("ping")
+                    if self.replica_set:
+                        self._initiate(client, deadline)
+                    return client.server_info().get("version")
+                except Exception:
+                    if self.proc.poll() is not None or time.monotonic() > deadline:
+                        self.stop()
+                        raise BenchmarkError("mongod did not start")
+                    time.sleep(0.2)
+        finally:
+            client.close()
+
+    def _initiate(self, client, deadline):
+        from pymongo.errors import OperationFailure
+        try:
+            client.admin.command("replSetInitiate", {
+                "_id": self.replica_set, "members": [{"_id": 0, "host": f"127.0.0.1:{self.port}"}]})
+        except OperationFailure as e:
+            if e.code != 23:  # AlreadyInitialized
+                raise
+        while not client.admin.command("hello").get("isWritablePrimary"):
+            if time.monotonic() > deadline:
+                raise BenchmarkError("replica set did not elect a primary")
+            time.sleep(0.2)
+
+    def stop(self):
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        shutil.rmtree(self.dbpath, ignore_errors=True)
+
+
+def use_mongomock():
+    """Make flask_pymongo build mongomock clients (must run before create_app)."""
+    try:
+        import mongomock
+    except ImportError:
+        raise BenchmarkError("--backend mongomock needs the mongomock package (pip install mongomock)")
+    import flask_pymongo
+
+    flask_pymongo.MongoClient = mongomock.MongoClient
+    return mongomock.__version__
+
+
+# -------------------------------------------------------------
+# App and data
+# -------------------------------------------------------------
+def make_app(mongo_uri, db_name, bcrypt_rounds, **env):
+    """create_app() against the benchmark database; `env` overrides or adds config variables."""
+    os.environ.update({
+        "MONGO_URI": mongo_uri,
+        "MONGO_DB": db_name,
+        "MONGO_STARTUP_CHECK": "off",
+        "PAYROLL_CACHE_BACKEND": "none",
+        "PAYROLL_JOB_WORKERS": "0",
+        "PASSWORD_HASH_WORKERS": "0",
+        "BCRYPT_LOG_ROUNDS": str(bcrypt_rounds),
+        "LOG_LEVEL": "WARNING",
+        **env,
+    })
+    from flask_jwt_extended import create_access_token
+    from app import create_app, mongo
+
+    app = create_app()
+    with app.app_context():
+        token = create_access_token(identity="benchmark")
+    return app, mongo.db, {"Authorization": f"Bearer {token}"}
+
+
+def reseed(app, db, n, seed, legacy_share, indexes=True):
+    """Empty the benchmark collections, recreate indexes, insert n personnel and the login user."""
+    from app.indexes import ensure_indexes
+    for name in COLLECTIONS:
+        db.drop_collection(name)
+    if indexes:
+        for label, error in ensure_indexes(db):
+            print(f"  index {label} not created: {error}", file=sys.stderr)
+    roster = make_roster(n, seed=seed, legacy_share=legacy_share, db_fields=True)
+    for i in range(0, n, 10_000):
+        db.personnel.insert_many(roster[i:i + 10_000])
+    with app.test_client() as client:
+        resp = client.post("/api/auth/signup", json=BENCH_USER)
+        if resp.status_code != 201:
+            raise BenchmarkError(f"signup failed: {resp.status_code} {resp.get_data(as_text=True)}")
+    return [str(p["_id"]) for p in db.personnel.find({"active": True}, {"_id": 1}).sort("_id", 1).limit(1000)]
+
+
+# -------------------------------------------------------------
+# Scenarios
+# -------------------------------------------------------------
+def _check(resp, *ok):
+    if resp.status_code not in ok:
+        raise BenchmarkError(f"{resp.request.path}: {resp.status_code} {resp.get_data(as_text=True)[:200]}")
+    return resp
+
+
+def scenarios(app, db, headers, pids):
+    """name -> (setup, timed call); setup runs untimed before each repetition and returns its argument."""
+    from routes.personnel import personnel_model
+    client = app.test_client()
+    periods = iter(f"9{i:03d}-01" for i in range(1000))
+    people = iter(pids * 100)
+    login = {"email": BENCH_USER["email"], "password": BENCH_USER["password"]}
+
+    def fresh_period():
+        period = next(periods)
+        db.payroll_runs.delete_many({"period": {"$gte": "9000"}})
+        db.payroll_entries.delete_many({"period": {"$gte": "9000"}})
+        return period
+
+    def full_run():
+        # One untimed approval per repetition so the run size stays equal to the roster
+        period = fresh_period()
+        _check(client.post("/api/payroll", json={"period": period}, headers=headers), 200)
+        return period
+
+    return {
+        "preview": (lambda: None,
+                    lambda _: _check(client.get("/api/payroll/preview?period=2099-01", headers=headers), 200)),
+        "approve_full": (fresh_period,
+                         lambda period: _check(client.post("/api/payroll", json={"period": period},
+                                                           headers=headers), 200)),
+        "approve_person": (full_run,
+                           lambda period: _check(client.post(f"/api/payroll/approve/{next(people)}",
+                                                             json={"period": period}, headers=headers), 200)),
+        "roster_page": (lambda: None, lambda _: _check(client.get("/api/personnel/?limit=50"), 200)),
+        "roster_list_all": (lambda: None, lambda _: personnel_model.list_all()),
+        "login": (lambda: None, lambda _: _check(client.post("/api/auth/login", json=login), 200)),
+    }
+
+
+def measure(setup, call, repeat, warmup):
+    times = []
+    for i in range(warmup + repeat):
+        arg = setup()
+        t0 = time.perf_counter()
+        call(arg)
+        elapsed = time.perf_counter() - t0
+        if i >= warmup:
+            times.append(elapsed)
+    return {
+        "runs": [round(t, 6) for t in times],
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("mongomock", "mongod"), default="mongomock")
+    parser.add_argument("--mongo-uri", help="existing server for --backend mongod (else a throwaway mongod is started)")
+    parser.add_argument("--mongod", default="mongod", help="mongod binary for the throwaway server")
+    parser.add_argument("--db", default="payroll_bench", help="scratch database name (dropped and reseeded)")
+    parser.add_argument("--sizes", default="1000,5000,20000", help="comma-separated roster sizes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--legacy-share", type=float, default=1 / 3,
+                        help="fraction of personnel in the legacy layout (0 = fully migrated roster)")
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("-o", "--output", help="write JSON results here (default: stdout)")
+    opts = parser.parse_args()
+
+    sizes = [int(s) for s in opts.sizes.split(",") if s.strip()]
+    selected = [s.strip() for s in opts.scenarios.split(",") if s.strip()]
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    server = None
+    try:
+        if opts.backend == "mongomock":
+            backend_version = use_mongomock()
+            uri = "mongodb://localhost:27017"
+        elif opts.mongo_uri:
+            uri, backend_version = opts.mongo_uri, None
+        else:
+            server = MongodProcess(opts.mongod)
+            backend_version = server.start()
+            uri = server.uri
+
+        # mongomock checks unique indexes by scanning the collection on every insert, which makes
+        # seeding and approvals quadratic; it never uses an index for reads, so leave them out
+        indexes = opts.backend != "mongomock"
+        app, db, headers = make_app(uri, opts.db, opts.bcrypt_rounds)
+        commit, dirty = git_commit()
+        report = {
+            "meta": {
+                "commit": commit,
+                "dirty": dirty,
+                "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "backend": opts.backend,
+                "backend_version": backend_version,
+                "sizes": sizes,
+                "repeat": opts.repeat,
+                "warmup": opts.warmup,
+                "seed": opts.seed,
+                "legacy_share": opts.legacy_share,
+                "bcrypt_rounds": opts.bcrypt_rounds,
+                "indexes": indexes,
+            },
+            "results": [],
+        }
+        for n in sizes:
+            pids = reseed(app, db, n, opts.seed, opts.legacy_share, indexes)
+            available = scenarios(app, db, headers, pids)
+            for name in selected:
+                stats = measure(*available[name], opts.repeat, opts.warmup)
+                report["results"].append({"scenario": name, "size": n, **stats})
+                print(f"{name:>16} {n:>8}  median {stats['median'] * 1000:10.2f} ms  "
+                      f"min {stats['min'] * 1000:10.2f} ms", file=sys.stderr)
+    except BenchmarkError as e:
+        print(f"error: {e}", file=sys.stderr)
+        sys.exit(2)
+    finally:
+        if server is not None:
+            server.stop()
+
+    out = json.dumps(report, indent=2)
+    if opts.output:
+        with open(opts.output, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Production gunicorn settings: gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is preloaded once in the master (shared code pages, fast worker restarts); each worker
+then builds its own MongoClient in post_fork because PyMongo clients must not cross a fork.
+Size MONGO_MAX_POOL_SIZE to at least GUNICORN_THREADS so threads don't queue for connections.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gthread"
+# Each open /api/payroll/events stream holds one of these threads for as long as the client stays;
+# PAYROLL_EVENTS_MAX_SUBSCRIBERS (default 2) caps them per worker, keep it below this
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+# Recycle workers now and then to cap memory growth from large payroll responses
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+
+# The master must not open Mongo connections; workers check the database after fork
+os.environ.setdefault("MONGO_STARTUP_CHECK", "off")
+
+
+def post_fork(server, worker):
+    from app import connect_mongo, start_mongo_check
+    from wsgi import app
+
+    connect_mongo(app)
+    start_mongo_check(app, mode="background")
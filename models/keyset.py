@@ -0,0 +1,36 @@
+"""Keyset pagination on (field, _id) descending, shared by personnel pages and run history.
+
+The cursor is the last returned document's sort key, JSON-encoded in unpadded urlsafe base64.
+Documents without the field (null) sort last and are paged by _id alone.
+"""
+import base64
+import json
+
+from bson import ObjectId
+
+
+def encode_cursor(doc, field):
+    raw = json.dumps([doc.get(field), str(doc["_id"])]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(value, ObjectId) from a cursor; raises ValueError on anything malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, oid = json.loads(raw)
+        return value, ObjectId(oid)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def after_clause(field, cursor):
+    """Query clause for the documents after `cursor` in the [(field, -1), ("_id", -1)] order."""
+    value, oid = decode_cursor(cursor)
+    if value is None:
+        return {field: None, "_id": {"$lt": oid}}
+    return {"$or": [
+        {field: {"$lt": value}},
+        {field: value, "_id": {"$lt": oid}},
+        {field: None},
+    ]}
@@ -1,8 +1,83 @@
-from datetime import datetime, timezone
+import hashlib
+import json
+from itertools import islice
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from models import payroll_engine
+from models.keyset import after_clause, encode_cursor
+from models.payroll_aggregate import summary_pipeline, summary_result
+from models.personnel import army_number_key
+from app.metrics import instrument, untimed
 
+ENTRY_PROJECTION = {"_id": 0, "period": 0, "rev": 0, "person_id": 0}
+ACTIVE_ROSTER = {"active": True}
+# Roster reads for payroll fetch only the fields the engine reads (canonical and legacy spellings)
+ROSTER_PROJECTION = payroll_engine.SOURCE_PROJECTION
+RUN_HEADER_PROJECTION = {"entries": 0}
+# History listing: header fields only, without the internal revision / content hash
+RUN_SUMMARY_PROJECTION = {"entries": 0, "rev": 0, "content_hash": 0, "legacy_entries": 0}
+ENTRY_CHUNK_SIZE = 1000
+# Export columns: the entry fields plus the bank details joined from personnel
+EXPORT_FIELDS = payroll_engine.ENTRY_FIELDS + ("bankName", "accountNumber")
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
+# Totals compared by compare_runs (net is derived from gross - deductions)
+COMPARED_TOTALS = ("gross", "allowances", "deductions", "net")
+# Margin for clock differences between app hosts when comparing updated_at with snapshot_at
+DELTA_CLOCK_SKEW = timedelta(seconds=60)
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def history_bound(value, end=False):
+    """approved_at bound from a from/to query value (YYYY-MM-DD or ISO 8601 datetime).
+
+    Returns (operator, ISO string); a date-only `to` covers that whole day.
+    """
+    try:
+        if len(value) == 10:
+            day = datetime.strptime(value, '%Y-%m-%d')
+            if end:
+                return "$lt", (day + timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            return "$gte", day.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        moment = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid date: {value!r}")
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return ("$lte" if end else "$gte"), moment.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def entries_hash(entries):
+    """Content hash of a run's entries (in order), stored on the header to detect no-op overwrites."""
+    h = hashlib.sha256()
+    for i in range(0, len(entries), ENTRY_CHUNK_SIZE):
+        h.update(json.dumps(entries[i:i + ENTRY_CHUNK_SIZE], separators=(",", ":"), default=str).encode())
+    return h.hexdigest()
+
+
+def migrated_entry_id(run_id, i):
+    """_id of the i-th embedded entry of run_id once migrated into payroll_entries.
+
+    The same run always yields the same ids, so migrations racing each other (or re-run after a
+    crash) write each entry once. The run's timestamp leads, so entries approved later still
+    sort after the migrated ones.
+    """
+    return ObjectId(run_id.binary[:4] + hashlib.sha1(run_id.binary).digest()[:4] + i.to_bytes(4, "big"))
+
+@instrument
 class PayrollModel:
     def __init__(self, db):
+        self.bind(db)
+
+    @untimed
+    def bind(self, db):
         self.collection = db.payroll_runs
+        self.entries = db.payroll_entries
         self.people = db.personnel
 
     def _num(self, v):
@@ -11,6 +86,7 @@ class PayrollModel:
         except Exception:
             return 0.0
 
+    @untimed
     def build_entry(self, personnel_doc):
         """Convert a personnel document into a payroll entry (supports legacy and canonical keys)."""
         d = personnel_doc or {}
@@ -42,17 +118,180 @@ class PayrollModel:
         }
 
     def compute_preview(self, personnel_list):
-        """Compute payroll totals and entries"""
-        entries = [self.build_entry(p) for p in personnel_list]
-        totals = {
-            "gross": sum(e["basic"] + e["allowance"] for e in entries),
-            "allowances": sum(e["allowance"] for e in entries),
-            "deductions": sum(e["deductions"] for e in entries)
-        }
+        """Compute payroll totals and entries (same output as build_entry per person, columnar engine)."""
+        columns = payroll_engine.normalize(personnel_list)
+        totals = payroll_engine.compute(columns)
+        return columns.entries(), totals
+
+    def preview_records(self, personnel_list):
+        """compute_preview with compact PayrollEntry records instead of dicts (cached previews)."""
+        columns = payroll_engine.normalize(personnel_list)
+        totals = payroll_engine.compute(columns)
+        return columns.records(), totals
+
+    def compute_run(self, personnel_list):
+        """compute_preview for a run to be stored: each entry also records its source personnel
+        document as `person_id` (not part of the API output), which delta runs rely on."""
+        entries, totals = self.compute_preview(personnel_list)
+        for e, p in zip(entries, personnel_list):
+            e["person_id"] = p.get("_id")
         return entries, totals
 
+    def active_roster(self, projection=ROSTER_PROJECTION, batch_size=1000):
+        """Active personnel in _id order, the order every preview and run is computed in."""
+        return self.people.find(ACTIVE_ROSTER, projection, batch_size=batch_size).sort("_id", 1)
+
+    def latest_run_before(self, period):
+        """Header of the most recent run for a period before `period` (the default delta base)."""
+        run = self.collection.find_one({"period": {"$lt": period}}, {"period": 1}, sort=[("period", -1)])
+        return self.get_by_period(run["period"]) if run else None
+
+    def compute_delta(self, base_run, batch_size=ENTRY_CHUNK_SIZE):
+        """Entries and totals for the active roster, recomputing only personnel changed since base_run.
+
+        A base entry is reused when it was built from the same personnel document and that
+        document's updated_at is older than the base run's snapshot_at (the moment its roster was
+        read, less DELTA_CLOCK_SKEW). Everyone else, including documents without updated_at, is
+        recomputed; inactive or deleted personnel are simply not in the scan. Entries come out in
+        active_roster order and totals are summed over them in that order, so the result is
+        identical to compute_run over the full roster.
+
+        Returns (entries, totals, stats).
+        """
+        cutoff = None
+        if base_run.get("snapshot_at"):
+            snapshot = datetime.strptime(base_run["snapshot_at"], '%Y-%m-%dT%H:%M:%S.%fZ')
+            cutoff = (snapshot - DELTA_CLOCK_SKEW).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        reusable = {}
+        if cutoff:
+            base_entries = self.entries.find(
+                {"period": base_run["period"], "rev": base_run["rev"], "person_id": {"$exists": True}},
+                {"_id": 0, "period": 0, "rev": 0}, batch_size=batch_size)
+            reusable = {e["person_id"]: e for e in base_entries}
+
+        scan = list(self.active_roster({"updated_at": 1}, batch_size=batch_size))
+        entries = [None] * len(scan)
+        stale = []
+        for i, doc in enumerate(scan):
+            updated_at = doc.get("updated_at")
+            entry = reusable.get(doc["_id"])
+            if entry is not None and isinstance(updated_at, str) and updated_at < cutoff:
+                entries[i] = entry
+            else:
+                stale.append(i)
+
+        for start in range(0, len(stale), batch_size):
+            positions = stale[start:start + batch_size]
+            docs = {d["_id"]: d for d in self.people.find(
+                {"_id": {"$in": [scan[i]["_id"] for i in positions]}}, ROSTER_PROJECTION)}
+            # Documents deleted since the scan drop out, as they would from a fresh full read
+            positions = [i for i in positions if scan[i]["_id"] in docs]
+            computed, _ = self.compute_run([docs[scan[i]["_id"]] for i in positions])
+            for i, entry in zip(positions, computed):
+                entries[i] = entry
+
+        entries = [e for e in entries if e is not None]
+        stats = {
+            "base_period": base_run["period"],
+            "reused": len(scan) - len(stale),
+            "recomputed": len(stale),
+            "removed": len(reusable.keys() - {d["_id"] for d in scan}),
+        }
+        return entries, self._recompute_totals(entries), stats
+
+    def iter_preview(self, personnel, totals, batch_size=1000):
+        """Yield preview entries from a personnel cursor without holding the roster in memory."""
+        return payroll_engine.iter_entries(personnel, totals, batch_size)
+
+    def iter_run_entries(self, period, rev=None, batch_size=1000):
+        """Stream the entries of a stored run (in approval order) straight from the entries collection.
+
+        Entries are read for the header's current `rev`; pass it when the header is already loaded.
+        """
+        if rev is None:
+            run = self.get_by_period(period)
+            rev = run.get("rev") if run else None
+        return self.entries.find({"period": period, "rev": rev}, ENTRY_PROJECTION, batch_size=batch_size).sort("_id", 1)
+
+    def get_entries(self, period, rev=None):
+        return list(self.iter_run_entries(period, rev))
+
+    def iter_export_chunks(self, period, rev, chunk_size=ENTRY_CHUNK_SIZE):
+        """Yield a run's entries (approval order) as lists of up to chunk_size rows, with each
+        person's bankName/accountNumber joined in by one personnel query per chunk.
+
+        Entries are matched to personnel by person_id, or by armyNumberKey for entries stored
+        before person_id existed.
+        """
+        cursor = self.entries.find(
+            {"period": period, "rev": rev}, {"_id": 0, "period": 0, "rev": 0}, batch_size=chunk_size,
+        ).sort("_id", 1)
+        while True:
+            chunk = list(islice(cursor, chunk_size))
+            if not chunk:
+                return
+            ids = [e["person_id"] for e in chunk if e.get("person_id") is not None]
+            keys = [army_number_key(e.get("armynumber")) for e in chunk if e.get("person_id") is None]
+            by_id, by_key = {}, {}
+            people = self.people.find(
+                {"$or": [{"_id": {"$in": ids}}, {"armyNumberKey": {"$in": keys}}]},
+                {"bankName": 1, "accountNumber": 1, "armyNumberKey": 1},
+            )
+            for p in people:
+                by_id[p["_id"]] = p
+                if p.get("armyNumberKey"):
+                    by_key[p["armyNumberKey"]] = p
+            for e in chunk:
+                pid = e.pop("person_id", None)
+                p = by_id.get(pid) if pid is not None else by_key.get(army_number_key(e.get("armynumber")))
+                e["bankName"] = p.get("bankName") if p else None
+                e["accountNumber"] = p.get("accountNumber") if p else None
+            yield chunk
+
+    def ensure_indexes(self):
+        self.collection.create_index("period", unique=True)
+        # History is a keyset scan on (approved_at, _id); this index supersedes approved_at_-1
+        try:
+            self.collection.drop_index("approved_at_-1")
+        except OperationFailure:
+            pass
+        self.collection.create_index([("approved_at", -1), ("_id", -1)], name="approved_at_id")
+        # Entries are keyed by run revision so a replacement run can be written next to the live one
+        # One entry per person and revision; army numbers may be missing or shared, so they are not a key
+        for old in ("period_armynumber", "period_order", "period_rev_armynumber"):
+            try:
+                self.entries.drop_index(old)
+            except OperationFailure:
+                pass
+        self.entries.create_index(
+            [("period", 1), ("rev", 1), ("person_id", 1)], unique=True, name="period_rev_person",
+            partialFilterExpression={"person_id": {"$exists": True}},
+        )
+        self.entries.create_index([("period", 1), ("rev", 1), ("_id", 1)], name="period_rev_order")
+
+    def summarize_run(self, period, group_by=(), rev=None):
+        """Totals and per-group breakdowns of a stored run, aggregated in MongoDB."""
+        if rev is None:
+            run = self.get_by_period(period)
+            rev = run.get("rev") if run else None
+        pipeline = summary_pipeline({"period": period, "rev": rev}, group_by, source="entries")
+        doc = next(self.entries.aggregate(pipeline, allowDiskUse=True), {})
+        return summary_result(doc, group_by)
+
+    def summarize_personnel(self, group_by=()):
+        """Preview totals and breakdowns of the active roster without loading it into Python."""
+        pipeline = summary_pipeline({"active": True}, group_by)
+        doc = next(self.people.aggregate(pipeline, allowDiskUse=True), {})
+        return summary_result(doc, group_by)
+
     def get_by_period(self, period):
-        return self.collection.find_one({"period": period})
+        """Return the run header for a period (entries live in payroll_entries)."""
+        run = self.collection.find_one({"period": period}, RUN_HEADER_PROJECTION)
+        if run and "rev" not in run:
+            # Run stored in an older layout (embedded entries array, or entries without a revision)
+            self.migrate_run(period)
+            run = self.collection.find_one({"period": period}, RUN_HEADER_PROJECTION)
+        return run
 
     def _recompute_totals(self, entries):
         return {
@@ -61,60 +300,353 @@ class PayrollModel:
             "deductions": sum(e.get("deductions", 0) for e in entries)
         }
 
-    def create_run(self, period, entries, totals, approved_by):
+    def _totals_delta(self, old, new):
+        """$inc document that moves the run totals from `old` entry to `new` (either may be None)."""
+        old = old or {}
+        new = new or {}
+        inc = {
+            "totals.gross": (new.get("basic", 0) + new.get("allowance", 0)) - (old.get("basic", 0) + old.get("allowance", 0)),
+            "totals.allowances": new.get("allowance", 0) - old.get("allowance", 0),
+            "totals.deductions": new.get("deductions", 0) - old.get("deductions", 0),
+        }
+        if bool(new) != bool(old):
+            inc["entry_count"] = 1 if new else -1
+        return inc
+
+    def verify_totals(self, period, repair=False, tolerance=0.005):
+        """Recompute a run's totals from its entries and compare them with the stored ones.
+
+        Incremental $inc updates can drift by float rounding; with repair=True the stored totals
+        and entry_count are replaced by the recomputed values when they differ by more than
+        `tolerance` (or the count differs).
+        """
+        run = self.get_by_period(period)
+        if not run:
+            return None
+        entries = self._amounts(period, run["rev"])
+        expected = self._recompute_totals(entries)
+        stored = run.get("totals") or {}
+        drift = {k: stored.get(k, 0) - v for k, v in expected.items()}
+        ok = len(entries) == run.get("entry_count") and all(abs(d) <= tolerance for d in drift.values())
+        if repair and not ok:
+            self.collection.update_one(
+                {"_id": run["_id"], "rev": run["rev"]},
+                {"$set": {"totals": expected, "entry_count": len(entries)}},
+            )
+        return {
+            "period": period,
+            "ok": ok,
+            "repaired": bool(repair and not ok),
+            "totals": expected,
+            "stored_totals": stored,
+            "entry_count": len(entries),
+            "stored_entry_count": run.get("entry_count"),
+            "drift": drift,
+        }
+
+    def _amounts(self, period, rev):
+        return list(self.entries.find(
+            {"period": period, "rev": rev}, {"_id": 0, "basic": 1, "allowance": 1, "deductions": 1},
+        ).sort("_id", 1))
+
+    def _insert_entries(self, period, rev, entries):
+        """Insert the entries of a run revision in chunks."""
+        for i in range(0, len(entries), ENTRY_CHUNK_SIZE):
+            chunk = entries[i:i + ENTRY_CHUNK_SIZE]
+            self.entries.insert_many([dict(e, period=period, rev=rev) for e in chunk], ordered=False)
+
+    def _header(self, period, rev, entries, totals, approved_by, snapshot_at=None, content_hash=None):
         doc = {
             "period": period,
-            "entries": entries,
+            "rev": rev,
             "totals": totals,
+            "entry_count": len(entries),
+            "content_hash": content_hash or entries_hash(entries),
             "approved_by": approved_by,
-            "approved_at": datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            "approved_at": _now_iso(),
         }
-        self.collection.insert_one(doc)
+        if snapshot_at:
+            doc["snapshot_at"] = snapshot_at
         return doc
 
-    def overwrite_run(self, existing_id, new_doc):
-        self.collection.replace_one({"_id": existing_id}, new_doc)
+    def create_run(self, period, entries, totals, approved_by, snapshot_at=None):
+        """Store a new run. Raises DuplicateKeyError if the period already has one.
 
-    def list_history(self, limit=20):
-        """Return latest payroll runs"""
-        runs = list(self.collection.find({}, {"entries": 0}).sort("approved_at", -1).limit(limit))
-        for r in runs:
-            r["_id"] = str(r["_id"])
-        return runs
+        Entries go in under a fresh revision first; they only become visible when the header
+        (unique on period) is inserted, so a losing concurrent approval leaves nothing behind.
+        snapshot_at is when the roster was read (see compute_delta).
+        """
+        rev = ObjectId()
+        doc = self._header(period, rev, entries, totals, approved_by, snapshot_at)
+        self._insert_entries(period, rev, entries)
+        try:
+            self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            self.entries.delete_many({"period": period, "rev": rev})
+            raise
+        return doc
 
-    def upsert_person_entry(self, period, person_doc, approved_by):
-        """Add or update a single person's entry in a payroll run for the period."""
-        entry = self.build_entry(person_doc)
-        run = self.get_by_period(period)
-        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    def delete_run(self, period):
+        self.collection.delete_one({"period": period})
+        self.entries.delete_many({"period": period})
+
+    def overwrite_run(self, period, entries, totals, approved_by, snapshot_at=None):
+        """Replace (or create) the run for a period atomically; returns (header, written).
+
+        The new entries are written under a fresh revision while the old run stays readable, then
+        one upsert on the unique period swaps the header over and the old revision is dropped.
+        Readers see either the old run or the new one, never an empty or mixed period, and
+        concurrent overwrites end with exactly one run (the last swap wins). When the entries hash
+        the same as the stored run nothing is written and `written` is False.
+        """
+        content_hash = entries_hash(entries)
+        current = self.get_by_period(period)
+        if current and current.get("content_hash") == content_hash:
+            return current, False
+        rev = ObjectId()
+        doc = self._header(period, rev, entries, totals, approved_by, snapshot_at, content_hash)
+        self._insert_entries(period, rev, entries)
+        return self._swap_header(period, doc), True
+
+    def _swap_header(self, period, doc):
+        """Point the period's header at doc["rev"] and delete the revision it replaced."""
+        unset = {"updated_at": "", "legacy_entries": ""}
+        if "content_hash" not in doc:
+            unset["content_hash"] = ""
+        for attempt in range(2):
+            try:
+                old = self.collection.find_one_and_update(
+                    {"period": period},
+                    {"$set": doc, "$unset": unset},
+                    upsert=True,
+                    projection={"rev": 1},
+                    return_document=ReturnDocument.BEFORE,
+                )
+                break
+            except DuplicateKeyError:
+                # Two upserts inserted the same period at once; the retry updates the winner
+                if attempt:
+                    raise
+        if old and old.get("rev") != doc["rev"]:
+            self.entries.delete_many({"period": period, "rev": old.get("rev")})
+        return doc
+
+    def migrate_run(self, period):
+        """Bring an old-layout run to the revisioned layout.
+
+        Embedded entries arrays move into payroll_entries; entries already there but without a
+        revision are stamped with one. The run's own _id becomes the revision and moved entries
+        get ids derived from it (migrated_entry_id), so two readers migrating the same run at once
+        write the same documents and end with one copy of each entry. Migrated runs are flagged
+        `legacy_entries`: their entries have no person_id yet.
+        """
+        run = self.collection.find_one({"period": period, "rev": {"$exists": False}})
         if not run:
-            entries = [entry]
-            totals = self._recompute_totals(entries)
-            doc = {
-                "period": period,
-                "entries": entries,
-                "totals": totals,
-                "approved_by": approved_by,
-                "approved_at": now,
+            return False
+        rev = run["_id"]
+        update = {"rev": rev, "legacy_entries": True}
+        if "entry_count" not in run:
+            entries = run.get("entries") or []
+            # Clear anything left behind by an interrupted migration from before revisions existed
+            self.entries.delete_many({"period": period, "rev": {"$exists": False}})
+            for i in range(0, len(entries), ENTRY_CHUNK_SIZE):
+                docs = [dict(e, _id=migrated_entry_id(rev, i + j), period=period, rev=rev)
+                        for j, e in enumerate(entries[i:i + ENTRY_CHUNK_SIZE])]
+                try:
+                    self.entries.insert_many(docs, ordered=False)
+                except BulkWriteError as bwe:
+                    # Entries another migration of this run already wrote
+                    if any(err.get("code") != 11000 for err in bwe.details.get("writeErrors", [])):
+                        raise
+            update["entry_count"] = len(entries)
+            self.collection.update_one({"_id": run["_id"], "rev": {"$exists": False}},
+                                       {"$set": update, "$unset": {"entries": ""}})
+        else:
+            # Entries first: until the header has its revision, readers keep seeing an old-layout run
+            self.entries.update_many({"period": period, "rev": {"$exists": False}}, {"$set": {"rev": rev}})
+            self.collection.update_one({"_id": run["_id"], "rev": {"$exists": False}}, {"$set": update})
+        return True
+
+    def migrate_runs(self):
+        """Migrate every old-layout run; returns the number of runs migrated."""
+        periods = [r["period"] for r in self.collection.find({"rev": {"$exists": False}}, {"period": 1})]
+        return sum(1 for p in periods if self.migrate_run(p))
+
+    @untimed
+    def run_summary(self, run):
+        """API form of a run header: the stored summary fields plus headcount."""
+        run = dict(run)
+        run["_id"] = str(run["_id"])
+        run["headcount"] = run.get("entry_count", 0)
+        return run
+
+    def list_history(self, limit=HISTORY_PAGE_SIZE, cursor=None, date_from=None, date_to=None):
+        """One page of run summaries, newest approval first, plus the cursor for the next page.
+
+        Run headers are the materialized summaries (period, totals, entry_count, approver,
+        timestamps; entries live elsewhere), kept current by every write path. Pages are keyset
+        scans of the (approved_at, _id) index; date_from / date_to bound approved_at.
+        """
+        spec = self.history_query(limit, cursor, date_from, date_to)
+        docs = list(self.collection.find(spec["query"], spec["projection"]).sort(spec["sort"]).limit(spec["limit"] + 1))
+        return self.history_result(docs, spec["limit"])
+
+    def history_query(self, limit=HISTORY_PAGE_SIZE, cursor=None, date_from=None, date_to=None):
+        """Build the find() arguments for list_history (shared with the async serving path)."""
+        limit = max(1, min(int(limit or HISTORY_PAGE_SIZE), MAX_HISTORY_PAGE_SIZE))
+        clauses = []
+        for value, end in ((date_from, False), (date_to, True)):
+            if value:
+                op, bound = history_bound(value, end)
+                clauses.append({"approved_at": {op: bound}})
+        if cursor:
+            clauses.append(after_clause("approved_at", cursor))
+        return {
+            "query": {"$and": clauses} if clauses else {},
+            "projection": RUN_SUMMARY_PROJECTION,
+            "sort": [("approved_at", -1), ("_id", -1)],
+            "limit": limit,
+        }
+
+    def history_result(self, docs, limit):
+        """Turn up to limit + 1 fetched headers into (page, next_cursor)."""
+        next_cursor = encode_cursor(docs[limit - 1], "approved_at") if len(docs) > limit else None
+        return [self.run_summary(d) for d in docs[:limit]], next_cursor
+
+    def compare_runs(self, period, against=None):
+        """Period-over-period change of totals and headcount, read from run headers only.
+
+        `against` defaults to the latest run before `period`. Returns None when either run is
+        missing.
+        """
+        current = self.collection.find_one({"period": period}, RUN_SUMMARY_PROJECTION)
+        if against:
+            previous = self.collection.find_one({"period": against}, RUN_SUMMARY_PROJECTION)
+        else:
+            previous = self.collection.find_one({"period": {"$lt": period}}, RUN_SUMMARY_PROJECTION,
+                                                sort=[("period", -1)])
+        if not current or not previous:
+            return None
+
+        def figures(run):
+            totals = run.get("totals") or {}
+            values = {k: totals.get(k, 0) for k in ("gross", "allowances", "deductions")}
+            values["net"] = values["gross"] - values["deductions"]
+            values["headcount"] = run.get("entry_count", 0)
+            return values
+
+        now, before = figures(current), figures(previous)
+        change = {
+            k: {
+                "current": now[k],
+                "previous": before[k],
+                "change": now[k] - before[k],
+                "percent": round((now[k] - before[k]) / before[k] * 100, 2) if before[k] else None,
             }
-            self.collection.insert_one(doc)
-            doc["_id"] = str(doc.get("_id", ""))
+            for k in COMPARED_TOTALS + ("headcount",)
+        }
+        return {
+            "period": period,
+            "against": previous["period"],
+            "current": self.run_summary(current),
+            "previous": self.run_summary(previous),
+            "change": change,
+        }
+
+    def upsert_person_entry(self, period, person_doc, approved_by, attempts=5):
+        """Add or update a single person's entry in a payroll run for the period.
+
+        One upsert on the person's entry plus an $inc of the run totals by the difference, applied
+        only while the header still points at the revision the entry went into. If the run was
+        replaced in between, the entry is dropped from the dead revision and the approval is
+        retried against the current one.
+        """
+        entry = self.build_entry(person_doc)
+        pid = person_doc.get("_id")
+        for _ in range(attempts):
+            now = _now_iso()
+            run = self.get_by_period(period)  # migrates an old-layout run first
+            if not run:
+                try:
+                    run = self.collection.find_one_and_update(
+                        {"period": period},
+                        {"$setOnInsert": {"rev": ObjectId(), "approved_by": approved_by, "approved_at": now}},
+                        upsert=True,
+                        projection={"rev": 1},
+                        return_document=ReturnDocument.AFTER,
+                    )
+                except DuplicateKeyError:
+                    continue
+            rev = run["rev"]
+            old = None
+            try:
+                if run.get("legacy_entries") and entry["armynumber"]:
+                    # Migrated run: the person's entry may predate person_id; take it over by army number
+                    old = self.entries.find_one_and_update(
+                        {"period": period, "rev": rev, "person_id": {"$exists": False},
+                         "armynumber": entry["armynumber"]},
+                        {"$set": dict(entry, person_id=pid)},
+                        return_document=ReturnDocument.BEFORE,
+                    )
+                if old is None:
+                    old = self.entries.find_one_and_update(
+                        {"period": period, "rev": rev, "person_id": pid},
+                        {"$set": entry},
+                        upsert=True,
+                        return_document=ReturnDocument.BEFORE,
+                    )
+            except DuplicateKeyError:
+                # A concurrent approval of the same person inserted the entry first
+                continue
+            header = self.collection.find_one_and_update(
+                {"period": period, "rev": rev},
+                {"$inc": self._totals_delta(old, entry), "$set": {"updated_at": now},
+                 "$unset": {"content_hash": ""}},
+                projection=RUN_SUMMARY_PROJECTION,
+                return_document=ReturnDocument.AFTER,
+            )
+            if header is not None:
+                header["_id"] = str(header["_id"])
+                return header
+            # Overwritten or deleted meanwhile: the entry went into a revision nobody reads
+            self.entries.delete_one({"period": period, "rev": rev, "person_id": pid})
+        raise RuntimeError(f"Payroll run for {period} kept changing; entry not added")
+
+    def write_entries(self, period, rev, entries):
+        """Idempotent chunk write for approval jobs: one unordered bulk of upserts.
+
+        Entries are keyed by person_id and $setOnInsert keeps the first write, so a chunk is safe
+        to write again after a crash. The _id is assigned here so stored entries keep the order
+        they were computed in.
+        """
+        if not entries:
+            return
+        self.entries.bulk_write([
+            UpdateOne(
+                {"period": period, "rev": rev, "person_id": e.get("person_id")},
+                {"$setOnInsert": dict(e, _id=ObjectId(), period=period, rev=rev)},
+                upsert=True,
+            )
+            for e in entries
+        ], ordered=False)
+
+    def finalize_run(self, period, rev, approved_by, snapshot_at=None):
+        """Publish a job-written revision: totals recomputed in order, then the header swap."""
+        entries = self._amounts(period, rev)
+        doc = {
+            "period": period,
+            "rev": rev,
+            "totals": self._recompute_totals(entries),
+            "entry_count": len(entries),
+            "approved_by": approved_by,
+            "approved_at": _now_iso(),
+        }
+        if snapshot_at:
+            doc["snapshot_at"] = snapshot_at
+        if not entries:
             return doc
+        return self._swap_header(period, doc)
 
-        # Update or append
-        entries = list(run.get("entries", []))
-        key = entry.get("armynumber")
-        found = False
-        for i, e in enumerate(entries):
-            if e.get("armynumber") == key:
-                entries[i] = entry
-                found = True
-                break
-        if not found:
-            entries.append(entry)
-        totals = self._recompute_totals(entries)
-        self.collection.update_one({"_id": run["_id"]}, {"$set": {"entries": entries, "totals": totals, "updated_at": now}})
-        # Return minimal run info
-        run["entries"] = entries
-        run["totals"] = totals
-        return run
+    def discard_revision(self, period, rev):
+        """Delete entries of a revision that never became the run's current one."""
+        self.entries.delete_many({"period": period, "rev": rev})
@@ -0,0 +1,174 @@
+"""Aggregation pipelines computing payroll totals and breakdowns inside MongoDB.
+
+The expressions mirror PayrollModel.build_entry: the first key *present* in the document wins
+(even when its value is null), and amounts go through the same str -> strip commas -> float
+conversion, with anything unconvertible counting as 0.
+
+Strings are checked against Python's float() grammar before $convert sees them, because the
+server's parser disagrees with it at the edges ("1_000", "inf", padding). What still differs:
+non-ASCII digits ("١٢٣" is 123.0 to Python and 0 here) and numbers too large for a double
+("1e999" is inf to Python and 0 here).
+"""
+from models.payroll_engine import NUMERIC_FIELDS, TEXT_FIELDS
+
+# groupBy name -> entry field (stored runs) / personnel fallback keys (live roster)
+GROUP_FIELDS = {
+    "region": "region",
+    "corps": "corps",
+    "rank": "rank",
+    "fmn_unit": "fmnunit",
+}
+_TEXT_KEYS = dict(TEXT_FIELDS)
+_NUMERIC_KEYS = dict(NUMERIC_FIELDS)
+
+# Everything str.strip() and float() treat as whitespace (str.isspace), not $trim's default set
+_WHITESPACE = (
+    "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005"
+    "\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000"
+)
+# float() literals: digits may be grouped with single underscores; inf/nan in any case
+_DIGITS = r"[0-9](_?[0-9])*"
+_FLOAT_RE = rf"^[+-]?({_DIGITS}(\.({_DIGITS})?)?|\.{_DIGITS})([eE][+-]?{_DIGITS})?$"
+_INF_RE = r"^[+-]?inf(inity)?$"
+_NAN_RE = r"^[+-]?nan$"
+
+
+def _present(key):
+    return {"$ne": [{"$type": f"${key}"}, "missing"]}
+
+
+def pick_expr(keys, default):
+    """First present key, like nested d.get(k1, d.get(k2, default))."""
+    expr = default
+    for key in reversed(keys):
+        expr = {"$cond": [_present(key), f"${key}", expr]}
+    return expr
+
+
+def _matches(regex, options=""):
+    return {"$regexMatch": {"input": "$$s", "regex": regex, "options": options}}
+
+
+def number_expr(value):
+    """PayrollModel._num as an expression: numbers as-is, numeric strings parsed, else 0."""
+    parse = {"$let": {
+        "vars": {"s": {"$trim": {
+            "input": {"$replaceAll": {"input": value, "find": ",", "replacement": ""}},
+            "chars": _WHITESPACE,
+        }}},
+        "in": {"$switch": {
+            "branches": [
+                {"case": _matches(_FLOAT_RE),
+                 "then": {"$convert": {
+                     "input": {"$replaceAll": {"input": "$$s", "find": "_", "replacement": ""}},
+                     "to": "double", "onError": 0.0,
+                 }}},
+                {"case": _matches(_INF_RE, "i"),
+                 "then": {"$cond": [{"$eq": [{"$substrCP": ["$$s", 0, 1]}, "-"]},
+                                    float("-inf"), float("inf")]}},
+                {"case": _matches(_NAN_RE, "i"), "then": float("nan")},
+            ],
+            "default": 0.0,
+        }},
+    }}
+    return {"$switch": {
+        "branches": [
+            {"case": {"$in": [{"$type": value}, ["double", "int", "long", "decimal"]]},
+             "then": {"$toDouble": value}},
+            {"case": {"$eq": [{"$type": value}, "string"]}, "then": parse},
+        ],
+        "default": 0.0,
+    }}
+
+
+def personnel_amounts():
+    """$project stage resolving the amount fields of a personnel document."""
+    return {name: number_expr(pick_expr(keys, 0)) for name, keys in NUMERIC_FIELDS}
+
+
+def _sums(prefix=""):
+    return {
+        "count": {"$sum": 1},
+        "gross": {"$sum": {"$add": [f"${prefix}basic", f"${prefix}allowance"]}},
+        "allowances": {"$sum": f"${prefix}allowance"},
+        "deductions": {"$sum": f"${prefix}deductions"},
+    }
+
+
+def summary_pipeline(match, group_by=(), source="personnel"):
+    """One pass over the matched documents: grand totals plus one facet per groupBy field.
+
+    source="personnel" resolves legacy/canonical keys; source="entries" reads stored run entries,
+    which already use the canonical entry field names.
+    """
+    if source == "personnel":
+        project = personnel_amounts()
+        for group in group_by:
+            project[group] = pick_expr(_TEXT_KEYS[GROUP_FIELDS[group]], "")
+    else:
+        project = {name: 1 for name, _ in NUMERIC_FIELDS}
+        for group in group_by:
+            project[group] = f"${GROUP_FIELDS[group]}"
+    project["_id"] = 0
+
+    facets = {"totals": [{"$group": {"_id": None, **_sums()}}]}
+    for group in group_by:
+        facets[group] = [
+            {"$group": {"_id": f"${group}", **_sums()}},
+            {"$sort": {"gross": -1, "_id": 1}},
+        ]
+    return [{"$match": match}, {"$project": project}, {"$facet": facets}]
+
+
+def _row(doc):
+    return {
+        "count": doc["count"],
+        "gross": doc["gross"],
+        "allowances": doc["allowances"],
+        "deductions": doc["deductions"],
+        "net": doc["gross"] - doc["deductions"],
+    }
+
+
+def summary_result(doc, group_by=()):
+    """Shape the $facet output into {"count", "totals", "groups"}."""
+    grand = (doc.get("totals") or [None])[0]
+    if not grand:
+        return {"count": 0, "totals": {}, "groups": {g: [] for g in group_by}}
+    row = _row(grand)
+    return {
+        "count": row.pop("count"),
+        "totals": {k: row[k] for k in ("gross", "allowances", "deductions")},
+        "groups": {g: [dict(key=d["_id"], **_row(d)) for d in doc.get(g, [])] for g in group_by},
+    }
+
+
+def summarize_entries(entries, group_by=()):
+    """The same summary computed in Python from payroll entries (reference for parity checks)."""
+    def row(items):
+        gross = sum(e["basic"] + e["allowance"] for e in items)
+        deductions = sum(e["deductions"] for e in items)
+        return {
+            "count": len(items),
+            "gross": gross,
+            "allowances": sum(e["allowance"] for e in items),
+            "deductions": deductions,
+            "net": gross - deductions,
+        }
+
+    if not entries:
+        return {"count": 0, "totals": {}, "groups": {g: [] for g in group_by}}
+    groups = {}
+    for group in group_by:
+        buckets = {}
+        for e in entries:
+            buckets.setdefault(e.get(GROUP_FIELDS[group], ""), []).append(e)
+        rows = [dict(key=k, **row(v)) for k, v in buckets.items()]
+        rows.sort(key=lambda r: -r["gross"])
+        groups[group] = rows
+    grand = row(entries)
+    return {
+        "count": grand.pop("count"),
+        "totals": {k: grand[k] for k in ("gross", "allowances", "deductions")},
+        "groups": groups,
+    }
@@ -0,0 +1,286 @@
+from array import array
+from dataclasses import dataclass
+from itertools import islice, repeat
+from operator import add, itemgetter, sub
+
+# Field name -> personnel keys in fallback order (same order as PayrollModel.build_entry)
+TEXT_FIELDS = (
+    ("armynumber", ("armyNumber", "Army_Number", "armynumber")),
+    ("name", ("fullName", "Name", "name")),
+    ("rank", ("rank", "Rank")),
+    ("corps", ("corps", "Corps")),
+    ("fmnunit", ("fmn_unit", "Fmn/Unit", "Fmn_Unit")),
+    ("region", ("region", "Region")),
+)
+NUMERIC_FIELDS = (
+    ("basic", ("basicSalary", "BasicSalary", "Basic_Pay")),
+    ("allowance", ("allowance", "Allowance")),
+    ("deductions", ("deductions", "Deductions")),
+)
+# Personnel documents with schemaVersion == CANONICAL_SCHEMA hold only the first (canonical) key of
+# each field above, amounts as floats (PersonnelModel._coerce_create / migrate_schema)
+SCHEMA_KEY = "schemaVersion"
+CANONICAL_SCHEMA = 1
+CANONICAL_KEYS = tuple(keys[0] for _, keys in NUMERIC_FIELDS + TEXT_FIELDS)
+# Everything normalize() reads, in any spelling; roster queries project to these
+SOURCE_PROJECTION = dict.fromkeys([k for _, keys in NUMERIC_FIELDS + TEXT_FIELDS for k in keys] + [SCHEMA_KEY], 1)
+ENTRY_STATUS = "approved"
+ENTRY_FIELDS = ("armynumber", "name", "rank", "corps", "fmnunit", "region",
+                "basic", "allowance", "deductions", "net", "status")
+
+
+def pick(d, keys, default=""):
+    """Return the value of the first key present in d (like nested dict.get fallbacks)."""
+    for k in keys:
+        if k in d:
+            return d[k]
+    return default
+
+
+def to_float(v):
+    """Same result as PayrollModel._num, skipping the str()/replace round-trip when it is a no-op."""
+    t = type(v)
+    if t is float:
+        return v
+    if t is str or t is int:
+        try:
+            return float(v)
+        except (ValueError, OverflowError):
+            pass
+    try:
+        return float(str(v).replace(',', '').strip())
+    except Exception:
+        return 0.0
+
+
+@dataclass(slots=True)
+class PayrollEntry:
+    """Compact payroll entry: same fields, order and JSON as the build_entry dict, at a fraction
+    of the memory (no per-entry hash table; `status` is a shared default).
+
+    orjson serializes it natively as a dataclass; bson.json_util (and code reading entries like
+    dicts) goes through the read-only mapping methods below.
+    """
+
+    armynumber: object
+    name: object
+    rank: object
+    corps: object
+    fmnunit: object
+    region: object
+    basic: float
+    allowance: float
+    deductions: float
+    net: float
+    status: str = ENTRY_STATUS
+
+    def keys(self):
+        return ENTRY_FIELDS
+
+    def items(self):
+        return [(f, getattr(self, f)) for f in ENTRY_FIELDS]
+
+    def __getitem__(self, key):
+        if key not in ENTRY_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in ENTRY_FIELDS else default
+
+    def as_dict(self):
+        return dict(self.items())
+
+
+class PayrollColumns:
+    """A batch of payroll entries held column-wise (text in lists, amounts in typed arrays)."""
+
+    __slots__ = ("armynumber", "name", "rank", "corps", "fmnunit", "region",
+                 "basic", "allowance", "deductions", "net")
+
+    def __init__(self):
+        self.armynumber = []
+        self.name = []
+        self.rank = []
+        self.corps = []
+        self.fmnunit = []
+        self.region = []
+        self.basic = array("d")
+        self.allowance = array("d")
+        self.deductions = array("d")
+        self.net = array("d")
+
+    def __len__(self):
+        return len(self.armynumber)
+
+    def records(self):
+        """PayrollEntry per person, for entries that are cached or serialized rather than stored."""
+        return list(map(
+            PayrollEntry, self.armynumber, self.name, self.rank, self.corps, self.fmnunit, self.region,
+            self.basic, self.allowance, self.deductions, self.net,
+        ))
+
+    def entries(self):
+        """Build the per-entry dicts (only needed at serialization time)."""
+        return [
+            {
+                "armynumber": a,
+                "name": n,
+                "rank": r,
+                "corps": c,
+                "fmnunit": f,
+                "region": g,
+                "basic": b,
+                "allowance": al,
+                "deductions": d,
+                "net": net,
+                "status": ENTRY_STATUS,
+            }
+            for a, n, r, c, f, g, b, al, d, net in zip(
+                self.armynumber, self.name, self.rank, self.corps, self.fmnunit, self.region,
+                self.basic, self.allowance, self.deductions, self.net,
+            )
+        ]
+
+
+class _ShapeKeys(dict):
+    """Cache of document key-set -> resolved key per payroll field.
+
+    Rosters only contain a handful of distinct key layouts, so the fallback chain is walked once
+    per layout instead of once per document. Absent fields resolve to None (never a key).
+    """
+
+    max_shapes = 4096
+
+    def __missing__(self, shape):
+        if len(self) >= self.max_shapes:
+            self.clear()
+        present = set(shape)
+        resolved = tuple(
+            next((k for k in keys if k in present), None)
+            for _, keys in NUMERIC_FIELDS + TEXT_FIELDS
+        )
+        self[shape] = resolved
+        return resolved
+
+
+_shape_keys = _ShapeKeys()
+
+
+def _column(docs, resolved, i, default):
+    return list(map(dict.get, docs, map(itemgetter(i), resolved), repeat(default)))
+
+
+def _amounts(values):
+    return array("d", [v if type(v) is float else to_float(v) for v in values])
+
+
+def _is_canonical(d):
+    return d.get(SCHEMA_KEY) == CANONICAL_SCHEMA
+
+
+def _normalize_canonical(docs):
+    """normalize() for a batch of canonical documents: one key per field, floats taken as is.
+
+    The schema marker does not guarantee the amounts (a write outside the model can leave a string
+    or null behind), so anything that is not a float still goes through to_float.
+    """
+    cols = PayrollColumns()
+    basic, allowance, deductions, *text = CANONICAL_KEYS
+    cols.basic = _amounts(map(dict.get, docs, repeat(basic), repeat(0.0)))
+    cols.allowance = _amounts(map(dict.get, docs, repeat(allowance), repeat(0.0)))
+    cols.deductions = _amounts(map(dict.get, docs, repeat(deductions), repeat(0.0)))
+    cols.armynumber, cols.name, cols.rank, cols.corps, cols.fmnunit, cols.region = (
+        list(map(dict.get, docs, repeat(key), repeat(""))) for key in text
+    )
+    return cols
+
+
+def normalize(personnel):
+    """Resolve legacy/canonical keys once per key layout into a PayrollColumns batch.
+
+    Batches of canonical documents (see CANONICAL_SCHEMA) skip key resolution and number parsing.
+    """
+    docs = [d if type(d) is dict else dict(d or {}) for d in personnel]
+    if all(map(_is_canonical, docs)):
+        return _normalize_canonical(docs)
+    resolved = [CANONICAL_KEYS if _is_canonical(d) else _shape_keys[tuple(d)] for d in docs]
+    cols = PayrollColumns()
+    cols.basic = _amounts(_column(docs, resolved, 0, 0))
+    cols.allowance = _amounts(_column(docs, resolved, 1, 0))
+    cols.deductions = _amounts(_column(docs, resolved, 2, 0))
+    cols.armynumber = _column(docs, resolved, 3, "")
+    cols.name = _column(docs, resolved, 4, "")
+    cols.rank = _column(docs, resolved, 5, "")
+    cols.corps = _column(docs, resolved, 6, "")
+    cols.fmnunit = _column(docs, resolved, 7, "")
+    cols.region = _column(docs, resolved, 8, "")
+    return cols
+
+
+def compute(cols):
+    """Fill the net column and return the totals, column-at-a-time.
+
+    Totals use sum() over the same per-entry values as before so they match bit for bit.
+    """
+    gross_col = list(map(add, cols.basic, cols.allowance))
+    cols.net = array("d", map(sub, gross_col, cols.deductions))
+    return {
+        "gross": sum(gross_col),
+        "allowances": sum(cols.allowance),
+        "deductions": sum(cols.deductions),
+    }
+
+
+def concat(batches):
+    """One PayrollColumns holding the given batches back to back, in order."""
+    cols = PayrollColumns()
+    for batch in batches:
+        for name in PayrollColumns.__slots__:
+            getattr(cols, name).extend(getattr(batch, name))
+    return cols
+
+
+class StreamingTotals:
+    """Running totals for streamed batches, in constant memory whatever the roster size.
+
+    Each batch is folded into the running sums with sum(values, running). On Python 3.11 and
+    older sum() adds floats strictly left to right, so this is the same sequence of additions as
+    one sum() over the whole roster and the totals equal compute()'s bit for bit. Python 3.12+
+    compensates rounding within each sum() call; there streamed totals may differ from compute()
+    in the last bits (relative error around 1e-16, far below a cent for any payroll).
+    """
+
+    __slots__ = ("count", "gross", "allowances", "deductions")
+
+    def __init__(self):
+        self.count = 0
+        self.gross = 0.0
+        self.allowances = 0.0
+        self.deductions = 0.0
+
+    def add(self, cols):
+        self.count += len(cols)
+        self.gross = sum(map(add, cols.basic, cols.allowance), self.gross)
+        self.allowances = sum(cols.allowance, self.allowances)
+        self.deductions = sum(cols.deductions, self.deductions)
+
+    def as_dict(self):
+        return {
+            "gross": self.gross,
+            "allowances": self.allowances,
+            "deductions": self.deductions,
+        }
+
+
+def iter_entries(personnel, totals, batch_size=1000):
+    """Yield PayrollEntry records batch by batch from any iterable (e.g. a Mongo cursor), feeding totals."""
+    it = iter(personnel)
+    while True:
+        batch = list(islice(it, batch_size))
+        if not batch:
+            return
+        cols = normalize(batch)
+        compute(cols)
+        totals.add(cols)
+        yield from cols.records()
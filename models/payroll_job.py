@@ -0,0 +1,156 @@
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.metrics import instrument, untimed
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def _iso(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def _now():
+    return _iso(datetime.now(timezone.utc))
+
+
+@instrument
+class PayrollJobModel:
+    """Full-payroll approval jobs (payroll_jobs collection).
+
+    A queued or running job holds `active_period` (unique), so there is at most one job per
+    period at a time. Progress is checkpointed per chunk as `last_id`, the _id of the last
+    personnel document written, which is where a resumed job picks up. Entries are written under
+    the job's own run revision and only replace the period's run when the job finishes.
+    """
+
+    def __init__(self, db):
+        self.bind(db)
+
+    @untimed
+    def bind(self, db):
+        self.collection = db.payroll_jobs
+
+    def ensure_indexes(self):
+        self.collection.create_index("active_period", unique=True, sparse=True)
+        self.collection.create_index([("status", 1), ("heartbeat_at", 1)])
+
+    def create(self, period, overwrite, requested_by):
+        """Queue a job; returns (job, created). An already active job for the period is returned as is."""
+        now = _now()
+        doc = {
+            "period": period,
+            "active_period": period,
+            "overwrite": bool(overwrite),
+            "requested_by": requested_by,
+            "status": JOB_QUEUED,
+            "prepared": False,
+            "last_id": None,
+            "processed": 0,
+            "total": None,
+            "attempts": 0,
+            "created_at": now,
+            "heartbeat_at": now,
+        }
+        try:
+            self.collection.insert_one(doc)
+        except DuplicateKeyError:
+            existing = self.active_for(period)
+            if existing:
+                return existing, False
+            raise
+        return doc, True
+
+    def active_for(self, period):
+        return self.collection.find_one({"active_period": period})
+
+    def get(self, job_id):
+        try:
+            oid = ObjectId(job_id)
+        except Exception:
+            return None
+        return self.collection.find_one({"_id": oid})
+
+    def claim(self, job_id=None, stale_after=300):
+        """Atomically take a queued job, or a running one whose worker stopped heart-beating.
+
+        With no job_id, claims the oldest such job. Returns the claimed job or None.
+        """
+        stale = _iso(datetime.now(timezone.utc) - timedelta(seconds=stale_after))
+        query = {"$or": [
+            {"status": JOB_QUEUED},
+            {"status": JOB_RUNNING, "heartbeat_at": {"$lt": stale}},
+        ]}
+        if job_id is not None:
+            query["_id"] = job_id
+        now = _now()
+        return self.collection.find_one_and_update(
+            query,
+            {
+                "$set": {"status": JOB_RUNNING, "worker": f"{socket.gethostname()}:{os.getpid()}",
+                         "heartbeat_at": now},
+                "$inc": {"attempts": 1},
+                "$min": {"started_at": now},
+            },
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def prepared(self, job_id, rev, snapshot_at, total):
+        """Record the run revision the job writes its entries under and when its roster read began."""
+        self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"prepared": True, "rev": rev, "snapshot_at": snapshot_at, "total": total,
+                      "heartbeat_at": _now()}},
+        )
+
+    def checkpoint(self, job_id, last_id, count):
+        """Record a written chunk (doubles as the heartbeat)."""
+        self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"last_id": last_id, "heartbeat_at": _now()}, "$inc": {"processed": count}},
+        )
+
+    def finish(self, job_id, run):
+        self.collection.update_one(
+            {"_id": job_id},
+            {
+                "$set": {"status": JOB_DONE, "entry_count": run["entry_count"], "totals": run["totals"],
+                         "finished_at": _now()},
+                "$unset": {"active_period": ""},
+            },
+        )
+
+    def fail(self, job_id, error):
+        self.collection.update_one(
+            {"_id": job_id},
+            {"$set": {"status": JOB_FAILED, "error": error, "finished_at": _now()},
+             "$unset": {"active_period": ""}},
+        )
+
+    @untimed
+    def to_dict(self, job):
+        total = job.get("total")
+        return {
+            "id": str(job["_id"]),
+            "period": job.get("period"),
+            "status": job.get("status"),
+            "overwrite": job.get("overwrite", False),
+            "processed": job.get("processed", 0),
+            "total": total,
+            "progress": round(job.get("processed", 0) / total, 4) if total else (1.0 if job.get("status") == JOB_DONE else 0.0),
+            "attempts": job.get("attempts", 0),
+            "entry_count": job.get("entry_count"),
+            "totals": job.get("totals"),
+            "error": job.get("error"),
+            "requested_by": job.get("requested_by"),
+            "created_at": job.get("created_at"),
+            "started_at": job.get("started_at"),
+            "finished_at": job.get("finished_at"),
+        }
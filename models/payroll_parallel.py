@@ -0,0 +1,89 @@
+"""Partitioned payroll computation for very large rosters.
+
+The active roster is split into contiguous _id ranges. Each range is read with its own cursor and
+normalized in a worker process (BSON decoding and key resolution are the bulk of the cost, and
+both run outside the parent's GIL). The parent concatenates the partitions in _id order, which is
+exactly active_roster order, and runs the engine's single compute pass (net column and totals)
+over the merged columns. Per-partition subtotals are not added up: float addition is not associative, and
+summing in roster order keeps the totals bit-for-bit equal to the serial engine's.
+"""
+import os
+
+from pymongo import MongoClient
+
+from models import payroll_engine
+
+# Same filter as models.payroll.ACTIVE_ROSTER; kept here so worker processes only import the engine
+ACTIVE_ROSTER = {"active": True}
+
+# (pid, uri, db) -> MongoClient, created on first use after the fork/spawn
+_clients = {}
+
+
+class MongoRoster:
+    """Picklable handle a worker uses to read one _id range of the active roster."""
+
+    def __init__(self, uri, db_name, client_options=None, batch_size=1000):
+        self.uri = uri
+        self.db_name = db_name
+        self.client_options = client_options or {}
+        self.batch_size = batch_size
+
+    def _collection(self):
+        key = (os.getpid(), self.uri, self.db_name)
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = MongoClient(self.uri, **self.client_options)
+        return client.get_default_database(self.db_name).personnel
+
+    def fetch(self, lo, hi):
+        """Active personnel with lo <= _id < hi (None = open end), in _id order."""
+        query = dict(ACTIVE_ROSTER)
+        bounds = {}
+        if lo is not None:
+            bounds["$gte"] = lo
+        if hi is not None:
+            bounds["$lt"] = hi
+        if bounds:
+            query["_id"] = bounds
+        return self._collection().find(
+            query, payroll_engine.SOURCE_PROJECTION, batch_size=self.batch_size).sort("_id", 1)
+
+
+def partition_bounds(collection, parts):
+    """Split the collection's _id space into `parts` contiguous ranges of about equal size.
+
+    Boundaries are taken from the _id index alone (a covered, skip-based walk over all documents,
+    active or not), so they are cheap to find. The first range starts and the last one ends
+    open, so documents inserted meanwhile still fall into exactly one range.
+    """
+    total = collection.estimated_document_count()
+    parts = max(1, min(parts, total))
+    step = total // parts
+    edges = []
+    for i in range(1, parts):
+        doc = next(collection.find({}, {"_id": 1}).sort("_id", 1).skip(i * step).limit(1), None)
+        if doc is not None and (not edges or doc["_id"] > edges[-1]):
+            edges.append(doc["_id"])
+    los = [None] + edges
+    his = edges + [None]
+    return list(zip(los, his))
+
+
+def compute_partition(source, lo, hi):
+    """Worker: read and normalize one range. Returns (PayrollColumns without net, person ids)."""
+    docs = list(source.fetch(lo, hi))
+    return payroll_engine.normalize(docs), [d.get("_id") for d in docs]
+
+
+def compute_partitioned(executor, source, bounds):
+    """Run compute_partition over `bounds` in the executor and merge in range order.
+
+    Returns (columns, person ids, totals) equal to normalize + compute over the whole roster.
+    """
+    futures = [executor.submit(compute_partition, source, lo, hi) for lo, hi in bounds]
+    results = [f.result() for f in futures]
+    cols = payroll_engine.concat(c for c, _ in results)
+    ids = [pid for _, batch_ids in results for pid in batch_ids]
+    totals = payroll_engine.compute(cols)
+    return cols, ids, totals
@@ -1,9 +1,46 @@
+import logging
+import re
 from datetime import datetime, timezone
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.metrics import instrument, untimed
+from models.keyset import after_clause, encode_cursor
+from models.payroll_engine import (
+    CANONICAL_SCHEMA, NUMERIC_FIELDS, SCHEMA_KEY, SOURCE_PROJECTION, TEXT_FIELDS, to_float,
+)
 
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# Filters accepted by list_page; each has a (field, created_at, _id) index
+FILTER_FIELDS = ('rank', 'corps', 'fmn_unit', 'region', 'active')
+_FIELD_NAME = re.compile(r'^[A-Za-z_][A-Za-z0-9_/]*$')
+
+
+def army_number_key(value):
+    """Normalized (trimmed, case-folded) armyNumber used for lookups and the unique index."""
+    return str(value or '').strip().casefold()
+
+
+def name_key(value):
+    """Normalized (trimmed, case-folded) fullName stored as fullNameKey for indexed name search."""
+    return str(value or '').strip().casefold()
+
+@instrument
 class PersonnelModel:
+    # counters document whose `version` changes on every personnel write
+    VERSION_ID = 'personnel'
+
     def __init__(self, db):
+        self.bind(db)
+
+    @untimed
+    def bind(self, db):
         self.collection = db.personnel
+        self.counters = db.counters
 
     def _now_iso(self):
         return datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')
@@ -18,6 +55,98 @@ class PersonnelModel:
         except Exception:
             return float(default)
 
+    def ensure_indexes(self):
+        self.collection.create_index(
+            'armyNumberKey', unique=True, name='armyNumberKey_unique',
+            partialFilterExpression={'armyNumberKey': {'$type': 'string'}},
+        )
+        self.collection.create_index('fullNameKey')
+        self.collection.create_index([('created_at', -1), ('_id', -1)])
+        for field in FILTER_FIELDS:
+            self.collection.create_index([(field, 1), ('created_at', -1), ('_id', -1)])
+
+    def backfill_keys(self, batch_size=1000):
+        """Stamp armyNumberKey / fullNameKey on documents created before they existed (legacy keys included).
+
+        A document whose armyNumberKey another document already holds is left without one and logged.
+        """
+        ops, updated = [], 0
+        cursor = self.collection.find(
+            {'$or': [{'armyNumberKey': {'$exists': False}}, {'fullNameKey': {'$exists': False}}]},
+            {'armyNumber': 1, 'Army_Number': 1, 'armynumber': 1, 'armyNumberKey': 1,
+             'fullName': 1, 'Name': 1, 'name': 1, 'fullNameKey': 1},
+        )
+        for doc in cursor:
+            keys = {}
+            if 'armyNumberKey' not in doc:
+                number = doc.get('armyNumber') or doc.get('Army_Number') or doc.get('armynumber')
+                if army_number_key(number):
+                    keys['armyNumberKey'] = army_number_key(number)
+            if 'fullNameKey' not in doc:
+                keys['fullNameKey'] = name_key(doc.get('fullName') or doc.get('Name') or doc.get('name'))
+            if not keys:
+                continue
+            ops.append(UpdateOne({'_id': doc['_id']}, {'$set': keys}))
+            if len(ops) >= batch_size:
+                updated += self._write_keys(ops)
+                ops = []
+        if ops:
+            updated += self._write_keys(ops)
+        return updated
+
+    def _write_keys(self, ops):
+        try:
+            return self.collection.bulk_write(ops, ordered=False).modified_count
+        except BulkWriteError as bwe:
+            details = bwe.details or {}
+            for err in details.get('writeErrors', []):
+                if err.get('code') != 11000:
+                    raise
+                logger.warning("Duplicate army number left without armyNumberKey",
+                               extra={'personnel_id': str(err.get('op', {}).get('q', {}).get('_id'))})
+            return details.get('nModified', 0)
+
+    @untimed
+    def canonical_update(self, doc):
+        """$set/$unset that rewrite a document's payroll fields to the canonical schema.
+
+        Each field takes the value the payroll engine reads today (first spelling present, amounts
+        parsed the same way), so migrated documents produce identical payroll entries.
+        """
+        to_set, to_unset = {SCHEMA_KEY: CANONICAL_SCHEMA}, {}
+        for fields, convert in ((NUMERIC_FIELDS, to_float), (TEXT_FIELDS, lambda v: v)):
+            for _, keys in fields:
+                present = [k for k in keys if k in doc]
+                if present:
+                    to_set[keys[0]] = convert(doc[present[0]])
+                to_unset.update((k, '') for k in present if k != keys[0])
+        if 'fullName' in to_set:
+            to_set['fullNameKey'] = name_key(to_set['fullName'])
+        return to_set, to_unset
+
+    def migrate_schema(self, batch_size=1000, dry_run=False):
+        """Rewrite personnel documents without the current schemaVersion into the canonical schema.
+
+        updated_at is left alone (payroll output does not change, so delta runs keep reusing
+        entries). A document modified between the read and the write is skipped and picked up by
+        the next run. Returns (scanned, migrated).
+        """
+        ops, scanned, migrated = [], 0, 0
+        projection = dict(SOURCE_PROJECTION, updated_at=1)
+        for doc in self.collection.find({SCHEMA_KEY: {'$ne': CANONICAL_SCHEMA}}, projection, batch_size=batch_size):
+            scanned += 1
+            to_set, to_unset = self.canonical_update(doc)
+            update = {'$set': to_set, '$unset': to_unset} if to_unset else {'$set': to_set}
+            ops.append(UpdateOne({'_id': doc['_id'], 'updated_at': doc.get('updated_at')}, update))
+            if len(ops) >= batch_size:
+                migrated += len(ops) if dry_run else self.collection.bulk_write(ops, ordered=False).modified_count
+                ops = []
+        if ops:
+            migrated += len(ops) if dry_run else self.collection.bulk_write(ops, ordered=False).modified_count
+        if migrated and not dry_run:
+            self.bump_version()
+        return scanned, migrated
+
     def _coerce_create(self, data: dict) -> dict:
         """Map inbound payload (possibly with legacy keys) to canonical fields."""
         d = data or {}
@@ -32,7 +161,7 @@ class PersonnelModel:
         status = (d.get('status') or 'Active')
 
         doc = {
-            'armyNumber': (d.get('armyNumber') or '').strip(),
+            'armyNumber': str(d.get('armyNumber') or d.get('Army_Number') or '').strip(),
             'fullName': (full_name or '').strip(),
             'rank': (rank or None) or None,
             'corps': (corps or None) or None,
@@ -45,6 +174,9 @@ class PersonnelModel:
             'status': status,
             'active': (str(status).strip().lower() == 'active'),
         }
+        doc['armyNumberKey'] = army_number_key(doc['armyNumber'])
+        doc['fullNameKey'] = name_key(doc['fullName'])
+        doc[SCHEMA_KEY] = CANONICAL_SCHEMA
         return doc
 
     def _coerce_update(self, data: dict) -> dict:
@@ -57,7 +189,11 @@ class PersonnelModel:
                     out[target] = transform(d.get(k))
                     return
         set_if_present(['armyNumber'], 'armyNumber', lambda v: str(v).strip())
+        if 'armyNumber' in out:
+            out['armyNumberKey'] = army_number_key(out['armyNumber'])
         set_if_present(['fullName', 'Name'], 'fullName', lambda v: str(v).strip())
+        if 'fullName' in out:
+            out['fullNameKey'] = name_key(out['fullName'])
         set_if_present(['rank', 'Rank'], 'rank', lambda v: (str(v).strip() or None))
         set_if_present(['corps', 'Corps'], 'corps', lambda v: (str(v).strip() or None))
         set_if_present(['fmn_unit', 'Fmn/Unit', 'fmnUnit'], 'fmn_unit', lambda v: (str(v).strip() or None))
@@ -78,6 +214,34 @@ class PersonnelModel:
             out['updated_at'] = self._now_iso()
         return out
 
+    def version(self):
+        """Current personnel change version (0 if nothing was ever written through the model)."""
+        doc = self.counters.find_one({'_id': self.VERSION_ID})
+        return doc.get('version', 0) if doc else 0
+
+    def bump_version(self):
+        self.counters.update_one({'_id': self.VERSION_ID}, {'$inc': {'version': 1}}, upsert=True)
+
+    def bump_version_at(self, cluster_time):
+        """bump_version for changes seen on a change stream up to `cluster_time`.
+
+        Every process follows the stream, so the bump only happens for the first one to report a
+        cluster time past the recorded `stream_at`; the others see it as already done.
+        Returns True if this call bumped the version.
+        """
+        result = self.counters.update_one(
+            {'_id': self.VERSION_ID, 'stream_at': {'$not': {'$gte': cluster_time}}},
+            {'$inc': {'version': 1}, '$set': {'stream_at': cluster_time}},
+        )
+        if result.modified_count:
+            return True
+        try:
+            self.counters.insert_one({'_id': self.VERSION_ID, 'version': 1, 'stream_at': cluster_time})
+        except DuplicateKeyError:
+            return False
+        return True
+
+    @untimed
     def to_dict(self, doc):
         """Convert MongoDB document to JSON-safe dict"""
         if not doc:
@@ -87,12 +251,64 @@ class PersonnelModel:
         return doc
 
     def list_all(self):
-        print( "list_all called", self )
         """Return all personnel, newest first"""
         people = list(self.collection.find().sort('created_at', -1))
-        print("people:", people)
+        logger.debug("list_all returned %d personnel", len(people))
         return [self.to_dict(p) for p in people]
 
+    def list_page(self, limit=PAGE_SIZE, cursor=None, fields=None, filters=None, search=None):
+        """Return one page of personnel, newest first, plus the cursor for the next page.
+
+        Keyset pagination on (created_at, _id) so each page is an index range scan regardless of
+        how deep the client pages. `fields` limits the returned columns; `filters` maps names in
+        FILTER_FIELDS to exact values; `search` matches an armyNumber prefix or a name prefix
+        (case-insensitive, through the armyNumberKey and fullNameKey indexes).
+        """
+        spec = self.page_query(limit, cursor, fields, filters, search)
+        docs = list(
+            self.collection.find(spec['query'], spec['projection'])
+            .sort(spec['sort'])
+            .limit(spec['limit'] + 1)
+        )
+        return self.page_result(docs, spec['limit'])
+
+    def page_query(self, limit=PAGE_SIZE, cursor=None, fields=None, filters=None, search=None):
+        """Build the find() arguments for list_page (shared with the async serving path)."""
+        limit = max(1, min(int(limit or PAGE_SIZE), MAX_PAGE_SIZE))
+        clauses = []
+        for field, value in (filters or {}).items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f'Unsupported filter: {field}')
+            clauses.append({field: value})
+        if search:
+            clauses.append({'$or': [
+                {'armyNumberKey': {'$regex': '^' + re.escape(army_number_key(search))}},
+                {'fullNameKey': {'$regex': '^' + re.escape(name_key(search))}},
+            ]})
+        if cursor:
+            clauses.append(after_clause('created_at', cursor))
+        query = {'$and': clauses} if clauses else {}
+
+        projection = None
+        if fields:
+            bad = [f for f in fields if not _FIELD_NAME.match(f)]
+            if bad:
+                raise ValueError(f"Invalid field name(s): {', '.join(bad)}")
+            projection = dict.fromkeys(fields, 1)
+            projection['created_at'] = 1
+
+        return {
+            'query': query,
+            'projection': projection,
+            'sort': [('created_at', -1), ('_id', -1)],
+            'limit': limit,
+        }
+
+    def page_result(self, docs, limit):
+        """Turn up to limit + 1 fetched documents into (page, next_cursor)."""
+        next_cursor = encode_cursor(docs[limit - 1], 'created_at') if len(docs) > limit else None
+        return [self.to_dict(d) for d in docs[:limit]], next_cursor
+
     def get_by_id(self, pid):
         """Find a single personnel by ObjectId"""
         try:
@@ -107,18 +323,89 @@ class PersonnelModel:
         payload = self._coerce_create(data)
         if not payload.get('armyNumber') or not payload.get('fullName'):
             raise ValueError('armyNumber and fullName are required')
-        # Duplicate check by armyNumber
-        exists = self.collection.find_one({'armyNumber': {'$regex': f"^{payload['armyNumber']}$", '$options': 'i'}})
+        # Duplicate check by normalized armyNumber (unique index)
+        exists = self.collection.find_one({'armyNumberKey': payload['armyNumberKey']})
         if exists:
             # For idempotency, just return existing
             return self.to_dict(exists)
         now = self._now_iso()
         payload['created_at'] = now
         payload['updated_at'] = now
-        result = self.collection.insert_one(payload)
+        try:
+            result = self.collection.insert_one(payload)
+        except DuplicateKeyError:
+            # Lost a race with a concurrent create of the same armyNumber
+            return self.to_dict(self.collection.find_one({'armyNumberKey': payload['armyNumberKey']}))
+        self.bump_version()
         payload['_id'] = str(result.inserted_id)
         return payload
 
+    def bulk_create(self, rows, chunk_size=1000):
+        """Insert many personnel rows at once.
+
+        Rows are normalized with _coerce_create in one pass, de-duplicated by armyNumberKey
+        within the batch and against the collection with a single indexed $in lookup,
+        then written with unordered insert_many in chunks. Returns counts plus per-row
+        duplicates/errors (row = index in `rows`).
+        """
+        errors, duplicates, pending = [], [], []
+        seen = set()
+        for i, row in enumerate(rows):
+            if not isinstance(row, dict):
+                errors.append({'row': i, 'error': 'row must be an object'})
+                continue
+            payload = self._coerce_create(row)
+            if not payload.get('armyNumber') or not payload.get('fullName'):
+                errors.append({'row': i, 'error': 'armyNumber and fullName are required'})
+                continue
+            key = payload['armyNumberKey']
+            if key in seen:
+                duplicates.append({'row': i, 'armyNumber': payload['armyNumber'], 'reason': 'duplicate in batch'})
+                continue
+            seen.add(key)
+            pending.append((i, payload))
+
+        if pending:
+            keys = [p['armyNumberKey'] for _, p in pending]
+            existing = {
+                doc['armyNumberKey']
+                for doc in self.collection.find({'armyNumberKey': {'$in': keys}}, {'armyNumberKey': 1})
+            }
+            fresh = []
+            for i, payload in pending:
+                if payload['armyNumberKey'] in existing:
+                    duplicates.append({'row': i, 'armyNumber': payload['armyNumber'], 'reason': 'already exists'})
+                else:
+                    fresh.append((i, payload))
+            pending = fresh
+
+        inserted = 0
+        now = self._now_iso()
+        for start in range(0, len(pending), chunk_size):
+            chunk = pending[start:start + chunk_size]
+            docs = [dict(p, created_at=now, updated_at=now) for _, p in chunk]
+            try:
+                result = self.collection.insert_many(docs, ordered=False)
+                inserted += len(result.inserted_ids)
+            except BulkWriteError as bwe:
+                details = bwe.details or {}
+                inserted += details.get('nInserted', 0)
+                for err in details.get('writeErrors', []):
+                    i, payload = chunk[err['index']]
+                    if err.get('code') == 11000:
+                        duplicates.append({'row': i, 'armyNumber': payload['armyNumber'], 'reason': 'already exists'})
+                    else:
+                        errors.append({'row': i, 'error': err.get('errmsg', 'write failed')})
+
+        if inserted:
+            self.bump_version()
+        return {
+            'received': len(rows),
+            'inserted': inserted,
+            'duplicates': duplicates,
+            'errors': errors,
+        }
+
     def update(self, pid, data):
         """Update existing personnel with provided fields only (canonicalized)."""
         try:
@@ -129,7 +416,12 @@ class PersonnelModel:
         if not update_fields:
             # nothing to update, return current
             return self.get_by_id(pid)
-        self.collection.update_one({'_id': oid}, {'$set': update_fields})
+        try:
+            result = self.collection.update_one({'_id': oid}, {'$set': update_fields})
+        except DuplicateKeyError:
+            raise ValueError('armyNumber already exists')
+        if result.modified_count:
+            self.bump_version()
         return self.get_by_id(pid)
 
     def delete(self, pid):
@@ -139,4 +431,6 @@ class PersonnelModel:
         except Exception:
             return False
         result = self.collection.delete_one({'_id': oid})
+        if result.deleted_count:
+            self.bump_version()
         return result.deleted_count > 0
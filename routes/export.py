@@ -0,0 +1,120 @@
+import csv
+import io
+import tempfile
+
+from flask import Response, stream_with_context
+
+# format -> (mimetype, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+TEXT_COLUMNS = ("armynumber", "name", "rank", "corps", "fmnunit", "region", "status", "bankName", "accountNumber")
+FILE_BLOCK_SIZE = 64 * 1024
+# Spreadsheet apps run text cells starting with these as formulas (CSV/formula injection)
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+class ExportUnavailable(Exception):
+    """The optional package a format needs is not installed."""
+
+
+def _text(v):
+    return v if v is None or isinstance(v, str) else str(v)
+
+
+def _cell(v):
+    """A text cell as spreadsheets should show it: a leading formula character is quoted with '."""
+    return "'" + v if isinstance(v, str) and v.startswith(FORMULA_PREFIXES) else v
+
+
+def _row_values(columns):
+    """Row dict -> list of cell values, text columns escaped (amounts stay numbers, negatives too)."""
+    getters = [(c, c in TEXT_COLUMNS) for c in columns]
+    return lambda row: [_cell(row.get(c)) if text else row.get(c) for c, text in getters]
+
+
+def csv_rows(chunks, columns):
+    """CSV text, one chunk of rows at a time (nothing but the current chunk is held)."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    values = _row_values(columns)
+    for chunk in chunks:
+        writer.writerows([values(row) for row in chunk])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _stream_file(f):
+    f.seek(0)
+    while True:
+        block = f.read(FILE_BLOCK_SIZE)
+        if not block:
+            return
+        yield block
+
+
+def xlsx_rows(chunks, columns):
+    """XLSX via openpyxl's write-only mode; the zip is spooled to a temp file, then streamed."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportUnavailable("xlsx export needs the openpyxl package")
+
+    def generate():
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("payroll")
+        ws.append(list(columns))
+        values = _row_values(columns)
+        for chunk in chunks:
+            for row in chunk:
+                ws.append(values(row))
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as f:
+            wb.save(f)
+            yield from _stream_file(f)
+    return generate()
+
+
+def parquet_rows(chunks, columns):
+    """Parquet via pyarrow, one row group per chunk, spooled to a temp file, then streamed."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportUnavailable("parquet export needs the pyarrow package")
+
+    schema = pa.schema([(c, pa.string() if c in TEXT_COLUMNS else pa.float64()) for c in columns])
+
+    def generate():
+        with tempfile.TemporaryFile() as f:
+            with pq.ParquetWriter(f, schema) as writer:
+                for chunk in chunks:
+                    data = {c: [row.get(c) for row in chunk] for c in columns}
+                    for c in columns:
+                        if c in TEXT_COLUMNS:
+                            data[c] = [_text(v) for v in data[c]]
+                    writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            yield from _stream_file(f)
+    return generate()
+
+
+WRITERS = {"csv": csv_rows, "xlsx": xlsx_rows, "parquet": parquet_rows}
+
+
+def export_response(fmt, chunks, columns, filename):
+    """Streamed attachment of `chunks` (lists of row dicts) in the given format.
+
+    Raises ExportUnavailable before anything is sent if the format's package is missing.
+    """
+    mimetype, ext = EXPORT_FORMATS[fmt]
+    body = WRITERS[fmt](chunks, columns)
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{ext}"'},
+    )
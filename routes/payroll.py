@@ -1,12 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from bson import ObjectId
-from datetime import datetime
-from app import mongo
-from models.payroll import PayrollModel
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timezone
+from app import mongo, payroll_cache, payroll_jobs, payroll_watcher, payroll_workers
+from app.changes import TooManySubscribers
+from models.payroll import EXPORT_FIELDS, HISTORY_PAGE_SIZE, PayrollModel
+from models.personnel import PersonnelModel
+from models.payroll_engine import StreamingTotals
+from models.payroll_aggregate import GROUP_FIELDS
+from routes.export import EXPORT_FORMATS, ExportUnavailable, export_response
+from routes.streaming import ndjson_response, sse_response, wants_ndjson
 
 payroll_bp = Blueprint("payroll", __name__, url_prefix="/api/payroll")
 payroll_model = PayrollModel(mongo.db)
+personnel_model = PersonnelModel(mongo.db)
 
 # -------------------------------------------------------------
 # 1️⃣ Payroll Preview
@@ -18,15 +26,41 @@ def preview_payroll():
     if not period:
         return jsonify({"error": "Missing period parameter"}), 400
 
-    personnel = list(mongo.db.personnel.find({"active": True}))
-    if not personnel:
-        return jsonify({"entries": [], "totals": {}}), 200
+    # Read the version before the roster so a concurrent write can only make the cache fresher
+    cache_key = preview_cache_key(personnel_model.version())
+    if wants_ndjson():
+        return ndjson_response(_stream_preview(payroll_cache.get(cache_key)))
 
-    entries, totals = payroll_model.compute_preview(personnel)
+    entries, totals = payroll_cache.get_or_compute(cache_key, _compute_preview)
 
     return jsonify({"entries": entries, "totals": totals}), 200
 
 
+def preview_cache_key(version):
+    return f"preview:{version}"
+
+
+def _compute_preview():
+    return payroll_workers.preview_records(payroll_model)
+
+
+def _stream_preview(cached=None):
+    """One entry per line, then a trailing {"totals": ...} record.
+
+    Without a cached preview the roster is read batch by batch and only running totals are kept,
+    so memory stays flat however many personnel are streamed.
+    """
+    if cached is not None:
+        entries, totals = cached
+        yield from entries
+        yield {"totals": totals}
+        return
+    totals = StreamingTotals()
+    cursor = payroll_model.active_roster(batch_size=1000)
+    yield from payroll_model.iter_preview(cursor, totals)
+    yield {"totals": totals.as_dict() if totals.count else {}}
+
+
 # -------------------------------------------------------------
 # 2️⃣ Approve Payroll
 # -------------------------------------------------------------
@@ -36,27 +70,85 @@ def approve_payroll():
     data = request.get_json() or {}
     period = data.get("period")
     overwrite = data.get("overwrite", False)
+    mode = data.get("mode", "full")
 
     if not period:
         return jsonify({"error": "Missing period"}), 400
+    if mode not in ("full", "delta"):
+        return jsonify({"error": "mode must be 'full' or 'delta'"}), 400
+    if mode == "delta" and data.get("async"):
+        return jsonify({"error": "Delta runs are not queued as jobs; omit async"}), 400
+
+    active_job = payroll_jobs.jobs.active_for(period)
+    if active_job:
+        return jsonify({"error": "An approval job is already running for this period",
+                        "job": payroll_jobs.jobs.to_dict(active_job)}), 409
 
     existing = payroll_model.get_by_period(period)
     if existing and not overwrite:
         return jsonify({"error": "Payroll already exists"}), 409
 
-    personnel = list(mongo.db.personnel.find({"active": True}))
-    if not personnel:
+    if data.get("async"):
+        # Large rosters: compute and write in the job pool, poll GET /jobs/<id> for progress
+        job, created = payroll_jobs.jobs.create(period, overwrite, get_jwt_identity())
+        if not created:
+            return jsonify({"error": "An approval job is already running for this period",
+                            "job": payroll_jobs.jobs.to_dict(job)}), 409
+        payroll_jobs.submit(job["_id"])
+        job_id = str(job["_id"])
+        return jsonify({
+            "message": f"Payroll approval for {period} queued.",
+            "jobId": job_id,
+            "statusUrl": f"{payroll_bp.url_prefix}/jobs/{job_id}",
+        }), 202
+
+    # Taken before the roster is read; a later delta run trusts entries of people unchanged since
+    snapshot_at = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    delta = None
+    if mode == "delta":
+        # Start from the previous period's run and recompute only personnel changed since
+        base_period = data.get("basePeriod")
+        base = payroll_model.get_by_period(base_period) if base_period else payroll_model.latest_run_before(period)
+        if base_period and not base:
+            return jsonify({"error": f"No payroll run for base period {base_period}"}), 404
+        if base:
+            entries, totals, delta = payroll_model.compute_delta(base)
+        else:
+            mode = "full"
+    if mode == "full":
+        entries, totals = payroll_workers.compute_run(payroll_model)
+    if not entries:
         return jsonify({"error": "No active personnel found"}), 400
 
-    entries, totals = payroll_model.compute_preview(personnel)
     user = get_jwt_identity()
 
-    if existing and overwrite:
-        payroll_model.collection.delete_one({"_id": existing["_id"]})
+    if overwrite:
+        _, written = payroll_model.overwrite_run(period, entries, totals, approved_by=user, snapshot_at=snapshot_at)
+        if not written:
+            return jsonify({"message": f"Payroll for {period} is unchanged.", "unchanged": True}), 200
+    else:
+        try:
+            payroll_model.create_run(period, entries, totals, approved_by=user, snapshot_at=snapshot_at)
+        except DuplicateKeyError:
+            # A concurrent approval for the same period won the race
+            return jsonify({"error": "Payroll already exists"}), 409
 
-    payroll_model.create_run(period, entries, totals, approved_by=user)
+    body = {"message": f"Payroll for {period} approved successfully."}
+    if delta is not None:
+        body["delta"] = delta
+    return jsonify(body), 200
 
-    return jsonify({"message": f"Payroll for {period} approved successfully."}), 200
+
+# -------------------------------------------------------------
+# Approval job status
+# -------------------------------------------------------------
+@payroll_bp.route("/jobs/<job_id>", methods=["GET"])
+@jwt_required()
+def get_payroll_job(job_id):
+    job = payroll_jobs.jobs.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(payroll_jobs.jobs.to_dict(job)), 200
 
 
 # -------------------------------------------------------------
@@ -101,20 +193,118 @@ def get_payroll_run():
     period = request.args.get("period")
     if not period:
         return jsonify({"error": "Missing period parameter"}), 400
+    if wants_ndjson():
+        return ndjson_response(_stream_run(period))
+    run = payroll_model.get_by_period(period)
+    return jsonify(run_payload(period, run, payroll_model.get_entries(period, run["rev"]) if run else [])), 200
+
+
+@payroll_bp.route("/run/export", methods=["GET"])
+@jwt_required()
+def export_payroll_run():
+    period = request.args.get("period")
+    fmt = (request.args.get("format") or "csv").lower()
+    if not period:
+        return jsonify({"error": "Missing period parameter"}), 400
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
     run = payroll_model.get_by_period(period)
     if not run:
-        return jsonify({"period": period, "entries": [], "totals": {}}), 200
-    # Convert _id to string for JSON
-    run["_id"] = str(run.get("_id"))
-    return jsonify({
+        return jsonify({"error": f"No payroll run for {period}"}), 404
+    chunks = payroll_model.iter_export_chunks(period, run["rev"])
+    try:
+        return export_response(fmt, chunks, EXPORT_FIELDS, f"payroll-{period}")
+    except ExportUnavailable as e:
+        return jsonify({"error": str(e)}), 501
+
+
+def run_payload(period, run, entries):
+    """Response body of GET /run for a run header and its entries."""
+    if not run:
+        return {"period": period, "entries": [], "totals": {}}
+    return {
         "period": run.get("period"),
-        "entries": run.get("entries", []),
+        "entries": entries,
         "totals": run.get("totals", {}),
         "approved_at": run.get("approved_at"),
         "approved_by": run.get("approved_by"),
         "updated_at": run.get("updated_at"),
-        "id": run.get("_id"),
-    }), 200
+        "id": str(run.get("_id")),
+    }
+
+
+def _stream_run(period):
+    """One entry per line, then a trailing record with the run header and totals."""
+    run = payroll_model.get_by_period(period)
+    if not run:
+        yield {"period": period, "totals": {}}
+        return
+    yield from payroll_model.iter_run_entries(period, run["rev"])
+    yield {
+        "period": run.get("period"),
+        "totals": run.get("totals", {}),
+        "approved_at": run.get("approved_at"),
+        "approved_by": run.get("approved_by"),
+        "updated_at": run.get("updated_at"),
+        "id": str(run.get("_id")),
+    }
+
+
+# -------------------------------------------------------------
+# Payroll Summary (totals + breakdowns aggregated in MongoDB)
+# -------------------------------------------------------------
+@payroll_bp.route("/summary", methods=["GET"])
+@jwt_required()
+def payroll_summary():
+    period = request.args.get("period")
+    if not period:
+        return jsonify({"error": "Missing period parameter"}), 400
+    group_by = [g.strip() for g in (request.args.get("groupBy") or "").split(",") if g.strip()]
+    unknown = [g for g in group_by if g not in GROUP_FIELDS]
+    if unknown:
+        return jsonify({"error": f"Unknown groupBy field(s): {', '.join(unknown)}",
+                        "allowed": list(GROUP_FIELDS)}), 400
+    group_by = list(dict.fromkeys(group_by))
+
+    # An approved run is summarized from its stored entries, otherwise the live roster (as preview)
+    run = payroll_model.get_by_period(period)
+    if run:
+        summary = payroll_model.summarize_run(period, group_by, run["rev"])
+        source = "run"
+    else:
+        cache_key = f"summary:{personnel_model.version()}:{','.join(group_by)}"
+        summary = payroll_cache.get_or_compute(cache_key, lambda: payroll_model.summarize_personnel(group_by))
+        source = "personnel"
+
+    return jsonify({"period": period, "source": source, **summary}), 200
+
+
+# -------------------------------------------------------------
+# Preview cache counters
+# -------------------------------------------------------------
+@payroll_bp.route("/cache/stats", methods=["GET"])
+@jwt_required()
+def payroll_cache_stats():
+    return jsonify(payroll_cache.stats()), 200
+
+
+# -------------------------------------------------------------
+# Live updates (Server-Sent Events)
+#   ?period=YYYY-MM limits run events to one period; personnel events always come through
+#   event: personnel  roster changed, previews/summaries recomputed on next request
+#   event: run        run header inserted/replaced/deleted, or updated fields (totals, entry_count)
+#   event: resync     events were dropped; refetch what the dashboard shows
+# -------------------------------------------------------------
+@payroll_bp.route("/events", methods=["GET"])
+@jwt_required()
+def payroll_events():
+    if not payroll_watcher.available:
+        return jsonify({"error": "Live updates are not available (PAYROLL_WATCH needs a replica set)"}), 503
+    try:
+        subscription = payroll_watcher.broker.subscribe(request.args.get("period") or None)
+    except TooManySubscribers as busy:
+        return jsonify({"error": str(busy)}), 503, {"Retry-After": str(busy.retry_after)}
+    return sse_response(subscription, current_app.config["PAYROLL_EVENTS_HEARTBEAT"])
 
 
 # -------------------------------------------------------------
@@ -123,5 +313,33 @@ def get_payroll_run():
 @payroll_bp.route("/history", methods=["GET"])
 @jwt_required()
 def list_payroll_history():
-    runs = payroll_model.list_history(limit=50)
-    return jsonify({"runs": runs}), 200
+    try:
+        runs, next_cursor = payroll_model.list_history(**history_args(request.args))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return jsonify({"runs": runs, "nextCursor": next_cursor}), 200
+
+
+def history_args(args):
+    """list_history keyword arguments from ?limit=&cursor=&from=&to= (dates or ISO datetimes)."""
+    return {
+        "limit": args.get("limit", type=int) or HISTORY_PAGE_SIZE,
+        "cursor": args.get("cursor"),
+        "date_from": args.get("from"),
+        "date_to": args.get("to"),
+    }
+
+
+# -------------------------------------------------------------
+# Period-over-period comparison (run headers only)
+# -------------------------------------------------------------
+@payroll_bp.route("/compare", methods=["GET"])
+@jwt_required()
+def compare_payroll_runs():
+    period = request.args.get("period")
+    if not period:
+        return jsonify({"error": "Missing period parameter"}), 400
+    result = payroll_model.compare_runs(period, request.args.get("against"))
+    if result is None:
+        return jsonify({"error": "Both periods need an approved payroll run"}), 404
+    return jsonify(result), 200
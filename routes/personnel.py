@@ -1,19 +1,41 @@
-from flask import Blueprint, request, jsonify
+import csv
+import io
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required
 from app import mongo
-from models.personnel import PersonnelModel
+from models.personnel import FILTER_FIELDS, PAGE_SIZE, PersonnelModel
 
 personnel_bp = Blueprint("personnel", __name__)
 personnel_model = PersonnelModel(mongo.db)
 
 # -------------------------------------------------------------
-#  List all personnel
+#  List personnel (paginated, newest first)
+#  ?limit=50&cursor=...&fields=armyNumber,fullName&rank=...&corps=...
+#  &fmn_unit=...&region=...&active=true&q=<name or army number>
 # -------------------------------------------------------------
 @personnel_bp.route("/", methods=["GET"])
 # @jwt_required()
 def list_personnel():
-    people = personnel_model.list_all()
-    return jsonify({"personnel": people}), 200
+    try:
+        people, next_cursor = personnel_model.list_page(**page_args(request.args))
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    return jsonify({"personnel": people, "nextCursor": next_cursor}), 200
+
+
+def page_args(args):
+    """list_page keyword arguments from the query string."""
+    filters = {f: args.get(f) for f in FILTER_FIELDS if args.get(f) not in (None, "")}
+    if "active" in filters:
+        filters["active"] = filters["active"].strip().lower() in ("1", "true", "yes")
+    fields = [f.strip() for f in (args.get("fields") or "").split(",") if f.strip()]
+    return {
+        "limit": args.get("limit", type=int) or PAGE_SIZE,
+        "cursor": args.get("cursor"),
+        "fields": fields or None,
+        "filters": filters,
+        "search": args.get("q"),
+    }
 
 
 # -------------------------------------------------------------
@@ -47,6 +69,44 @@ def add_personnel():
     return jsonify({"message": "Personnel added successfully", "personnel": new_doc}), 201
 
 
+# -------------------------------------------------------------
+#  Bulk import personnel (JSON array or CSV)
+# -------------------------------------------------------------
+@personnel_bp.route("/bulk", methods=["POST"])
+# @jwt_required()
+def bulk_add_personnel():
+    try:
+        rows = _read_bulk_rows()
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    try:
+        chunk_size = int(request.args.get("chunkSize") or current_app.config["PERSONNEL_BULK_CHUNK_SIZE"])
+    except ValueError:
+        return jsonify({"error": "chunkSize must be an integer"}), 400
+    if chunk_size < 1:
+        return jsonify({"error": "chunkSize must be positive"}), 400
+    try:
+        result = personnel_model.bulk_create(rows, chunk_size=chunk_size)
+    except Exception as e:
+        return jsonify({"error": f"Failed to import personnel: {str(e)}"}), 500
+    return jsonify(result), 201 if result["inserted"] else 200
+
+
+def _read_bulk_rows():
+    """Rows from a CSV upload/body (legacy column names are fine) or a JSON array."""
+    upload = request.files.get("file")
+    if upload is not None or request.mimetype in ("text/csv", "application/csv"):
+        raw = upload.read() if upload is not None else request.get_data()
+        text = raw.decode("utf-8-sig")
+        return [{k.strip(): v for k, v in row.items() if k} for row in csv.DictReader(io.StringIO(text))]
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get("personnel")
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of personnel or a CSV file")
+    return data
+
+
 # -------------------------------------------------------------
 #  Update personnel
 # -------------------------------------------------------------
@@ -54,7 +114,10 @@ def add_personnel():
 # @jwt_required()
 def update_personnel(pid):
     data = request.get_json() or {}
-    updated = personnel_model.update(pid, data)
+    try:
+        updated = personnel_model.update(pid, data)
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 409
     if not updated:
         return jsonify({"error": "Personnel not found or invalid ID"}), 404
     return jsonify({"message": "Personnel updated successfully", "personnel": updated}), 200
@@ -0,0 +1,57 @@
+import queue
+
+from flask import Response, current_app, request, stream_with_context
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+SSE_MIMETYPE = "text/event-stream"
+
+
+def wants_ndjson():
+    """True when the client asked for ?stream=ndjson"""
+    return (request.args.get("stream") or "").lower() == "ndjson"
+
+
+def ndjson_response(records, lines_per_chunk=500):
+    """Stream an iterable of JSON-able records as newline-delimited JSON.
+
+    Records are produced lazily, so the generator behind `records` runs while the response is
+    being sent (inside the request context).
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        buf = []
+        for rec in records:
+            buf.append(dumps(rec))
+            if len(buf) >= lines_per_chunk:
+                yield "\n".join(buf) + "\n"
+                buf = []
+        if buf:
+            yield "\n".join(buf) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+
+def sse_response(subscription, heartbeat=15):
+    """Stream events from an app.changes.Subscription as text/event-stream until the client leaves.
+
+    Each event is sent as `event: <type>` with the JSON event as data; a comment line every
+    `heartbeat` seconds keeps proxies from closing an idle stream and notices closed clients.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = subscription.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {dumps(event)}\n\n"
+        finally:
+            subscription.close()
+
+    return Response(generate(), mimetype=SSE_MIMETYPE,
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,111 @@
+"""Shared fixtures: the Flask app bound to an in-process mongomock database or to a real mongod.
+
+mongomock covers the model and route logic. Tests that depend on server behaviour (query plans,
+aggregation expressions, change streams, several processes on one database) use `mongo_db` or
+`replset_db` instead; those are skipped unless PAYROLL_TEST_MONGO_URI / PAYROLL_TEST_REPLSET_URI
+name a scratch server, or a `mongod` binary is on PATH (started in a temp dir for the session).
+"""
+import itertools
+import os
+import shutil
+
+import pytest
+
+TEST_ENV = {
+    # Never contacted: every test binds its own database below
+    "MONGO_URI": "mongodb://127.0.0.1:27017/payroll_test",
+    "MONGO_STARTUP_CHECK": "off",
+    "JWT_SECRET": "payroll-test-secret-not-for-production-use",
+    "PAYROLL_JOB_WORKERS": "0",
+    "PASSWORD_HASH_WORKERS": "0",
+    "BCRYPT_LOG_ROUNDS": "4",
+    "LOG_LEVEL": "WARNING",
+}
+_db_names = itertools.count()
+
+
+def bind(app, client, name):
+    """Point mongo.db and every model of the app at client[name] and drop cached results."""
+    from app import mongo, payroll_cache, user_cache
+    mongo.cx = client
+    mongo.db = client[name]
+    for model in app.extensions["mongo_models"]:
+        model.bind(mongo.db)
+    payroll_cache.clear()
+    user_cache.clear()
+    return mongo.db
+
+
+@pytest.fixture(scope="session")
+def app():
+    os.environ.update(TEST_ENV)
+    from app import create_app
+    return create_app()
+
+
+@pytest.fixture
+def db(app):
+    mongomock = pytest.importorskip("mongomock")
+    return bind(app, mongomock.MongoClient(), "payroll_test")
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth_headers(app):
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        token = create_access_token(identity="tester")
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _server(env_var, replica_set=None):
+    uri = os.getenv(env_var)
+    if uri:
+        yield uri
+        return
+    if shutil.which("mongod") is None:
+        pytest.skip(f"needs mongod on PATH or {env_var}")
+    from benchmarks.suite import MongodProcess
+    server = MongodProcess(replica_set=replica_set)
+    server.start()
+    try:
+        yield server.uri
+    finally:
+        server.stop()
+
+
+@pytest.fixture(scope="session")
+def mongod_uri():
+    yield from _server("PAYROLL_TEST_MONGO_URI")
+
+
+@pytest.fixture(scope="session")
+def replset_uri():
+    yield from _server("PAYROLL_TEST_REPLSET_URI", replica_set="rs0")
+
+
+def _real_db(app, uri):
+    from pymongo import MongoClient
+    client = MongoClient(uri, **app.config["MONGO_CLIENT_OPTIONS"])
+    name = f"payroll_test_{os.getpid()}_{next(_db_names)}"
+    return client, bind(app, client, name)
+
+
+@pytest.fixture
+def mongo_db(app, mongod_uri):
+    client, db = _real_db(app, mongod_uri)
+    yield db
+    client.drop_database(db.name)
+    client.close()
+
+
+@pytest.fixture
+def replset_db(app, replset_uri):
+    client, db = _real_db(app, replset_uri)
+    yield db
+    client.drop_database(db.name)
+    client.close()
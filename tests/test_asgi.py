@@ -0,0 +1,93 @@
+"""Native ASGI handlers go through the same Flask request hooks as the WSGI routes."""
+import asyncio
+import json
+import threading
+
+from app.asgi import AsyncPayrollApp
+from app.metrics import http_in_flight, http_request_seconds
+
+ORIGIN = "http://localhost:5173"
+
+
+def call(app, path, query=b"", headers=None, asgi=None):
+    scope = {
+        "type": "http", "method": "GET", "path": path, "root_path": "", "query_string": query,
+        "http_version": "1.1", "scheme": "http", "server": ("testserver", 80), "client": ("127.0.0.1", 5000),
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run((asgi or AsyncPayrollApp(app))(scope, receive, send))
+    start, body = messages[0], messages[-1]
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body["body"]
+
+
+def requests_seen(endpoint, status):
+    state = http_request_seconds._values.get((endpoint, "GET", status))
+    return state[1] if state else 0
+
+
+def test_native_handler_runs_request_hooks(app, auth_headers):
+    before = requests_seen("payroll.preview_payroll", 400)
+    status, headers, body = call(app, "/api/payroll/preview", headers={**auth_headers, "Origin": ORIGIN})
+
+    assert status == 400
+    assert b"Missing period parameter" in body
+    assert headers["content-type"] == "application/json"
+    assert headers["access-control-allow-origin"] == ORIGIN
+    assert requests_seen("payroll.preview_payroll", 400) == before + 1
+    assert http_in_flight._values.get(("payroll.preview_payroll",), 0) == 0
+
+
+def test_native_handler_errors_and_unknown_origins(app):
+    before = requests_seen("personnel.get_personnel", 404)
+    status, headers, body = call(app, "/api/personnel/not-an-id", headers={"Origin": "http://evil.example"})
+
+    assert status == 404
+    assert b"Personnel not found" in body
+    assert "access-control-allow-origin" not in headers
+    assert requests_seen("personnel.get_personnel", 404) == before + 1
+
+
+def test_native_preview_uses_the_worker_pool_off_the_loop(app, mongo_db, mongod_uri, auth_headers, monkeypatch):
+    from pymongo import AsyncMongoClient
+
+    from app import payroll_cache, payroll_workers
+    from benchmarks.roster import make_roster
+    from models.payroll import PayrollModel
+    from models.payroll_parallel import MongoRoster
+
+    mongo_db.personnel.insert_many(make_roster(200, db_fields=True))
+    monkeypatch.setattr(payroll_workers, "workers", 2)
+    monkeypatch.setattr(payroll_workers, "min_roster", 1)
+    monkeypatch.setattr(payroll_workers, "source", MongoRoster(mongod_uri, mongo_db.name))
+    threads = []
+
+    def recorded(name, fn):
+        """fn, noting whether each call ran on the event loop (main) thread."""
+        def wrapped(*args):
+            threads.append((name, threading.current_thread() is threading.main_thread()))
+            return fn(*args)
+        return wrapped
+
+    monkeypatch.setattr(payroll_workers, "preview_records", recorded("compute", payroll_workers.preview_records))
+    monkeypatch.setattr(payroll_cache, "get", recorded("get", payroll_cache.get))
+    monkeypatch.setattr(payroll_cache, "set", recorded("set", payroll_cache.set))
+    asgi = AsyncPayrollApp(app)
+    asgi._db = AsyncMongoClient(mongod_uri)[mongo_db.name]
+    try:
+        status, _, body = call(app, "/api/payroll/preview", b"period=2099-01", auth_headers, asgi=asgi)
+    finally:
+        payroll_workers.shutdown()
+
+    assert status == 200
+    assert threads == [("get", False), ("compute", False), ("set", False)]
+    model = PayrollModel(mongo_db)
+    entries, totals = model.preview_records(list(model.active_roster()))
+    assert json.loads(body) == json.loads(app.json.dumps({"entries": entries, "totals": totals}))
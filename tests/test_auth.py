@@ -0,0 +1,60 @@
+"""Profile lookups through the user cache (TTL-only, see load_user)."""
+import time
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import user_cache
+
+
+@pytest.fixture
+def officer(app, db):
+    uid = db.users.insert_one({"fullName": "Ada Obi", "email": "ada@example.com", "username": "ada",
+                               "password": "x", "role": "Finance Officer"}).inserted_id
+    with app.app_context():
+        token = create_access_token(identity=str(uid))
+    return uid, {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def user_reads(db, monkeypatch):
+    """Count users.find_one calls."""
+    reads = []
+    find_one = db.users.find_one
+    monkeypatch.setattr(db.users, "find_one", lambda *a, **k: reads.append(a) or find_one(*a, **k))
+    return reads
+
+
+def role(client, headers):
+    resp = client.get("/api/auth/profile", headers=headers)
+    assert resp.status_code == 200
+    return resp.get_json()["user"]["role"]
+
+
+def test_cached_user_is_served_until_it_expires(client, db, officer, user_reads, monkeypatch):
+    uid, headers = officer
+    monkeypatch.setattr(user_cache.backend, "ttl", 0.2)
+    hits = user_cache.hits
+
+    assert role(client, headers) == "Finance Officer"
+    assert len(user_reads) == 1
+    db.users.update_one({"_id": uid}, {"$set": {"role": "Auditor"}})
+    # A hit does not read users, and an out-of-band change is not seen until the entry expires
+    assert role(client, headers) == "Finance Officer"
+    assert len(user_reads) == 1 and user_cache.hits == hits + 1
+
+    time.sleep(0.25)
+    assert role(client, headers) == "Auditor"
+    assert len(user_reads) == 2
+
+
+def test_login_warms_the_cache(client, db, officer, user_reads):
+    from app import password_hasher
+    uid, headers = officer
+    db.users.update_one({"_id": uid}, {"$set": {"password": password_hasher.hash("secret")}})
+
+    resp = client.post("/api/auth/login", json={"email": "ada@example.com", "password": "secret"})
+    assert resp.status_code == 200
+    reads = len(user_reads)
+    assert role(client, headers) == "Finance Officer"
+    assert len(user_reads) == reads
@@ -0,0 +1,74 @@
+"""The preview cache: hits, misses, and invalidation through the personnel change version."""
+import pytest
+from bson import Timestamp
+
+from app import payroll_cache
+from benchmarks.roster import make_roster
+from models.personnel import PersonnelModel
+
+
+@pytest.fixture
+def computes(monkeypatch):
+    """Counts preview computations behind the cache."""
+    from routes import payroll as payroll_routes  # needs the app's mongo.db at import
+    calls = []
+    compute = payroll_routes._compute_preview
+
+    def counting():
+        calls.append(1)
+        return compute()
+
+    monkeypatch.setattr(payroll_routes, "_compute_preview", counting)
+    return calls
+
+
+def preview(client, auth_headers):
+    resp = client.get("/api/payroll/preview?period=2099-01", headers=auth_headers)
+    assert resp.status_code == 200
+    return resp.get_json()
+
+
+def test_repeated_preview_is_a_hit(db, client, auth_headers, computes):
+    db.personnel.insert_many(make_roster(5, db_fields=True))
+    before = payroll_cache.stats()
+    first = preview(client, auth_headers)
+    second = preview(client, auth_headers)
+
+    after = payroll_cache.stats()
+    assert len(computes) == 1 and first == second
+    assert after["misses"] == before["misses"] + 1
+    assert after["hits"] == before["hits"] + 1
+
+
+def test_personnel_write_invalidates(db, client, auth_headers, computes):
+    db.personnel.insert_many(make_roster(5, db_fields=True))
+    model = PersonnelModel(db)
+    first = preview(client, auth_headers)
+    version = model.version()
+
+    resp = client.post("/api/personnel", json={"armyNumber": "NA/NEW", "fullName": "New Hire",
+                                                "basicSalary": 1000, "allowance": 0, "deductions": 0})
+    assert resp.status_code == 201
+    assert model.version() == version + 1
+
+    second = preview(client, auth_headers)
+    assert len(computes) == 2
+    assert len(second["entries"]) == len(first["entries"]) + 1
+    assert second["totals"]["gross"] == first["totals"]["gross"] + 1000
+
+
+def test_change_stream_bump_invalidates(mongo_db, client, auth_headers, computes):
+    # mongomock cannot compare the bson Timestamps the change stream reports
+    mongo_db.personnel.insert_many(make_roster(5, db_fields=True))
+    model = PersonnelModel(mongo_db)
+    preview(client, auth_headers)
+    # A write that bypassed the model, seen only on the change stream
+    mongo_db.personnel.update_many({}, {"$set": {"allowance": 0.0}})
+    assert len(computes) == 1 and preview(client, auth_headers)["totals"]["allowances"] != 0
+
+    seen_at = Timestamp(1_900_000_000, 1)
+    assert model.bump_version_at(seen_at) is True
+    # Another process reporting the same stream position does not bump again
+    assert model.bump_version_at(seen_at) is False
+    assert preview(client, auth_headers)["totals"]["allowances"] == 0
+    assert len(computes) == 2
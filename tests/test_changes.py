@@ -0,0 +1,118 @@
+"""Change watcher restarts and the /api/payroll/events stream limits."""
+import time
+
+import pytest
+from pymongo.errors import AutoReconnect, OperationFailure
+
+from app import changes
+from app.changes import ChangeWatcher, EventBroker, TooManySubscribers
+from models.personnel import PersonnelModel
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_broker_caps_subscribers():
+    broker = EventBroker(max_subscribers=1, retry_after=7)
+    first = broker.subscribe()
+    with pytest.raises(TooManySubscribers) as busy:
+        broker.subscribe()
+    assert busy.value.retry_after == 7
+
+    first.close()
+    broker.subscribe().close()
+
+
+def test_events_route_returns_503_past_the_cap(client, auth_headers, monkeypatch):
+    from app import payroll_watcher
+    monkeypatch.setattr(ChangeWatcher, "available", property(lambda self: True))
+    monkeypatch.setattr(payroll_watcher, "broker", EventBroker(max_subscribers=1, retry_after=7))
+    held = payroll_watcher.broker.subscribe()
+
+    resp = client.get("/api/payroll/events", headers=auth_headers)
+    held.close()
+    assert resp.status_code == 503
+    assert resp.headers["Retry-After"] == "7"
+
+
+def test_watcher_keeps_restarting(db, monkeypatch):
+    monkeypatch.setattr(changes, "BACKOFF", 0.01)
+    monkeypatch.setattr(changes, "MAX_BACKOFF", 0.05)
+    watcher = ChangeWatcher()
+    watcher.enabled, watcher.personnel = True, PersonnelModel(db)
+    watcher.resume_token = {"_data": "stale"}
+    sub = watcher.broker.subscribe()
+    outcomes = iter([
+        ValueError("bug while handling a burst"),
+        None,  # stream invalidated
+        OperationFailure("The $changeStream stage is only supported on replica sets", code=40573),
+        AutoReconnect("connection reset"),
+    ])
+    seen = []
+
+    def follow():
+        seen.append(watcher.unavailable)
+        outcome = next(outcomes, "healthy")
+        if outcome == "healthy":
+            watcher.unavailable = False
+            watcher._stop.wait()
+        elif outcome is not None:
+            raise outcome
+
+    monkeypatch.setattr(watcher, "_follow", follow)
+    watcher.start()
+    try:
+        wait_for(lambda: len(seen) == 5)
+        assert watcher.available
+    finally:
+        watcher.stop()
+
+    assert seen == [False, False, False, True, True]
+    assert [sub.get(timeout=1)["type"] for _ in range(2)] == ["resync", "resync"]
+    assert watcher.personnel.version() == 2
+    assert watcher.resume_token is None
+
+
+def test_live_events_on_a_replica_set(replset_db):
+    from models.payroll import PayrollModel
+
+    watcher = ChangeWatcher()
+    watcher.enabled, watcher.coalesce = True, 0.1
+    watcher.personnel = PersonnelModel(replset_db)
+    sub = watcher.broker.subscribe("2099-01")
+    watcher.start()
+    try:
+        wait_for(lambda: watcher.resume_token is not None)
+        assert watcher.available
+
+        def next_event(kind):
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline:
+                event = sub.get(timeout=10)
+                if event["type"] == kind:
+                    return event
+            raise AssertionError(f"no {kind} event")
+
+        version = watcher.personnel.version()
+        pid = replset_db.personnel.insert_one(
+            {"fullName": "Live", "basicSalary": 100.0, "allowance": 10.0, "deductions": 1.0, "active": True}).inserted_id
+        event = next_event("personnel")
+        assert event["ops"] == {"insert": 1} and event["version"] > version
+
+        model = PayrollModel(replset_db)
+        entries, totals = model.compute_run(list(model.active_roster()))
+        model.create_run("2099-01", entries, totals, approved_by="tester")
+        event = next_event("run")
+        assert event["op"] == "insert" and event["run"]["totals"]["gross"] == 110.0
+
+        replset_db.personnel.update_one({"_id": pid}, {"$set": {"basicSalary": 200.0}})
+        model.upsert_person_entry("2099-01", replset_db.personnel.find_one({"_id": pid}), "tester")
+        event = next_event("run")
+        assert event["op"] == "update" and event["period"] == "2099-01"
+        assert event["updated"]["totals"]["gross"] == 210.0
+    finally:
+        watcher.stop()
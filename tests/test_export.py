@@ -0,0 +1,22 @@
+"""Export writers (no database needed)."""
+import csv
+import io
+
+from routes.export import csv_rows
+
+COLUMNS = ("armynumber", "name", "bankName", "basic", "deductions")
+
+
+def test_csv_quotes_formula_text_but_not_amounts():
+    rows = [
+        {"armynumber": "=HYPERLINK(\"http://x\")", "name": "+SUM(A1)", "bankName": "@cmd", "basic": -5.0, "deductions": 0.0},
+        {"armynumber": "-NA/1", "name": "\tTab", "bankName": "Plain Bank", "basic": 10.0, "deductions": -1.5},
+        {"armynumber": None, "name": "A-B", "bankName": "", "basic": 1.0, "deductions": 2.0},
+    ]
+    text = "".join(csv_rows([rows[:2], rows[2:]], COLUMNS))
+    got = list(csv.reader(io.StringIO(text)))
+
+    assert got[0] == list(COLUMNS)
+    assert got[1] == ["'=HYPERLINK(\"http://x\")", "'+SUM(A1)", "'@cmd", "-5.0", "0.0"]
+    assert got[2] == ["'-NA/1", "'\tTab", "Plain Bank", "10.0", "-1.5"]
+    assert got[3] == ["", "A-B", "", "1.0", "2.0"]
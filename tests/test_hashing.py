@@ -0,0 +1,50 @@
+"""PasswordHasher against a real forkserver pool (builtins as jobs, so nothing needs importing)."""
+import os
+import threading
+import time
+
+import pytest
+
+from app.hashing import HashingBusy, PasswordHasher, password_hash_pending
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher()
+    hasher.workers, hasher.rounds, hasher.timeout = 1, 4, 10
+    hasher._slots = threading.BoundedSemaphore(1)
+    yield hasher
+    hasher.shutdown()
+
+
+def pending():
+    return password_hash_pending._values.get((), 0)
+
+
+def test_timeout_is_busy_and_keeps_the_slot_until_the_job_ends(hasher):
+    before = pending()
+    hasher.timeout = 0.2
+    with pytest.raises(HashingBusy):
+        hasher._run(time.sleep, 2)
+    # The sleep is still running in the worker, so its slot is still taken
+    assert pending() == before + 1
+    with pytest.raises(HashingBusy):
+        hasher.hash("secret")
+
+    deadline = time.monotonic() + 10
+    while pending() != before:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    hasher.timeout = 10
+    assert hasher.check(hasher.hash("secret"), "secret") is True
+
+
+def test_dead_worker_replaces_the_pool(hasher):
+    before, broken = pending(), hasher._pool()
+    with pytest.raises(HashingBusy):
+        hasher._run(os._exit, 1)
+
+    assert hasher._executor is None
+    assert pending() == before
+    assert hasher._pool() is not broken
+    assert hasher.check(hasher.hash("secret"), "secret") is True
@@ -0,0 +1,30 @@
+"""Query plans and key backfill against a real mongod (skipped without one, see conftest)."""
+from benchmarks.roster import make_roster
+from models.payroll import PayrollModel
+
+
+def test_hot_queries_use_an_index(mongo_db):
+    from app.indexes import ensure_indexes, explain_hot_queries
+
+    mongo_db.personnel.insert_many(make_roster(300, db_fields=True))
+    assert ensure_indexes(mongo_db) == []
+    model = PayrollModel(mongo_db)
+    entries, totals = model.compute_run(list(model.active_roster()))
+    model.create_run("2025-01", entries, totals, approved_by="tester")
+    mongo_db.users.insert_one({"email": "officer@example.com", "username": "officer"})
+
+    for label, stages, uses_index in explain_hot_queries(mongo_db):
+        assert "IXSCAN" in stages and uses_index, (label, stages)
+
+
+def test_startup_backfills_keys_before_duplicate_checks(app, mongo_db):
+    from app import check_mongo
+    from routes.personnel import personnel_model
+
+    mongo_db.personnel.insert_one({"Army_Number": " NA/0000042 ", "Name": "Legacy Import", "active": True})
+    check_mongo(app)
+
+    assert mongo_db.personnel.find_one({"Name": "Legacy Import"})["armyNumberKey"] == "na/0000042"
+    existing = personnel_model.create({"armyNumber": "na/0000042", "fullName": "Someone Else"})
+    assert existing["Name"] == "Legacy Import"
+    assert mongo_db.personnel.count_documents({}) == 1
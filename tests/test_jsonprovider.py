@@ -0,0 +1,54 @@
+"""The orjson provider writes PayrollEntry records exactly as the dict entries they replace."""
+import json
+from datetime import datetime, timezone
+
+import pytest
+from bson import ObjectId
+
+from benchmarks.roster import make_roster
+from models import payroll_engine
+
+pytest.importorskip("orjson")
+
+
+def columns(**amounts):
+    roster = make_roster(50, seed=21)
+    # Text fields pass through unconverted, so BSON values stored in them reach the serializer
+    roster[0]["region"] = ObjectId("65a1b2c3d4e5f60718293a4b")
+    roster[1]["rank"] = datetime(2025, 1, 31, 12, 30, 15, 250000, tzinfo=timezone.utc)
+    roster[2].update(amounts)
+    cols = payroll_engine.normalize(roster)
+    return cols, payroll_engine.compute(cols)
+
+
+@pytest.fixture
+def providers(app):
+    from app.jsonprovider import OrjsonBSONProvider, TimedBSONProvider
+    return OrjsonBSONProvider(app), TimedBSONProvider(app)
+
+
+def test_records_serialize_like_dict_entries(providers):
+    fast, reference = providers
+    cols, totals = columns(basicSalary=0.1, allowance=0.2, deductions=3)
+
+    out = fast.dumps({"entries": cols.records(), "totals": totals})
+    assert out == fast.dumps({"entries": cols.entries(), "totals": totals})
+    # Same key order and float text as bson.json_util, minus whitespace
+    expected = reference.dumps({"entries": cols.entries(), "totals": totals})
+    assert out == json.dumps(json.loads(expected), separators=(",", ":"))
+
+    first, second, third = json.loads(out)["entries"][:3]
+    assert list(first) == list(payroll_engine.ENTRY_FIELDS)
+    assert first["region"] == {"$oid": "65a1b2c3d4e5f60718293a4b"}
+    assert second["rank"] == {"$date": "2025-01-31T12:30:15.250Z"}
+    assert third["net"] == 0.1 + 0.2 - 3 and '"deductions":3.0,' in out
+
+
+def test_exponent_floats_keep_their_value(providers):
+    fast, reference = providers
+    cols, totals = columns(basicSalary=1e16, allowance=123456789.125, deductions=1e-7)
+
+    out = fast.dumps({"entries": cols.records(), "totals": totals})
+    assert out == fast.dumps({"entries": cols.entries(), "totals": totals})
+    assert '"basic":1e16,' in out and '"deductions":1e-7,' in out
+    assert json.loads(out) == json.loads(reference.dumps({"entries": cols.entries(), "totals": totals}))
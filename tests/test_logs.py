@@ -0,0 +1,30 @@
+"""JSON log lines written through the non-blocking queue handler."""
+import io
+import json
+import logging
+
+from app.logs import JsonFormatter, NonBlockingQueueHandler
+
+
+def test_exceptions_get_their_own_field():
+    out = io.StringIO()
+    target = logging.StreamHandler(out)
+    target.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(target)
+    logger = logging.getLogger("tests.logs")
+    logger.addHandler(handler)
+    logger.propagate = False
+    try:
+        try:
+            raise ValueError("disk full")
+        except ValueError:
+            logger.exception("Payroll job %s crashed", "42", extra={"period": "2025-01"})
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+
+    line = json.loads(out.getvalue())
+    assert line["msg"] == "Payroll job 42 crashed"
+    assert line["period"] == "2025-01"
+    assert line["level"] == "ERROR"
+    assert "Traceback" in line["exc"] and "ValueError: disk full" in line["exc"]
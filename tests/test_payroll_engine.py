@@ -0,0 +1,74 @@
+import sys
+from array import array
+
+import pytest
+
+from benchmarks.roster import make_roster
+from models import payroll_engine
+from models.payroll import PayrollModel
+
+
+def test_compute_matches_build_entry(db):
+    model = PayrollModel(db)
+    roster = make_roster(500, seed=3)
+    entries, _ = model.compute_preview(roster)
+    assert entries == [model.build_entry(p) for p in roster]
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 1000])
+def test_streaming_totals_match_compute(batch_size):
+    roster = make_roster(2000, seed=11)
+    expected = payroll_engine.compute(payroll_engine.normalize(roster))
+    totals = payroll_engine.StreamingTotals()
+    records = list(payroll_engine.iter_entries(roster, totals, batch_size))
+
+    assert len(records) == totals.count == len(roster)
+    if sys.version_info < (3, 12):
+        assert totals.as_dict() == expected
+    else:
+        assert totals.as_dict() == pytest.approx(expected, rel=1e-12)
+
+
+def test_streaming_totals_hold_no_per_entry_state():
+    totals = payroll_engine.StreamingTotals()
+    for _ in payroll_engine.iter_entries(make_roster(3000, seed=5), totals, 100):
+        pass
+    assert not any(isinstance(getattr(totals, name), (array, list)) for name in totals.__slots__)
+
+
+def test_canonical_marker_does_not_trust_amount_types(db):
+    model = PayrollModel(db)
+    roster = make_roster(20, seed=9, legacy_share=0, db_fields=True)
+    # Written around the model after the marker was set
+    roster[1].update(basicSalary="2,500.50", allowance=None, deductions=7)
+    roster[2].update(basicSalary="abc", allowance="1_000")
+    entries, totals = model.compute_preview(roster)
+
+    assert entries == [model.build_entry(p) for p in roster]
+    assert entries[1]["basic"] == 2500.5 and entries[1]["allowance"] == 0.0
+    assert totals["deductions"] == sum(e["deductions"] for e in entries)
+
+
+def test_migrated_roster_computes_identically(mongo_db):
+    from models.payroll_engine import CANONICAL_SCHEMA, SCHEMA_KEY
+    from models.personnel import PersonnelModel
+
+    roster = make_roster(300, seed=13, legacy_share=1 / 2, db_fields=True)
+    legacy_doc = next(p for p in roster if "Basic_Pay" in p)
+    legacy_doc.update(BasicSalary=" 1,000 ", Allowance=None)  # two spellings of basic: BasicSalary wins
+    mongo_db.personnel.insert_many(roster)
+    legacy = mongo_db.personnel.count_documents({SCHEMA_KEY: {"$ne": CANONICAL_SCHEMA}})
+    payroll, personnel = PayrollModel(mongo_db), PersonnelModel(mongo_db)
+    before = payroll.compute_run(list(payroll.active_roster()))
+    version = personnel.version()
+
+    assert personnel.migrate_schema(batch_size=7, dry_run=True) == (legacy, legacy)
+    assert mongo_db.personnel.count_documents({SCHEMA_KEY: {"$ne": CANONICAL_SCHEMA}}) == legacy
+    assert personnel.version() == version
+
+    assert personnel.migrate_schema(batch_size=7) == (legacy, legacy)
+    assert mongo_db.personnel.count_documents({SCHEMA_KEY: {"$ne": CANONICAL_SCHEMA}}) == 0
+    assert mongo_db.personnel.count_documents({"Basic_Pay": {"$exists": True}}) == 0
+    assert personnel.version() == version + 1
+    assert payroll.compute_run(list(payroll.active_roster())) == before
+    assert personnel.migrate_schema() == (0, 0)
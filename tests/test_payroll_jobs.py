@@ -0,0 +1,95 @@
+"""Approval jobs that keep failing end as `failed` and release their period."""
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from app import payroll_jobs
+from benchmarks.roster import make_roster
+from models.payroll_job import JOB_FAILED, JOB_RUNNING
+
+PERIOD = "2099-03"
+
+
+def test_job_failing_twice_is_failed_and_releases_the_period(db, monkeypatch):
+    db.personnel.insert_many(make_roster(20, db_fields=True))
+    calls = []
+
+    def broken_write(period, rev, entries):
+        calls.append(rev)
+        db.payroll_entries.insert_one({"period": period, "rev": rev, "person_id": ObjectId()})
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(payroll_jobs.payroll, "write_entries", broken_write)
+    job, _ = payroll_jobs.jobs.create(PERIOD, False, "tester")
+    payroll_jobs.run(job["_id"])
+
+    job = payroll_jobs.jobs.get(job["_id"])
+    assert len(calls) == 2 and calls[0] == calls[1] == job["rev"]
+    assert job["status"] == JOB_FAILED and "disk full" in job["error"]
+    assert "active_period" not in job
+    assert db.payroll_entries.count_documents({"rev": job["rev"]}) == 0
+    assert payroll_jobs.jobs.create(PERIOD, False, "tester")[1] is True
+
+
+def test_reaper_fails_a_job_that_keeps_getting_abandoned(db, monkeypatch):
+    monkeypatch.setattr(payroll_jobs, "workers", 1)
+    monkeypatch.setattr(payroll_jobs, "stale_after", 1)
+    job, _ = payroll_jobs.jobs.create(PERIOD, False, "tester")
+    long_ago = (datetime.now(timezone.utc) - timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    db.payroll_jobs.update_one({"_id": job["_id"]}, {"$set": {
+        "status": JOB_RUNNING, "heartbeat_at": long_ago, "attempts": payroll_jobs.max_attempts}})
+
+    payroll_jobs.start()
+    try:
+        deadline = time.monotonic() + 10
+        while payroll_jobs.jobs.get(job["_id"])["status"] != JOB_FAILED:
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+    finally:
+        payroll_jobs.shutdown()
+
+    job = payroll_jobs.jobs.get(job["_id"])
+    assert job["attempts"] == payroll_jobs.max_attempts + 1
+    assert payroll_jobs.jobs.active_for(PERIOD) is None
+
+
+class WorkerDied(BaseException):
+    """Stands in for the process going away mid-job (not caught like an Exception)."""
+
+
+def test_job_runs_to_done_and_resumes_after_a_dead_worker(mongo_db, monkeypatch):
+    from models.payroll import PayrollModel
+    from models.payroll_job import JOB_DONE
+
+    mongo_db.personnel.insert_many(make_roster(10, db_fields=True))
+    model = PayrollModel(mongo_db)
+    expected_entries, expected_totals = model.compute_run(list(model.active_roster()))
+    monkeypatch.setattr(payroll_jobs, "chunk_size", 3)
+
+    def die(*args, **kwargs):
+        raise WorkerDied()
+
+    with monkeypatch.context() as m:
+        m.setattr(payroll_jobs.payroll, "finalize_run", die)
+        job, _ = payroll_jobs.jobs.create(PERIOD, False, "tester")
+        try:
+            payroll_jobs.run(job["_id"])
+        except WorkerDied:
+            pass
+    job = payroll_jobs.jobs.get(job["_id"])
+    assert job["status"] == JOB_RUNNING and job["processed"] == len(expected_entries)
+
+    long_ago = (datetime.now(timezone.utc) - timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    mongo_db.payroll_jobs.update_one({"_id": job["_id"]}, {"$set": {"heartbeat_at": long_ago}})
+    assert payroll_jobs.resume() == 1
+
+    job = payroll_jobs.jobs.get(job["_id"])
+    assert job["status"] == JOB_DONE and job["attempts"] == 2
+    assert "active_period" not in job
+    run = model.get_by_period(PERIOD)
+    assert run["rev"] == job["rev"] and run["totals"] == expected_totals == job["totals"]
+    stored = model.get_entries(PERIOD)
+    assert [{k: e[k] for k in ("armynumber", "net")} for e in stored] == \
+        [{k: e[k] for k in ("armynumber", "net")} for e in expected_entries]
+    assert model.verify_totals(PERIOD)["ok"]
@@ -0,0 +1,79 @@
+"""Partitioned computation gives exactly the serial engine's entries and totals."""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from bson import ObjectId
+
+from app.parallel import PartitionedPayroll
+from benchmarks.roster import make_roster
+from models import payroll_engine
+from models.payroll import PayrollModel
+from models.payroll_parallel import compute_partitioned
+
+
+class ListRoster:
+    """MongoRoster stand-in over an in-memory roster."""
+
+    def __init__(self, docs):
+        self.docs = sorted(docs, key=lambda d: d["_id"])
+
+    def fetch(self, lo, hi):
+        return [d for d in self.docs if d.get("active")
+                and (lo is None or d["_id"] >= lo) and (hi is None or d["_id"] < hi)]
+
+
+def roster(n):
+    docs = make_roster(n, db_fields=True)
+    for i, d in enumerate(docs):
+        d["_id"] = ObjectId()
+        d["active"] = i % 5 != 0
+    return docs
+
+
+@pytest.mark.parametrize("parts", [1, 3, 8])
+def test_partitioned_matches_serial_engine(parts):
+    docs = roster(500)
+    source = ListRoster(docs)
+    ids = [d["_id"] for d in source.docs]
+    edges = [ids[len(ids) * i // parts] for i in range(1, parts)]
+    bounds = list(zip([None] + edges, edges + [None]))
+
+    with ThreadPoolExecutor(4) as executor:
+        cols, got_ids, totals = compute_partitioned(executor, source, bounds)
+
+    serial = source.fetch(None, None)
+    expected = payroll_engine.normalize(serial)
+    assert totals == payroll_engine.compute(expected)
+    assert cols.entries() == expected.entries()
+    assert got_ids == [d["_id"] for d in serial]
+
+
+def test_broken_pool_is_replaced_and_computes_serially(db, monkeypatch):
+    db.personnel.insert_many(make_roster(50, db_fields=True))
+    model = PayrollModel(db)
+    workers = PartitionedPayroll()
+    workers.workers, workers.min_roster = 1, 1
+    broken = ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("forkserver"))
+    with pytest.raises(BrokenProcessPool):
+        broken.submit(os._exit, 1).result()
+    workers._executor, workers._pid = broken, os.getpid()
+
+    assert workers.compute_run(model) == model.compute_run(list(model.active_roster()))
+    assert workers._executor is None
+
+
+def test_process_pool_over_mongod_matches_serial(mongo_db, mongod_uri):
+    from models.payroll_parallel import MongoRoster
+    mongo_db.personnel.insert_many(roster(2000))
+    model = PayrollModel(mongo_db)
+    workers = PartitionedPayroll()
+    workers.workers, workers.min_roster = 2, 1
+    workers.source = MongoRoster(mongod_uri, mongo_db.name)
+    try:
+        assert workers.compute_run(model) == model.compute_run(list(model.active_roster()))
+        assert workers.preview_records(model)[1] == model.preview_records(list(model.active_roster()))[1]
+    finally:
+        workers.shutdown()
@@ -0,0 +1,194 @@
+from models.payroll import PayrollModel
+
+PERIOD = "2025-01"
+
+
+def person(i, **fields):
+    doc = {"fullName": f"Person {i}", "basicSalary": 1000.0 + i, "allowance": 100.0, "deductions": 10.0,
+           "active": True}
+    doc.update(fields)
+    return doc
+
+
+def test_run_keeps_people_without_or_sharing_an_army_number(db, client, auth_headers):
+    db.personnel.insert_many([
+        person(0, armyNumber="NA/1"),
+        person(1, armyNumber="NA/1"),
+        person(2, armyNumber=""),
+        person(3),
+        person(4),
+    ])
+    resp = client.post("/api/payroll", json={"period": PERIOD}, headers=auth_headers)
+    assert resp.status_code == 200, resp.get_json()
+
+    run = client.get(f"/api/payroll/run?period={PERIOD}", headers=auth_headers).get_json()
+    assert [e["name"] for e in run["entries"]] == [f"Person {i}" for i in range(5)]
+    assert run["totals"]["gross"] == sum(1000.0 + i + 100.0 for i in range(5))
+    header = db.payroll_runs.find_one({"period": PERIOD})
+    assert header["entry_count"] == 5
+
+
+def test_single_approval_adds_people_without_army_number(db):
+    model = PayrollModel(db)
+    ids = db.personnel.insert_many([person(0), person(1)]).inserted_ids
+    for pid in ids:
+        model.upsert_person_entry(PERIOD, db.personnel.find_one({"_id": pid}), "tester")
+    model.upsert_person_entry(PERIOD, db.personnel.find_one({"_id": ids[0]}), "tester")
+
+    run = model.get_by_period(PERIOD)
+    assert run["entry_count"] == 2
+    assert sorted(e["name"] for e in model.get_entries(PERIOD)) == ["Person 0", "Person 1"]
+    assert model.verify_totals(PERIOD)["ok"]
+
+
+def _embedded_run(db, model, entries):
+    db.payroll_runs.insert_one({"period": PERIOD, "entries": entries, "totals": model._recompute_totals(entries),
+                                "approved_by": "legacy", "approved_at": "2020-01-31T00:00:00.000000Z"})
+
+
+def test_racing_migrations_store_each_entry_once(db):
+    model = PayrollModel(db)
+    entries = [model.build_entry(person(i, armyNumber="" if i % 2 else f"NA/{i}")) for i in range(6)]
+    _embedded_run(db, model, entries)
+
+    model.migrate_run(PERIOD)
+    # A second reader saw the old layout too and migrates after the first one finished
+    db.payroll_runs.update_one({"period": PERIOD}, {"$set": {"entries": entries},
+                                                    "$unset": {"rev": "", "entry_count": "", "legacy_entries": ""}})
+    model.migrate_run(PERIOD)
+
+    run = model.get_by_period(PERIOD)
+    assert run["rev"] == run["_id"]
+    assert run["entry_count"] == 6
+    assert db.payroll_entries.count_documents({"period": PERIOD}) == 6
+    assert [e["name"] for e in model.get_entries(PERIOD)] == [e["name"] for e in entries]
+
+
+def test_single_approval_takes_over_a_migrated_entry(db):
+    model = PayrollModel(db)
+    pid = db.personnel.insert_one(person(0, armyNumber="NA/7")).inserted_id
+    doc = db.personnel.find_one({"_id": pid})
+    _embedded_run(db, model, [model.build_entry(doc), model.build_entry(person(1))])
+
+    db.personnel.update_one({"_id": pid}, {"$set": {"basicSalary": 5000.0}})
+    run = model.upsert_person_entry(PERIOD, db.personnel.find_one({"_id": pid}), "tester")
+
+    assert run["entry_count"] == 2
+    entries = model.get_entries(PERIOD)
+    assert [e["basic"] for e in entries] == [5000.0, 1001.0]
+    assert model.verify_totals(PERIOD)["ok"]
+
+
+class SwapAfterEntryWrite:
+    """payroll_entries stand-in that overwrites the run right after the first entry upsert."""
+
+    def __init__(self, entries, swap):
+        self._entries, self._swap = entries, swap
+
+    def __getattr__(self, name):
+        return getattr(self._entries, name)
+
+    def find_one_and_update(self, *args, **kwargs):
+        result = self._entries.find_one_and_update(*args, **kwargs)
+        swap, self._swap = self._swap, None
+        if swap:
+            swap()
+        return result
+
+
+def test_single_approval_racing_an_overwrite_lands_in_the_new_run(db, monkeypatch):
+    model = PayrollModel(db)
+    ids = db.personnel.insert_many([person(i) for i in range(3)]).inserted_ids
+    entries, totals = model.compute_run(list(db.personnel.find({"_id": {"$in": ids[:2]}})))
+    model.create_run(PERIOD, entries, totals, approved_by="tester")
+    old_rev = model.get_by_period(PERIOD)["rev"]
+
+    replacement, replacement_totals = model.compute_run(list(db.personnel.find({"_id": ids[0]})))
+    monkeypatch.setattr(model, "entries", SwapAfterEntryWrite(
+        model.entries, lambda: model.overwrite_run(PERIOD, replacement, replacement_totals, "other")))
+    run = model.upsert_person_entry(PERIOD, db.personnel.find_one({"_id": ids[2]}), "tester")
+
+    current = model.get_by_period(PERIOD)
+    assert current["rev"] != old_rev
+    assert run["entry_count"] == 2
+    assert sorted(e["name"] for e in model.get_entries(PERIOD)) == ["Person 0", "Person 2"]
+    assert model.verify_totals(PERIOD)["ok"]
+    assert db.payroll_entries.count_documents({"rev": {"$ne": current["rev"]}}) == 0
+
+
+def test_delta_run_equals_a_full_run(db, client, auth_headers):
+    from datetime import datetime, timedelta, timezone
+    fmt = '%Y-%m-%dT%H:%M:%S.%fZ'
+    long_ago = "2020-01-01T00:00:00.000000Z"
+    ids = db.personnel.insert_many(
+        [person(i, armyNumber=f"NA/{i}", updated_at=long_ago) for i in range(8)]
+        + [{"Name": "Legacy Import", "BasicSalary": "2,500", "Allowance": 5, "active": True}]
+    ).inserted_ids
+    assert client.post("/api/payroll", json={"period": "2025-01"}, headers=auth_headers).status_code == 200
+    snapshot = datetime.strptime(db.payroll_runs.find_one({"period": "2025-01"})["snapshot_at"], fmt)
+
+    now = datetime.now(timezone.utc).strftime(fmt)
+    db.personnel.update_one({"_id": ids[0]}, {"$set": {"basicSalary": 9999.0, "updated_at": now}})
+    db.personnel.update_one({"_id": ids[1]}, {"$set": {"active": False, "updated_at": now}})
+    db.personnel.delete_one({"_id": ids[2]})
+    db.personnel.insert_one(person(99, armyNumber="NA/99", updated_at=now))
+    # Written while the base run was reading the roster: stamped just before its snapshot_at
+    racing = (snapshot - timedelta(seconds=30)).strftime(fmt)
+    db.personnel.update_one({"_id": ids[3]}, {"$set": {"allowance": 777.0, "updated_at": racing}})
+
+    resp = client.post("/api/payroll", json={"period": "2025-02", "mode": "delta"}, headers=auth_headers)
+    assert resp.status_code == 200, resp.get_json()
+    stats = resp.get_json()["delta"]
+    assert stats["reused"] == 4 and stats["recomputed"] == 4 and stats["removed"] == 2
+    assert client.post("/api/payroll", json={"period": "2025-03"}, headers=auth_headers).status_code == 200
+
+    model = PayrollModel(db)
+    delta, full = model.get_by_period("2025-02"), model.get_by_period("2025-03")
+    assert model.get_entries("2025-02") == model.get_entries("2025-03")
+    assert delta["totals"] == full["totals"] and delta["entry_count"] == full["entry_count"] == 8
+    assert delta["content_hash"] == full["content_hash"]
+
+
+def test_parallel_approvals_keep_totals_exact(app, mongo_db, auth_headers):
+    """Single-person approvals racing each other and full overwrites, as many clients would."""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    model = PayrollModel(mongo_db)
+    # Whole amounts: every order of $inc gives the same float sums, so any drift is a lost update
+    first = mongo_db.personnel.insert_many([person(i, armyNumber=f"NA/{i}") for i in range(10)]).inserted_ids
+    client = app.test_client()
+    assert client.post("/api/payroll", json={"period": PERIOD}, headers=auth_headers).status_code == 200
+    joined = mongo_db.personnel.insert_many([person(i, armyNumber=f"NA/{i}") for i in range(10, 20)]).inserted_ids
+
+    def approve(pid):
+        return app.test_client().post(f"/api/payroll/approve/{pid}", json={"period": PERIOD}, headers=auth_headers)
+
+    def overwrite(_):
+        return app.test_client().post("/api/payroll", json={"period": PERIOD, "overwrite": True}, headers=auth_headers)
+
+    def read_run(stop, empty_reads):
+        reader = app.test_client()
+        while not stop.is_set():
+            body = reader.get(f"/api/payroll/run?period={PERIOD}", headers=auth_headers).get_json()
+            if not body.get("entries"):
+                empty_reads.append(body)
+
+    stop, empty_reads = threading.Event(), []
+    reader = threading.Thread(target=read_run, args=(stop, empty_reads))
+    reader.start()
+    calls = [(approve, pid) for pid in joined * 2 + first] + [(overwrite, None)] * 4
+    try:
+        with ThreadPoolExecutor(16) as pool:
+            responses = list(pool.map(lambda call: call[0](call[1]), calls))
+    finally:
+        stop.set()
+        reader.join()
+
+    assert not empty_reads
+    assert all(r.status_code == 200 for r in responses), [r.get_json() for r in responses if r.status_code != 200]
+    report = model.verify_totals(PERIOD)
+    assert report["ok"] and report["entry_count"] == 20
+    assert report["drift"] == {"gross": 0, "allowances": 0, "deductions": 0}
+    run = model.get_by_period(PERIOD)
+    assert mongo_db.payroll_runs.count_documents({"period": PERIOD}) == 1
+    assert mongo_db.payroll_entries.distinct("rev", {"period": PERIOD}) == [run["rev"]]
@@ -0,0 +1,52 @@
+"""The aggregation summary against the Python payroll engine on a real mongod (see conftest)."""
+import math
+
+import pytest
+
+from benchmarks.roster import make_roster
+from models.payroll import PayrollModel
+from models.payroll_aggregate import number_expr, summarize_entries
+from models.payroll_engine import NUMERIC_FIELDS, to_float
+
+# Amounts where the server's string -> double conversion and float() disagree unless normalized
+AWKWARD = [
+    "1_000", "1e3", "+1.5E-2", " 12.5 ", "\t1,234.5\n", "\xa07　", "1,000_000", ".5", "5.",
+    "inf", "-Infinity", "NaN", "1__0", "_1", "1_", "0x10", "1e", "abc", "", "\x0012", "12\x00",
+    3, 2.5, None, True,
+]
+FINITE = [v for v in AWKWARD if not math.isinf(to_float(v)) and not math.isnan(to_float(v))]
+
+
+def test_number_expr_matches_to_float(mongo_db):
+    mongo_db.amounts.insert_many([{"i": i, "v": v} for i, v in enumerate(AWKWARD)])
+    docs = mongo_db.amounts.aggregate([{"$project": {"i": 1, "n": number_expr("$v")}}, {"$sort": {"i": 1}}])
+
+    for doc, value in zip(docs, AWKWARD):
+        expected = to_float(value)
+        if math.isnan(expected):
+            assert math.isnan(doc["n"]), value
+        else:
+            assert doc["n"] == expected, value
+
+
+def test_summary_route_matches_python_engine(mongo_db, client, auth_headers):
+    roster = make_roster(len(FINITE) * 3, legacy_share=1, db_fields=True)
+    for i, person in enumerate(roster):
+        for _, keys in NUMERIC_FIELDS:
+            key = next((k for k in keys if k in person), keys[-1])
+            person[key] = FINITE[(i + len(key)) % len(FINITE)]
+    mongo_db.personnel.insert_many(roster)
+
+    resp = client.get("/api/payroll/summary?period=2099-01&groupBy=region,rank", headers=auth_headers)
+    assert resp.status_code == 200
+    got = resp.get_json()
+
+    model = PayrollModel(mongo_db)
+    entries, _ = model.compute_preview(list(mongo_db.personnel.find({"active": True})))
+    expected = summarize_entries(entries, ["region", "rank"])
+    assert got["source"] == "personnel"
+    assert got["count"] == expected["count"]
+    assert got["totals"] == pytest.approx(expected["totals"])
+    for group in ("region", "rank"):
+        rows = {row["key"]: row for row in got["groups"][group]}
+        assert rows == {row["key"]: pytest.approx(row) for row in expected["groups"][group]}
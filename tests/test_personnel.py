@@ -0,0 +1,105 @@
+from models.personnel import PersonnelModel
+
+
+def test_search_matches_army_number_or_name_prefix(db):
+    model = PersonnelModel(db)
+    model.create({"armyNumber": "NA/100", "fullName": "Ada Obi"})
+    model.create({"armyNumber": "NA/200", "fullName": "  Bola Ade "})
+    model.create({"armyNumber": "AD/300", "fullName": "Chidi Eze"})
+
+    names = lambda q: sorted(p["fullName"] for p in model.list_page(search=q)[0])
+    assert names("ad") == ["Ada Obi", "Chidi Eze"]
+    assert names("BOLA") == ["Bola Ade"]
+    assert names("na/2") == ["Bola Ade"]
+    assert names("obi") == []
+
+
+def test_name_key_follows_renames(db):
+    model = PersonnelModel(db)
+    created = model.create({"armyNumber": "NA/1", "Name": "Old Name"})
+    assert db.personnel.find_one()["fullNameKey"] == "old name"
+
+    model.update(created["_id"], {"fullName": "New Name"})
+    assert db.personnel.find_one()["fullNameKey"] == "new name"
+    assert [p["fullName"] for p in model.list_page(search="new")[0]] == ["New Name"]
+
+
+def test_pages_cover_every_person_once(db):
+    model = PersonnelModel(db)
+    db.personnel.insert_many(
+        [{"fullName": f"P{i}", "created_at": f"2025-01-{i % 3 + 1:02d}T00:00:00Z"} for i in range(7)]
+        + [{"fullName": f"Undated {i}"} for i in range(3)]
+    )
+    seen, cursor = [], None
+    while True:
+        page, cursor = model.list_page(limit=3, cursor=cursor)
+        seen += [p["fullName"] for p in page]
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted([f"P{i}" for i in range(7)] + [f"Undated {i}" for i in range(3)])
+    assert seen[-3:] == ["Undated 2", "Undated 1", "Undated 0"]
+
+
+def bulk_rows(n, start=0):
+    return [{"armyNumber": f"NA/{i}", "fullName": f"Person {i}", "basicSalary": "1,000", "allowance": 50}
+            for i in range(start, start + n)]
+
+
+def test_bulk_import_json_reports_bad_rows_and_duplicates(db, client):
+    PersonnelModel(db).create({"armyNumber": "NA/3", "fullName": "Already Here"})
+    rows = bulk_rows(6) + [
+        {"armyNumber": "na/1 ", "fullName": "Same armyNumber, other case"},
+        {"fullName": "No armyNumber"},
+        {"armyNumber": "NA/90"},
+        "not an object",
+    ]
+
+    resp = client.post("/api/personnel/bulk", json={"personnel": rows})
+    assert resp.status_code == 201
+    result = resp.get_json()
+    assert result["received"] == 10 and result["inserted"] == 5
+    assert result["duplicates"] == [
+        {"row": 6, "armyNumber": "na/1", "reason": "duplicate in batch"},
+        {"row": 3, "armyNumber": "NA/3", "reason": "already exists"},
+    ]
+    assert [e["row"] for e in result["errors"]] == [7, 8, 9]
+    assert db.personnel.count_documents({}) == 6
+    assert db.personnel.find_one({"armyNumber": "NA/1"})["basicSalary"] == 1000.0
+
+
+def test_bulk_import_csv_in_chunks(db, client, monkeypatch):
+    db.personnel.create_index("armyNumberKey", unique=True)
+    model = PersonnelModel(db)
+    chunks = []
+    insert_many = db.personnel.insert_many
+
+    def insert_chunk(docs, **kwargs):
+        chunks.append([d["armyNumber"] for d in docs])
+        if len(chunks) == 2:
+            # A concurrent create lands after the duplicate check, inside the second chunk
+            model.create({"armyNumber": "NA/3", "fullName": "Raced"})
+        return insert_many(docs, **kwargs)
+
+    monkeypatch.setattr(db.personnel, "insert_many", insert_chunk)
+    csv = "\ufeffArmy_Number,Name,BasicSalary,Allowance\n" + "".join(
+        f"NA/{i},Person {i},\"2,500\",10\n" for i in range(7)) + "NA/5,Again,1,1\n,Nameless,1,1\n"
+
+    resp = client.post("/api/personnel/bulk?chunkSize=3", data=csv, content_type="text/csv")
+    assert resp.status_code == 201
+    result = resp.get_json()
+    assert chunks == [["NA/0", "NA/1", "NA/2"], ["NA/3", "NA/4", "NA/5"], ["NA/6"]]
+    assert result["received"] == 9 and result["inserted"] == 6
+    assert result["duplicates"] == [
+        {"row": 7, "armyNumber": "NA/5", "reason": "duplicate in batch"},
+        {"row": 3, "armyNumber": "NA/3", "reason": "already exists"},
+    ]
+    assert [e["row"] for e in result["errors"]] == [8]
+    assert db.personnel.find_one({"armyNumber": "NA/3"})["fullName"] == "Raced"
+    assert db.personnel.find_one({"armyNumber": "NA/6"})["basicSalary"] == 2500.0
+
+
+def test_bulk_import_rejects_a_bad_chunk_size(db, client):
+    resp = client.post("/api/personnel/bulk?chunkSize=0", json=bulk_rows(2))
+    assert resp.status_code == 400
+    assert db.personnel.count_documents({}) == 0